@@ -1,6 +1,6 @@
 from django.contrib import admin
 from .models import FileSystemObject
-from .models import FileSystemObject, Process
+from .models import FileSystemObject, Process, ProcessArchive
 @admin.register(FileSystemObject)
 class FileSystemObjectAdmin(admin.ModelAdmin):
     """
@@ -21,10 +21,20 @@ class FileSystemObjectAdmin(admin.ModelAdmin):
     # Order the list by parent and then by name
     ordering = ('parent__name', 'name')
 
+    # File data is stored in blocks and written through the API (api.content)
+    exclude = ('content',)
+
 @admin.register(Process)
 class ProcessAdmin(admin.ModelAdmin):
     # Add 'page_table' to this list
     list_display = ('id', 'owner', 'file_object', 'status', 'page_table', 'created_at')
     list_filter = ('status', 'owner')
     search_fields = ('owner__username', 'file_object__name')
-    ordering = ('-created_at',)
\ No newline at end of file
+    ordering = ('-created_at',)
+
+@admin.register(ProcessArchive)
+class ProcessArchiveAdmin(admin.ModelAdmin):
+    list_display = ('pid', 'owner', 'file_name', 'turnaround', 'faults', 'hits', 'created_at', 'archived_at')
+    list_filter = ('owner',)
+    search_fields = ('owner__username', 'file_name')
+    ordering = ('-created_at',)
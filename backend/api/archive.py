@@ -0,0 +1,272 @@
+import tarfile
+import time
+import zipfile
+
+from django.db import transaction
+from django.db.models import Prefetch
+
+from . import quota
+from .batch import Batch
+from .content import iter_text
+from .models import FileBlock, FileSystemObject, UserProfile
+
+FORMATS = {
+    'tar': 'application/x-tar',
+    'zip': 'application/zip',
+}
+# Files whose blocks are loaded together while exporting
+EXPORT_CHUNK = 100
+PERMISSION_BITS = 'rwxrwxrwx'
+
+
+class ArchiveError(Exception):
+    """The uploaded file is not a readable tar or zip archive."""
+
+
+def permission_mode(permissions):
+    """'rwxr-x---' -> 0o750"""
+    mode = 0
+    for i, char in enumerate((permissions or '')[:9]):
+        if char != '-':
+            mode |= 1 << (8 - i)
+    return mode
+
+
+def permission_string(mode):
+    """0o750 -> 'rwxr-x---'"""
+    return ''.join(char if mode & (1 << (8 - i)) else '-' for i, char in enumerate(PERMISSION_BITS))
+
+
+def export_archive(user, root, fmt):
+    """
+    Yield `root`'s subtree (the user's whole tree when None) as a tar or zip
+    archive, piece by piece: entries are read in path order a chunk of files
+    at a time, and file data is written block by block. Files without the
+    owner read bit are archived empty, as their content GET refuses them.
+    """
+    entries = FileSystemObject.objects.filter(owner=user)
+    if root is not None:
+        entries = entries.filter(path__startswith=root.path)
+    entries = (
+        entries
+        .defer('content')
+        .order_by('path')
+        .prefetch_related(Prefetch('body__blocks', queryset=FileBlock.objects.select_related('blob')))
+    )
+    writer = TarWriter(user.username) if fmt == 'tar' else ZipWriter()
+    base = root.parent_id if root is not None else None
+    # Archive path of every directory seen so far (parents sort before their children)
+    folders = {base: ''}
+    for obj in entries.iterator(chunk_size=EXPORT_CHUNK):
+        folder = folders.get(obj.parent_id)
+        if folder is None:
+            continue
+        name = folder + obj.name.replace('/', '_')
+        if obj.is_directory:
+            folders[obj.pk] = name + '/'
+            yield from writer.directory(name, obj)
+        else:
+            yield from writer.file(name, obj, readable(obj))
+    yield from writer.close()
+
+
+def readable(obj):
+    """The owner read bit, checked like FileContentView.get does."""
+    return not obj.permissions or obj.permissions[0] == 'r'
+
+
+def _file_data(obj):
+    """A file's bytes block by block, exactly obj.size of them (as announced in the header)."""
+    written = 0
+    for block in iter_text(obj):
+        data = block.encode('utf-8')[:obj.size - written]
+        written += len(data)
+        if data:
+            yield data
+    if written < obj.size:
+        yield b'\0' * (obj.size - written)
+
+
+class TarWriter:
+    """Streamed (POSIX pax) tar: a header, then the data padded to 512-byte blocks."""
+
+    def __init__(self, username):
+        self.username = username
+        self.offset = 0
+
+    def _info(self, name, obj):
+        info = tarfile.TarInfo(name)
+        info.mode = permission_mode(obj.permissions)
+        info.mtime = int(obj.updated_at.timestamp())
+        info.uname = self.username
+        return info
+
+    def _emit(self, data):
+        self.offset += len(data)
+        return data
+
+    def directory(self, name, obj):
+        info = self._info(name + '/', obj)
+        info.type = tarfile.DIRTYPE
+        yield self._emit(info.tobuf(tarfile.PAX_FORMAT, 'utf-8'))
+
+    def file(self, name, obj, readable=True):
+        info = self._info(name, obj)
+        info.size = obj.size if readable else 0
+        yield self._emit(info.tobuf(tarfile.PAX_FORMAT, 'utf-8'))
+        if not readable:
+            return
+        for data in _file_data(obj):
+            yield self._emit(data)
+        padding = -obj.size % tarfile.BLOCKSIZE
+        if padding:
+            yield self._emit(b'\0' * padding)
+
+    def close(self):
+        # End-of-archive marker, then pad to a whole record like tarfile does
+        end = self.offset + 2 * tarfile.BLOCKSIZE
+        yield b'\0' * (2 * tarfile.BLOCKSIZE + -end % tarfile.RECORDSIZE)
+
+
+class _Sink:
+    """Write-only, unseekable file object that collects zipfile's output until drained."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class ZipWriter:
+    """Streamed zip (sizes and CRCs in data descriptors, since the output cannot seek)."""
+
+    def __init__(self):
+        self.sink = _Sink()
+        self.zip = zipfile.ZipFile(self.sink, 'w', compression=zipfile.ZIP_DEFLATED)
+
+    def _info(self, name, obj, kind):
+        info = zipfile.ZipInfo(name, date_time=max(time.localtime(obj.updated_at.timestamp())[:6], (1980, 1, 1, 0, 0, 0)))
+        info.external_attr = (kind | permission_mode(obj.permissions)) << 16
+        return info
+
+    def directory(self, name, obj):
+        info = self._info(name + '/', obj, 0o040000)
+        info.external_attr |= 0x10
+        self.zip.writestr(info, b'')
+        yield self.sink.drain()
+
+    def file(self, name, obj, readable=True):
+        info = self._info(name, obj, 0o100000)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.file_size = obj.size if readable else 0
+        with self.zip.open(info, 'w', force_zip64=info.file_size >= zipfile.ZIP64_LIMIT) as out:
+            for data in _file_data(obj) if readable else ():
+                out.write(data)
+                chunk = self.sink.drain()
+                if chunk:
+                    yield chunk
+        yield self.sink.drain()
+
+    def close(self):
+        # Central directory
+        self.zip.close()
+        yield self.sink.drain()
+
+
+def _members(upload):
+    """(kind, path, size, mode, read) for every entry of a tar (any compression) or zip upload."""
+    upload.seek(0)
+    magic = upload.read(4)
+    upload.seek(0)
+    if magic[:2] == b'PK':
+        try:
+            archive = zipfile.ZipFile(upload)
+        except zipfile.BadZipFile as e:
+            raise ArchiveError(f'Not a valid zip archive: {e}')
+        for info in archive.infolist():
+            mode = (info.external_attr >> 16) & 0o777 or 0o700
+            kind = 'dir' if info.is_dir() else 'file'
+            yield kind, info.filename, info.file_size, mode, (lambda info=info: archive.read(info))
+        return
+    try:
+        archive = tarfile.open(fileobj=upload, mode='r|*')
+        for member in archive:
+            if member.isdir():
+                yield 'dir', member.name, 0, member.mode & 0o777, None
+            elif member.isfile():
+                yield 'file', member.name, member.size, member.mode & 0o777, (
+                    lambda member=member: archive.extractfile(member).read()
+                )
+            # Links, devices... have no counterpart here and are skipped
+            archive.members = []
+    except tarfile.TarError as e:
+        raise ArchiveError(f'Not a valid tar or zip archive: {e}')
+
+
+def _parts(name):
+    parts = [part for part in name.replace('\\', '/').split('/') if part not in ('', '.')]
+    # Nothing may land outside the target directory
+    return None if '..' in parts else parts
+
+
+def import_archive(user, upload, parent_id=None):
+    """
+    Create the tree stored in an uploaded tar/zip archive under directory
+    `parent_id` (top level when None). The archive is read one entry at a
+    time and the objects bulk-inserted (api.batch). The quota is checked
+    once, against the declared sizes of all the files, before anything is
+    written; the bytes actually stored are charged at the end. All or nothing.
+    """
+    declared = sum(size for kind, _, size, _, _ in _members(upload) if kind == 'file')
+    profile, _ = UserProfile.objects.get_or_create(user=user)
+    if profile.storage_used + declared > profile.storage_limit:
+        raise quota.QuotaExceeded(f'archive needs {declared} bytes')
+
+    batch = Batch(user)
+    stats = {'directories': 0, 'files': 0, 'skipped': 0}
+    # Relative directory path -> "$ref" of the directory created for it
+    folders = {(): parent_id}
+
+    def folder(parts, index, mode=None):
+        key = tuple(parts)
+        if key not in folders:
+            parent = folder(parts[:-1], index)
+            ref = '/'.join(parts)
+            op = {'op': 'create', 'name': parts[-1], 'is_directory': True, 'parent': parent, 'ref': ref}
+            if mode is not None:
+                op['permissions'] = permission_string(mode)
+            batch.apply(index, op)
+            folders[key] = f'${ref}'
+            stats['directories'] += 1
+        return folders[key]
+
+    with transaction.atomic():
+        for index, (kind, name, _, mode, read) in enumerate(_members(upload)):
+            parts = _parts(name)
+            if not parts:
+                stats['skipped'] += 1
+                continue
+            if kind == 'dir':
+                folder(parts, index, mode)
+                continue
+            batch.apply(index, {
+                'op': 'create',
+                'name': parts[-1],
+                'parent': folder(parts[:-1], index),
+                'content': read().decode('utf-8', errors='replace'),
+                'permissions': permission_string(mode),
+            })
+            stats['files'] += 1
+        batch.finish()
+    stats['bytes'] = batch.delta
+    return stats
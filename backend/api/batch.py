@@ -0,0 +1,318 @@
+import secrets
+
+from django.db import connection, transaction
+from django.db.models import CharField, Q, Sum, Value
+from django.db.models.functions import Cast, Concat
+from django.utils import timezone
+
+from . import caching, du, quota
+from .content import attach_new
+from .models import FileSystemObject, check_path_length
+
+OPS = ('create', 'move', 'chmod', 'delete')
+# Columns loaded for the objects a batch touches (never the content)
+FIELDS = ('id', 'name', 'is_directory', 'owner_id', 'parent_id', 'permissions', 'path', 'depth', 'size')
+PERMISSION_CHARS = set('rwx-')
+# A run of creates is written out once it holds this many objects or characters of content
+FLUSH_OBJECTS = 1000
+FLUSH_CHARS = 8 * 1024 * 1024
+
+
+class BatchError(Exception):
+    """An invalid operation; the whole batch is rolled back."""
+
+    def __init__(self, index, message):
+        super().__init__(message)
+        self.index = index
+
+
+class Batch:
+    """
+    An ordered list of filesystem operations run for one user in one
+    transaction:
+
+        {"op": "create", "name": "src", "is_directory": true, "parent": <id|null>, "ref": "src"}
+        {"op": "create", "name": "main.c", "parent": "$src", "content": "..."}
+        {"op": "move", "id": <id>, "parent": <id|null>, "name": "<optional>"}
+        {"op": "chmod", "id": <id>, "permissions": "rw-------"}
+        {"op": "delete", "id": <id>}
+
+    Objects are given by id, or as "$<ref>" for one created earlier in the
+    batch. Consecutive operations of a kind are written together: one
+    bulk_create per run of creates, one bulk_update per run of chmods and
+    file moves, one DELETE per table per run of deletes. A pending run is
+    written out early only when a later operation depends on it (e.g. a
+    create inside a directory created just before). Directory moves reroot
+    their subtree at once (see FileSystemObject.move_to).
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.objects = {}  # id -> loaded object, None if missing
+        self.refs = {}  # "$ref" name -> object created by this batch
+        self.deleted = set()  # paths of subtrees deleted by this batch
+        self.creates = []  # (object, content) waiting for bulk_create
+        self.pending_chars = 0  # characters of content in self.creates
+        self.updates = {}  # id -> set of fields waiting for bulk_update
+        self.deletes = []  # objects waiting for the subtree DELETE
+        self.rollups = []  # (ids, bytes, files) disk usage changes of pending file moves
+        self.written = []  # paths whose cached listings and reads are dropped at the end
+        self.delta = 0  # net bytes charged to the quota at the end
+
+    def run(self, ops):
+        """Apply `ops`; returns one result per operation. Raises BatchError or QuotaExceeded."""
+        if not isinstance(ops, list) or not ops:
+            raise BatchError(None, 'ops must be a non-empty list')
+        results = []
+        with transaction.atomic():
+            self.preload(ops)
+            for index, op in enumerate(ops):
+                results.append((op.get('op') if isinstance(op, dict) else None, self.apply(index, op)))
+            self.finish()
+        return [{'op': kind, 'id': obj.pk} for kind, obj in results]
+
+    def apply(self, index, op):
+        """Apply (or queue) one operation; returns the object it is about. Call inside a transaction."""
+        if not isinstance(op, dict) or op.get('op') not in OPS:
+            raise BatchError(index, f'op must be one of: {", ".join(OPS)}')
+        return getattr(self, f'do_{op["op"]}')(index, op)
+
+    def finish(self):
+        """Write out everything still queued and charge the net size change to the quota."""
+        self.flush()
+        quota.charge(self.user.id, self.delta)
+        caching.changed(self.user.id, self.written)
+
+    def preload(self, ops):
+        # Every object given by id, in one query per 500 ids
+        ids = set()
+        for op in ops:
+            if isinstance(op, dict):
+                for key in ('id', 'parent'):
+                    value = op.get(key)
+                    if isinstance(value, int) and not isinstance(value, bool):
+                        ids.add(value)
+        ids = sorted(ids)
+        for i in range(0, len(ids), 500):
+            for obj in FileSystemObject.objects.filter(owner=self.user, pk__in=ids[i:i + 500]).only(*FIELDS):
+                self.objects[obj.pk] = obj
+
+    def lookup(self, index, value, what):
+        if isinstance(value, str) and value.startswith('$'):
+            obj = self.refs.get(value[1:])
+        else:
+            try:
+                pk = int(value)
+            except (TypeError, ValueError):
+                raise BatchError(index, f'{what} must be an id or "$<ref>"')
+            if pk not in self.objects:
+                self.objects[pk] = FileSystemObject.objects.filter(owner=self.user, pk=pk).only(*FIELDS).first()
+            obj = self.objects[pk]
+        if obj is None or self.is_deleted(obj):
+            raise BatchError(index, f'{what} {value} not found')
+        if obj.pk is None:
+            # Created earlier in this batch: it needs its id from now on
+            self.flush_creates()
+        return obj
+
+    def is_deleted(self, obj):
+        return obj.path and any(obj.path.startswith(path) for path in self.deleted)
+
+    def parent(self, index, value):
+        if value is None:
+            return None
+        parent = self.lookup(index, value, 'parent')
+        if not parent.is_directory:
+            raise BatchError(index, 'parent must be a directory')
+        return parent
+
+    def start(self, kind):
+        # Write out pending runs of the other kinds, so operations apply in order
+        if kind != 'create':
+            self.flush_creates()
+        if kind != 'update':
+            self.flush_updates()
+        if kind != 'delete':
+            self.flush_deletes()
+
+    def flush(self):
+        self.flush_creates()
+        self.flush_updates()
+        self.flush_deletes()
+
+    def do_create(self, index, op):
+        name = op.get('name')
+        if not isinstance(name, str) or not name or '/' in name or len(name) > 255:
+            raise BatchError(index, 'name must be a non-empty name without "/"')
+        is_directory = bool(op.get('is_directory', False))
+        content = op.get('content') or ''
+        if not isinstance(content, str) or (is_directory and content):
+            raise BatchError(index, 'content must be text, and only for files')
+        permissions = self.permissions(index, op.get('permissions', 'rwx------'))
+        ref = op.get('ref')
+        if ref is not None and (not isinstance(ref, str) or ref in self.refs):
+            raise BatchError(index, 'ref must be a name not used by an earlier op')
+        parent = self.parent(index, op.get('parent'))
+        self.start('create')
+        obj = FileSystemObject(
+            name=name, is_directory=is_directory, owner=self.user, parent=parent, permissions=permissions,
+        )
+        self.creates.append((obj, content))
+        self.pending_chars += len(content)
+        if ref is not None:
+            self.refs[ref] = obj
+        if len(self.creates) >= FLUSH_OBJECTS or self.pending_chars >= FLUSH_CHARS:
+            # Bounds the memory held by a long run of creates (e.g. an archive import)
+            self.flush_creates()
+        return obj
+
+    def do_move(self, index, op):
+        obj = self.lookup(index, op.get('id'), 'id')
+        if 'parent' not in op:
+            raise BatchError(index, 'parent is required')
+        parent = self.parent(index, op['parent'])
+        name = op.get('name') or obj.name
+        if not isinstance(name, str) or '/' in name or len(name) > 255:
+            raise BatchError(index, 'name must be a name without "/"')
+        parent_path = parent.path if parent is not None else '/'
+        if obj.is_directory:
+            if parent_path.startswith(obj.path):
+                raise BatchError(index, 'Cannot move a directory into itself or one of its subdirectories')
+            # The subtree is rerooted by UPDATEs; pending writes go out first
+            self.flush()
+            old_path, old_depth = obj.path, obj.depth
+            try:
+                obj.move_to(parent, name=name)
+            except ValueError as e:
+                raise BatchError(index, str(e))
+            for other in self.known():
+                if other is not obj and other.path.startswith(old_path):
+                    other.path = obj.path + other.path[len(old_path):]
+                    other.depth += obj.depth - old_depth
+            return obj
+        try:
+            check_path_length(len(parent_path) + len(str(obj.pk)) + 1)
+        except ValueError as e:
+            raise BatchError(index, str(e))
+        self.start('update')
+        obj.parent, obj.name = parent, name
+        old_ancestors, new_ancestors = set(du.path_ids(obj.path)[:-1]), set(du.path_ids(parent_path))
+        self.rollups += [(old_ancestors - new_ancestors, -obj.size, -1), (new_ancestors - old_ancestors, obj.size, 1)]
+        self.written.append(obj.path)
+        obj.path = f'{parent_path}{obj.pk}/'
+        obj.depth = obj.path.count('/') - 2
+        self.written.append(obj.path)
+        self.objects[obj.pk] = obj
+        self.updates.setdefault(obj.pk, set()).update(('parent', 'name', 'path', 'depth'))
+        return obj
+
+    def do_chmod(self, index, op):
+        obj = self.lookup(index, op.get('id'), 'id')
+        permissions = self.permissions(index, op.get('permissions'))
+        self.start('update')
+        obj.permissions = permissions
+        self.written.append(obj.path)
+        self.objects[obj.pk] = obj
+        self.updates.setdefault(obj.pk, set()).add('permissions')
+        return obj
+
+    def do_delete(self, index, op):
+        obj = self.lookup(index, op.get('id'), 'id')
+        self.start('delete')
+        self.deletes.append(obj)
+        self.deleted.add(obj.path)
+        return obj
+
+    def permissions(self, index, value):
+        if not isinstance(value, str) or not 0 < len(value) <= 10 or set(value) - PERMISSION_CHARS:
+            raise BatchError(index, 'permissions must be up to 10 of "rwx-", e.g. "rwxr-x---"')
+        return value
+
+    def known(self):
+        yield from (obj for obj in self.objects.values() if obj is not None)
+        yield from (obj for obj in self.refs.values() if obj.pk is not None and obj.pk not in self.objects)
+
+    def flush_creates(self):
+        if not self.creates:
+            return
+        objs = [obj for obj, _ in self.creates]
+        # Content first, so the rows are inserted already pointing at it (and sized)
+        self.delta += attach_new(self.creates)
+        for obj in objs:
+            if not obj.is_directory:
+                obj.tree_size, obj.tree_files = obj.size, 1
+        # Placeholder paths, unique to this flush, find the new rows again to
+        # set their real paths (and their ids on databases whose bulk INSERT
+        # cannot return them, i.e. Oracle)
+        tag = f'~{secrets.token_hex(8)}/'
+        for i, obj in enumerate(objs):
+            obj.path = f'{tag}{i}'
+        FileSystemObject.objects.bulk_create(objs, batch_size=500)
+        if not connection.features.can_return_rows_from_bulk_insert:
+            ids = dict(FileSystemObject.objects.filter(path__startswith=tag).values_list('path', 'id'))
+            for obj in objs:
+                obj.pk = ids[obj.path]
+                obj._state.adding, obj._state.db = False, connection.alias
+        # path = <parent's path><own id>/ : one UPDATE per parent directory
+        parents = {}
+        for obj in objs:
+            parents.setdefault(obj.parent_id, obj.parent)
+        try:
+            for obj in objs:
+                if obj.parent is not None:
+                    check_path_length(len(obj.parent.path) + len(str(obj.pk)) + 1)
+        except ValueError as e:
+            # Ids are only known now; the whole batch is rolled back
+            raise BatchError(None, f'{obj.name}: {e}')
+        for parent_id, parent in parents.items():
+            parent_path, depth = (parent.path, parent.depth + 1) if parent is not None else ('/', 0)
+            FileSystemObject.objects.filter(path__startswith=tag, parent_id=parent_id).update(
+                path=Concat(Value(parent_path), Cast('id', CharField()), Value('/'), output_field=CharField()),
+                depth=depth,
+            )
+        for obj in objs:
+            parent_path = obj.parent.path if obj.parent is not None else '/'
+            obj.path = f'{parent_path}{obj.pk}/'
+            obj.depth = obj.path.count('/') - 2
+        du.roll_up([(du.path_ids(obj.path)[:-1], obj.size, 1) for obj in objs if not obj.is_directory])
+        self.written.extend(obj.path for obj in objs)
+        self.creates = []
+        self.pending_chars = 0
+
+    def flush_updates(self):
+        if not self.updates:
+            return
+        now = timezone.now()
+        objs = []
+        fields = {'updated_at'}
+        for pk, changed in self.updates.items():
+            obj = self.objects[pk]
+            obj.updated_at = now
+            objs.append(obj)
+            fields |= changed
+        FileSystemObject.objects.bulk_update(objs, sorted(fields), batch_size=500)
+        du.roll_up(self.rollups)
+        self.updates = {}
+        self.rollups = []
+
+    def flush_deletes(self):
+        if not self.deletes:
+            return
+        # Subtrees inside another deleted subtree go with it
+        paths = sorted({obj.path for obj in self.deletes})
+        roots = [path for i, path in enumerate(paths) if not any(path.startswith(p) for p in paths[:i])]
+        for i in range(0, len(roots), 100):
+            batch = roots[i:i + 100]
+            self.delta -= self.subtree_size(batch)
+            FileSystemObject.delete_trees(self.user.id, batch)
+        self.deletes = []
+
+    def subtree_size(self, paths):
+        match = Q()
+        for path in paths:
+            match |= Q(path__startswith=path)
+        return (
+            FileSystemObject.objects
+            .filter(match, owner=self.user, is_directory=False)
+            .aggregate(total=Sum('size'))['total']
+        ) or 0
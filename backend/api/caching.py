@@ -0,0 +1,83 @@
+import hashlib
+import secrets
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+# A version token outlives the entries cached under it; once it expires (or
+# is evicted) a new random one is drawn, so an old entry can never match again
+VERSION_TTL = 24 * 60 * 60
+
+
+def _cache():
+    return caches[getattr(settings, 'VFS_CACHE', 'default')]
+
+
+def _version_key(kind, user_id, pk):
+    return f'vfs:{kind}:{user_id}:{pk}:v'
+
+
+def _entry_key(kind, user_id, pk, etag):
+    tag = etag.strip('"')
+    return f'vfs:{kind}:{user_id}:{pk}:{tag}'
+
+
+def version(kind, user_id, pk):
+    """
+    Current version token of a user's directory listing (kind 'ls', pk the
+    parent id or None for the top level) or object read (kind 'obj').
+    """
+    cache = _cache()
+    key = _version_key(kind, user_id, pk)
+    token = cache.get(key)
+    if token is None:
+        token = secrets.token_hex(6)
+        # Concurrent first readers agree on whichever token was stored first
+        if not cache.add(key, token, timeout=VERSION_TTL):
+            token = cache.get(key) or token
+    return token
+
+
+def etag(kind, user_id, pk, variant):
+    """ETag of one representation (`variant`, e.g. the query string) of a listing or object."""
+    digest = hashlib.sha1(variant.encode('utf-8')).hexdigest()[:12]
+    return f'"{version(kind, user_id, pk)}-{digest}"'
+
+
+def not_modified(request, tag):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+    return if_none_match.strip() == '*' or tag in [t.strip() for t in if_none_match.split(',')]
+
+
+def get(kind, user_id, pk, tag):
+    """The entry cached for ETag `tag`, or None."""
+    return _cache().get(_entry_key(kind, user_id, pk, tag))
+
+
+def put(kind, user_id, pk, tag, entry):
+    _cache().set(_entry_key(kind, user_id, pk, tag), entry, timeout=getattr(settings, 'VFS_CACHE_TTL', 300))
+
+
+def changed(user_id, paths=(), ids=()):
+    """
+    Objects of a user were written: once the transaction commits, draw new
+    versions for the listings of the top level and of every directory on
+    `paths` (the entries and rollups they show changed), for the reads of the
+    objects at the end of `paths`, and for both of every object in `ids`
+    (e.g. a deleted subtree). Entries under the old versions are just never
+    read again.
+    """
+    from .du import path_ids
+
+    keys = {_version_key('ls', user_id, None)}
+    for path in paths:
+        pks = path_ids(path)
+        keys.update(_version_key('ls', user_id, pk) for pk in pks)
+        if pks:
+            keys.add(_version_key('obj', user_id, pks[-1]))
+    for pk in ids:
+        keys.update((_version_key('ls', user_id, pk), _version_key('obj', user_id, pk)))
+    transaction.on_commit(lambda: _cache().set_many(
+        {key: secrets.token_hex(6) for key in keys}, timeout=VERSION_TTL,
+    ))
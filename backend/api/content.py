@@ -0,0 +1,480 @@
+import hashlib
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Exists, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Substr
+from django.utils import timezone
+
+# File data is kept in blocks of this many characters (FILE_BLOCK_SIZE)
+DEFAULT_BLOCK_SIZE = 4096
+# Ids per IN (...) list; Oracle allows at most 1000
+IN_BATCH = 500
+
+
+def block_size():
+    return max(int(getattr(settings, 'FILE_BLOCK_SIZE', DEFAULT_BLOCK_SIZE)), 1)
+
+
+def _split(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def _batches(items, size=IN_BATCH):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _digest(data):
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def _adjust_refcounts(model, deltas):
+    """Apply {pk: delta} refcount changes with one UPDATE per distinct delta (per IN batch)."""
+    by_delta = {}
+    for pk, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(pk)
+    for delta, pks in by_delta.items():
+        for batch in _batches(pks):
+            model.objects.filter(pk__in=batch).update(refcount=F('refcount') + delta)
+
+
+def _intern(chunks):
+    """Blob ids for `chunks` (in order), creating missing blobs and taking one reference per use."""
+    from .models import Blob
+
+    digests = [_digest(chunk) for chunk in chunks]
+    known = {}
+    for batch in _batches(set(digests)):
+        known.update(Blob.objects.filter(digest__in=batch).values_list('digest', 'id'))
+    missing = {digest: chunk for digest, chunk in zip(digests, chunks) if digest not in known}
+    if missing:
+        # A concurrent writer may create the same blob: keep whichever row won
+        blobs = [
+            Blob(digest=digest, data=chunk, chars=len(chunk), newlines=chunk.count('\n'), nbytes=len(chunk.encode('utf-8')))
+            for digest, chunk in missing.items()
+        ]
+        if connection.features.supports_ignore_conflicts:
+            Blob.objects.bulk_create(blobs, ignore_conflicts=True)
+        else:
+            # Oracle: one INSERT each, a duplicate only rolls back its savepoint
+            for blob in blobs:
+                try:
+                    with transaction.atomic():
+                        blob.save()
+                except IntegrityError:
+                    pass
+        for batch in _batches(missing):
+            known.update(Blob.objects.filter(digest__in=batch).values_list('digest', 'id'))
+    ids = [known[digest] for digest in digests]
+    _adjust_refcounts(Blob, Counter(ids))
+    return ids
+
+
+def _add_blocks(body_id, first_index, chunks):
+    from .models import FileBlock
+
+    FileBlock.objects.bulk_create([
+        FileBlock(body_id=body_id, index=first_index + i, blob_id=blob_id)
+        for i, blob_id in enumerate(_intern(chunks))
+    ])
+
+
+def _drop_blocks(body_id):
+    from .models import Blob, FileBlock
+
+    blocks = FileBlock.objects.filter(body_id=body_id)
+    refs = dict(blocks.order_by().values('blob').annotate(n=Count('id')).values_list('blob', 'n'))
+    blocks.delete()
+    _adjust_refcounts(Blob, {blob_id: -n for blob_id, n in refs.items()})
+
+
+def _lock(fso):
+    from .models import FileSystemObject
+
+    return (
+        FileSystemObject.objects
+        .select_for_update()
+        .only('id', 'owner', 'content', 'body', 'block_size', 'block_count', 'size', 'path')
+        .get(pk=fso.pk)
+    )
+
+
+def _private_body(row, keep_blocks=True):
+    """
+    Make sure the locked file `row` has a body no other file uses (copy-on-write):
+    a shared body's block list is copied (the blobs stay shared), or just
+    dropped when the caller is about to replace the data anyway.
+    """
+    from . import search
+    from .models import Blob, FileBlock, FileBody
+
+    if row.body_id is not None:
+        body = FileBody.objects.select_for_update().get(pk=row.body_id)
+        if body.refcount <= 1:
+            return
+        FileBody.objects.filter(pk=body.pk).update(refcount=F('refcount') - 1)
+    shared_id = row.body_id
+    row.body_id = FileBody.objects.create(refcount=1).pk
+    if shared_id is not None and keep_blocks:
+        blocks = list(FileBlock.objects.filter(body_id=shared_id).values_list('index', 'blob_id'))
+        FileBlock.objects.bulk_create([
+            FileBlock(body_id=row.body_id, index=index, blob_id=blob_id) for index, blob_id in blocks
+        ])
+        _adjust_refcounts(Blob, Counter(blob_id for _, blob_id in blocks))
+        search.copy_index(shared_id, row.body_id)
+
+
+def _cached_blocks(fso):
+    # Blocks prefetched with Prefetch('body__blocks', FileBlock.objects.select_related('blob'))
+    from .models import FileSystemObject
+
+    if not FileSystemObject.body.is_cached(fso) or fso.body is None:
+        return None
+    if 'blocks' not in getattr(fso.body, '_prefetched_objects_cache', {}):
+        return None
+    return fso.body.blocks.all()
+
+
+def _block_data(fso, first=None, last=None):
+    from .models import FileBlock
+
+    blocks = FileBlock.objects.filter(body_id=fso.body_id)
+    if first is not None:
+        blocks = blocks.filter(index__gte=first)
+    if last is not None:
+        blocks = blocks.filter(index__lte=last)
+    return blocks.order_by('index').values_list('blob__data', flat=True)
+
+
+def _last_chars(fso, n):
+    """The last `n` characters of a block-stored file's data (the tail block may hold fewer)."""
+    if not fso.block_count:
+        return ''
+    first = max(fso.block_count - 1 - -(-n // fso.block_size), 0)
+    return ''.join(_block_data(fso, first, fso.block_count - 1))[-n:]
+
+
+def read_text(fso):
+    """The whole text of a file, block-stored or (legacy) inline."""
+    if not fso.body_id:
+        return fso.content or ''
+    cached = _cached_blocks(fso)
+    if cached is not None:
+        return ''.join(block.blob.data for block in cached)
+    return ''.join(_block_data(fso))
+
+
+def iter_text(fso):
+    """The text of a file one block at a time, without holding all of it in memory."""
+    if not fso.body_id:
+        yield fso.content or ''
+        return
+    cached = _cached_blocks(fso)
+    if cached is not None:
+        for block in cached:
+            yield block.blob.data
+        return
+    yield from _block_data(fso).iterator(chunk_size=64)
+
+
+def line_total(fso):
+    """Number of lines as the scheduler counts them ('\\n'-separated pieces, 0 when empty)."""
+    from .models import FileBlock
+
+    if not fso.body_id:
+        content = fso.content or ''
+        return len(content.split('\n')) if content else 0
+    if not fso.size:
+        return 0
+    newlines = FileBlock.objects.filter(body_id=fso.body_id).aggregate(n=Sum('blob__newlines'))['n']
+    return (newlines or 0) + 1
+
+
+def write_text(fso, text):
+    """Replace a file's content; returns the new size in bytes."""
+    from . import caching, du, search
+    from .models import FileSystemObject
+
+    size = block_size()
+    chunks = _split(text, size)
+    nbytes = len(text.encode('utf-8'))
+    now = timezone.now()
+    with transaction.atomic():
+        row = _lock(fso)
+        _private_body(row, keep_blocks=False)
+        _drop_blocks(row.body_id)
+        _add_blocks(row.body_id, 0, chunks)
+        search.index_body(row.body_id, text)
+        FileSystemObject.objects.filter(pk=fso.pk).update(
+            content=None, body_id=row.body_id, block_size=size, block_count=len(chunks), size=nbytes, updated_at=now,
+        )
+        du.resized(row.path, nbytes - row.size)
+        caching.changed(row.owner_id, [row.path])
+    fso.content, fso.body_id, fso.block_size, fso.block_count, fso.size, fso.updated_at = (
+        None, row.body_id, size, len(chunks), nbytes, now,
+    )
+    return nbytes
+
+
+def attach_new(files):
+    """
+    Store the content of files that are about to be bulk-created
+    ([(fso, text), ...], rows not inserted yet) and point them at it: the
+    chunks of all of them are interned together and the blocks written in
+    bulk. Returns the total size in bytes.
+    """
+    from . import search
+    from .models import FileBlock, FileBody
+
+    files = [(fso, text) for fso, text in files if text]
+    if not files:
+        return 0
+    size = block_size()
+    bodies = [FileBody(refcount=1) for _ in files]
+    if connection.features.can_return_rows_from_bulk_insert:
+        FileBody.objects.bulk_create(bodies, batch_size=500)
+    else:
+        for body in bodies:
+            body.save()
+    chunks = [_split(text, size) for _, text in files]
+    blob_ids = iter(_intern([chunk for file_chunks in chunks for chunk in file_chunks]))
+    FileBlock.objects.bulk_create([
+        FileBlock(body_id=body.pk, index=index, blob_id=next(blob_ids))
+        for body, file_chunks in zip(bodies, chunks)
+        for index in range(len(file_chunks))
+    ], batch_size=500)
+    search.index_new({body.pk: text for (_, text), body in zip(files, bodies)})
+    total = 0
+    for (fso, text), body, file_chunks in zip(files, bodies, chunks):
+        fso.content, fso.body_id, fso.block_size, fso.block_count = None, body.pk, size, len(file_chunks)
+        fso.size = len(text.encode('utf-8'))
+        total += fso.size
+    return total
+
+
+def append_text(fso, text):
+    """
+    Append to a file touching only its tail block (and the new ones). Returns
+    the number of bytes added. A legacy inline file is converted first, a
+    body shared with copies is made private first.
+    """
+    from . import caching, du, search
+    from .models import Blob, FileBlock, FileSystemObject
+
+    added = len(text.encode('utf-8'))
+    with transaction.atomic():
+        # Serializes writers of the same file
+        row = _lock(fso)
+        if not row.body_id:
+            write_text(row, row.content or '')
+        if not text:
+            return 0
+        _private_body(row)
+        size, count = row.block_size, row.block_count
+        # The index also needs the sequences running from the old end into the new text
+        search.extend_body(row.body_id, _last_chars(row, search.GRAM - 1), text)
+        if count:
+            tail = FileBlock.objects.select_related('blob').get(body_id=row.body_id, index=count - 1)
+            room = size - tail.blob.chars
+            if room > 0:
+                head, text = text[:room], text[room:]
+                [blob_id] = _intern([tail.blob.data + head])
+                FileBlock.objects.filter(pk=tail.pk).update(blob_id=blob_id)
+                _adjust_refcounts(Blob, {tail.blob_id: -1})
+        chunks = _split(text, size)
+        _add_blocks(row.body_id, count, chunks)
+        now = timezone.now()
+        FileSystemObject.objects.filter(pk=fso.pk).update(
+            body_id=row.body_id, size=F('size') + added, block_count=count + len(chunks), updated_at=now,
+        )
+        du.resized(row.path, added)
+        caching.changed(row.owner_id, [row.path])
+    fso.content, fso.body_id, fso.block_size, fso.block_count, fso.size, fso.updated_at = (
+        None, row.body_id, size, count + len(chunks), row.size + added, now,
+    )
+    return added
+
+
+def copy_file(src, **fields):
+    """
+    New file with the same data as `src`, sharing its body: O(1) whatever the
+    size. `fields` are the new row's name, owner, parent, permissions...
+    """
+    from . import caching, du
+    from .models import FileBody, FileSystemObject
+
+    with transaction.atomic():
+        row = _lock(src)
+        if not row.body_id:
+            # Legacy inline content has to become a body before it can be shared
+            write_text(row, row.content or '')
+        FileBody.objects.filter(pk=row.body_id).update(refcount=F('refcount') + 1)
+        copy = FileSystemObject(is_directory=False, **fields)
+        copy.save()
+        FileSystemObject.objects.filter(pk=copy.pk).update(
+            body_id=row.body_id, block_size=row.block_size, block_count=row.block_count, size=row.size,
+        )
+        du.resized(copy.path, row.size)
+        caching.changed(copy.owner_id, [copy.path])
+    copy.body_id, copy.block_size, copy.block_count, copy.size = row.body_id, row.block_size, row.block_count, row.size
+    return copy
+
+
+def release_bodies(files):
+    """Drop the body references of the files in queryset `files`, which are about to be deleted."""
+    from .models import FileBody
+
+    refs = files.filter(body__isnull=False).order_by().values('body').annotate(n=Count('id')).values_list('body', 'n')
+    _adjust_refcounts(FileBody, {body_id: -n for body_id, n in refs})
+
+
+def collect_garbage():
+    """Delete bodies no file uses and blobs no block uses. Returns (bodies, blobs) removed."""
+    from .models import Blob, FileBlock, FileBody, FileSystemObject
+
+    dead_bodies = list(
+        FileBody.objects
+        .filter(refcount=0)
+        .exclude(Exists(FileSystemObject.objects.filter(body=OuterRef('pk'))))
+        .values_list('pk', flat=True)
+    )
+    for batch in _batches(dead_bodies):
+        with transaction.atomic():
+            blocks = FileBlock.objects.filter(body__in=batch)
+            refs = dict(blocks.order_by().values('blob').annotate(n=Count('id')).values_list('blob', 'n'))
+            blocks.delete()
+            _adjust_refcounts(Blob, {blob_id: -n for blob_id, n in refs.items()})
+            FileBody.objects.filter(pk__in=batch).delete()
+    blobs, _ = (
+        Blob.objects
+        .filter(refcount=0)
+        .exclude(Exists(FileBlock.objects.filter(blob=OuterRef('pk'))))
+        .delete()
+    )
+    return len(dead_bodies), blobs
+
+
+def recount_references():
+    """Recompute every refcount from the actual references (repair after out-of-band deletes)."""
+    from .models import Blob, FileBlock, FileBody, FileSystemObject
+
+    def count_of(qs, field):
+        return Coalesce(Subquery(
+            qs.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(n=Count('id')).values('n')
+        ), Value(0))
+
+    with transaction.atomic():
+        FileBody.objects.update(refcount=count_of(FileSystemObject.objects, 'body'))
+        Blob.objects.update(refcount=count_of(FileBlock.objects, 'blob'))
+
+
+def block_map(fso):
+    """(chars, newlines, nbytes) of every block, in order; small rows, no data."""
+    from .models import FileBlock
+
+    return list(
+        FileBlock.objects
+        .filter(body_id=fso.body_id)
+        .order_by('index')
+        .values_list('blob__chars', 'blob__newlines', 'blob__nbytes')
+    )
+
+
+def read_chars(fso, start, end):
+    """Characters [start, end) of a file, reading only the blocks that hold them."""
+    from .models import FileSystemObject
+
+    if end <= start:
+        return ''
+    if not fso.body_id:
+        # Legacy inline content: let the database cut it out
+        return (
+            FileSystemObject.objects
+            .filter(pk=fso.pk)
+            .annotate(part=Substr('content', start + 1, end - start))
+            .values_list('part', flat=True)
+            .get()
+        ) or ''
+    size = fso.block_size
+    first, last = start // size, (end - 1) // size
+    data = ''.join(_block_data(fso, first, last))
+    base = first * size
+    return data[start - base:end - base]
+
+
+def read_bytes(fso, offset, end):
+    """Bytes [offset, end) of a file (as text; a cut multi-byte character is replaced)."""
+    if end <= offset:
+        return ''
+    if not fso.body_id:
+        raw = read_text(fso).encode('utf-8')
+        return raw[offset:end].decode('utf-8', errors='replace')
+    first = last = None
+    base = pos = 0
+    for index, (_, _, nbytes) in enumerate(block_map(fso)):
+        if first is None and pos + nbytes > offset:
+            first, base = index, pos
+        pos += nbytes
+        if pos >= end:
+            last = index
+            break
+    if first is None:
+        return ''
+    raw = ''.join(_block_data(fso, first, last)).encode('utf-8')
+    return raw[offset - base:end - base].decode('utf-8', errors='replace')
+
+
+def read_lines(fso, first, count=None, tail=None):
+    """
+    `count` lines from 0-based line `first` (to the end when None), or the last
+    `tail` lines. Returns (text, first, last, total) with lines first..last-1.
+    A newline at the very end does not start another line.
+    """
+    if not fso.body_id:
+        text = read_text(fso)
+        lines = text.split('\n') if text else []
+        if lines and lines[-1] == '' and text.endswith('\n'):
+            lines.pop()
+        total = len(lines)
+        first, last = _clamp(first, count, tail, total)
+        return '\n'.join(lines[first:last]), first, last, total
+
+    blocks = block_map(fso)
+    chars = sum(block[0] for block in blocks)
+    newlines = sum(block[1] for block in blocks)
+    ends_with_newline = chars > 0 and read_chars(fso, chars - 1, chars) == '\n'
+    total = 0 if chars == 0 else newlines + 1 - ends_with_newline
+    first, last = _clamp(first, count, tail, total)
+    if first >= last:
+        return '', first, last, total
+    # Line n starts after the n-th newline and ends at the (n + 1)-th (or the end)
+    start = 0 if first == 0 else _newline_offset(fso, blocks, first) + 1
+    end = chars if last > newlines else _newline_offset(fso, blocks, last)
+    return read_chars(fso, start, end), first, last, total
+
+
+def _clamp(first, count, tail, total):
+    if tail is not None:
+        first = max(total - tail, 0)
+        count = tail
+    first = min(max(first, 0), total)
+    last = total if count is None else min(first + max(count, 0), total)
+    return first, max(last, first)
+
+
+def _newline_offset(fso, blocks, n):
+    """Character offset of the n-th (1-based) newline of a block-stored file."""
+    seen = 0
+    for index, (_, newlines, _) in enumerate(blocks):
+        if seen + newlines >= n:
+            data = _block_data(fso, index, index).get()
+            pos = -1
+            for _ in range(n - seen):
+                pos = data.index('\n', pos + 1)
+            return index * fso.block_size + pos
+        seen += newlines
+    raise ValueError(f'file has only {seen} newlines')
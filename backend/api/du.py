@@ -0,0 +1,166 @@
+from django.db import transaction
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Greatest
+
+# Ids per IN (...) list; Oracle allows at most 1000
+IN_BATCH = 500
+ORDERS = ('path', 'size')
+
+
+def path_ids(path):
+    """'/3/17/42/' -> [3, 17, 42]: the object's ancestors, then itself."""
+    return [int(pk) for pk in path.strip('/').split('/') if pk]
+
+
+def _plus(field, delta):
+    # Shrinking stops at 0, so a drifted rollup cannot break the unsigned column
+    return F(field) + delta if delta >= 0 else Greatest(F(field) + delta, Value(0))
+
+
+def roll_up(changes):
+    """
+    Apply (ids, bytes, files) changes to the rollups of the objects `ids`,
+    usually an object's ancestors (with the object itself when its own size
+    changed). Changes are summed per object first, then written with one
+    UPDATE per distinct (bytes, files) per IN batch: a write to one file is
+    one UPDATE of its path, a bulk insert into one directory too.
+    """
+    from .models import FileSystemObject
+
+    totals = {}
+    for ids, nbytes, files in changes:
+        if nbytes or files:
+            for pk in ids:
+                old_bytes, old_files = totals.get(pk, (0, 0))
+                totals[pk] = (old_bytes + nbytes, old_files + files)
+    by_change = {}
+    for pk, change in totals.items():
+        if change != (0, 0):
+            by_change.setdefault(change, []).append(pk)
+    for (nbytes, files), pks in by_change.items():
+        # Rows are always locked in id order, so concurrent writers cannot deadlock on them
+        pks.sort()
+        for i in range(0, len(pks), IN_BATCH):
+            FileSystemObject.objects.filter(pk__in=pks[i:i + IN_BATCH]).update(
+                tree_size=_plus('tree_size', nbytes), tree_files=_plus('tree_files', files),
+            )
+
+
+def resized(path, delta):
+    """A file's size changed by `delta` bytes."""
+    roll_up([(path_ids(path), delta, 0)])
+
+
+def moved(pk, old_path, new_path, totals=None):
+    """
+    Object `pk` (and its subtree) moved from old_path to new_path: its totals
+    leave the old ancestors and join the new ones; those common to both are
+    untouched. A new object has no old_path. `totals` is (bytes, files) when
+    known, otherwise read from the row.
+    """
+    from .models import FileSystemObject
+
+    if totals is None:
+        totals = FileSystemObject.objects.filter(pk=pk).values_list('tree_size', 'tree_files').get()
+    old, new = set(path_ids(old_path)[:-1]), set(path_ids(new_path)[:-1])
+    nbytes, files = totals
+    roll_up([(old - new, -nbytes, -files), (new - old, nbytes, files)])
+
+
+def removed(owner_id, paths):
+    """The subtrees at `paths` are about to be deleted: their totals leave their ancestors."""
+    from .models import FileSystemObject
+
+    roots = []
+    for i in range(0, len(paths), IN_BATCH):
+        roots.extend(
+            FileSystemObject.objects
+            .filter(owner_id=owner_id, path__in=paths[i:i + IN_BATCH])
+            .values_list('path', 'tree_size', 'tree_files')
+        )
+    roll_up([(path_ids(path)[:-1], -nbytes, -files) for path, nbytes, files in roots])
+
+
+def usage(user, root=None, depth=1, files=False, order='path', limit=None):
+    """
+    du: `root` (the top level when None) and the directories below it down to
+    `depth` levels (files too with `files`), each with the bytes and number of
+    files in its subtree, straight from the rollups. order='size' lists the
+    biggest first, which the (owner, tree_size) index serves directly.
+    Returns (totals of root, [entries]).
+    """
+    from .models import FileSystemObject
+
+    entries = FileSystemObject.objects.filter(owner=user)
+    if root is not None:
+        entries = entries.filter(path__startswith=root.path, depth__lte=root.depth + depth)
+        base = root.depth
+    else:
+        entries = entries.filter(depth__lt=depth)
+        base = -1
+    if not files:
+        entries = entries.filter(is_directory=True)
+    entries = entries.order_by('-tree_size', 'path') if order == 'size' else entries.order_by('path')
+    if limit is not None:
+        entries = entries[:limit]
+    rows = list(entries.values_list('id', 'name', 'path', 'depth', 'is_directory', 'tree_size', 'tree_files'))
+    paths = FileSystemObject.name_paths([(pk, path, name) for pk, name, path, *_ in rows])
+    result = [
+        {
+            'id': pk, 'name': name, 'path': paths[pk], 'depth': obj_depth - base,
+            'is_directory': is_directory, 'size': nbytes, 'files': file_count,
+        }
+        for pk, name, path, obj_depth, is_directory, nbytes, file_count in rows
+    ]
+    if root is not None:
+        totals = FileSystemObject.objects.filter(pk=root.pk).values_list('tree_size', 'tree_files').get()
+    else:
+        top = FileSystemObject.objects.filter(owner=user, depth=0).aggregate(size=Sum('tree_size'), files=Sum('tree_files'))
+        totals = (top['size'] or 0, top['files'] or 0)
+    return {'size': totals[0], 'files': totals[1]}, result
+
+
+def expected(user_id):
+    """{id: (bytes, files)} every object of a user should carry, computed from the file sizes."""
+    from .models import FileSystemObject
+
+    totals = {}
+    objects = FileSystemObject.objects.filter(owner_id=user_id).values_list('id', 'path', 'is_directory', 'size')
+    for pk, path, is_directory, size in objects.iterator(chunk_size=2000):
+        totals.setdefault(pk, (0, 0))
+        if not is_directory:
+            for ancestor in path_ids(path):
+                nbytes, files = totals.get(ancestor, (0, 0))
+                totals[ancestor] = (nbytes + size, files + 1)
+    return totals
+
+
+def reconcile(user_ids=None):
+    """
+    Recompute the rollups of the users' objects (all users when None) from
+    the file sizes, writing only the ones that drifted. Returns the number
+    of objects corrected.
+    """
+    from django.contrib.auth.models import User
+    from . import caching
+    from .models import FileSystemObject
+
+    users = User.objects.all() if user_ids is None else User.objects.filter(pk__in=user_ids)
+    corrected = 0
+    for user_id in users.values_list('pk', flat=True).iterator():
+        with transaction.atomic():
+            totals = expected(user_id)
+            drifted = [
+                FileSystemObject(pk=pk, path=path, tree_size=totals[pk][0], tree_files=totals[pk][1])
+                for pk, path, nbytes, files in (
+                    FileSystemObject.objects
+                    .filter(owner_id=user_id)
+                    .values_list('id', 'path', 'tree_size', 'tree_files')
+                    .iterator(chunk_size=2000)
+                )
+                if pk in totals and totals[pk] != (nbytes, files)
+            ]
+            FileSystemObject.objects.bulk_update(drifted, ['tree_size', 'tree_files'], batch_size=500)
+            caching.changed(user_id, [obj.path for obj in drifted])
+        corrected += len(drifted)
+    return corrected
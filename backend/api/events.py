@@ -0,0 +1,157 @@
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import deque
+
+
+class _Ring:
+    """Bounded event buffer that remembers the newest id it had to drop."""
+
+    __slots__ = ('events', 'dropped')
+
+    def __init__(self, size, dropped):
+        self.events = deque(maxlen=size)
+        # Clients that saw anything up to this id can no longer be caught up
+        self.dropped = dropped
+
+    def append(self, event):
+        if len(self.events) == self.events.maxlen:
+            self.dropped = self.events[0]['id']
+        self.events.append(event)
+
+
+class EventBus:
+    """
+    Scheduler/memory event fan-out with a bounded ring buffer per user.
+
+    Every event gets a global, increasing id. Events about a process go to
+    its owner's ring; frame-table deltas concern the shared RAM and go to
+    every ring. A client that reconnects with the last id it saw replays
+    whatever is still in its ring, or is told to reset if the ring has
+    already wrapped past that id.
+
+    Publishers are scheduler threads; readers are either threads (WSGI) that
+    block on a condition or coroutines (ASGI) woken through their loop.
+    """
+
+    def __init__(self, ring_size=512):
+        self.ring_size = ring_size
+        self._cond = threading.Condition()
+        self._ids = itertools.count(1)
+        self._last_id = 0
+        self._rings = {}
+        self._waiters = set()
+
+    def _ring(self, user_id):
+        ring = self._rings.get(user_id)
+        if ring is None:
+            # A new ring knows nothing that happened before it existed
+            ring = self._rings[user_id] = _Ring(self.ring_size, self._last_id)
+        return ring
+
+    def publish(self, kind, data, user_id=None):
+        """Record an event for `user_id`, or for every known user when None."""
+        with self._cond:
+            event_id = next(self._ids)
+            event = {'id': event_id, 'type': kind, 'ts': time.time(), 'data': data}
+            if user_id is None:
+                for ring in self._rings.values():
+                    ring.append(event)
+            else:
+                self._ring(user_id).append(event)
+            self._last_id = event_id
+            self._cond.notify_all()
+            waiters = list(self._waiters)
+        for loop, flag in waiters:
+            loop.call_soon_threadsafe(flag.set)
+        return event_id
+
+    def subscribe(self, user_id):
+        """Make sure `user_id` has a ring (so nothing is missed from now on); returns the current id."""
+        with self._cond:
+            self._ring(user_id)
+            return self._last_id
+
+    @property
+    def last_id(self):
+        with self._cond:
+            return self._last_id
+
+    def since(self, user_id, last_id):
+        """
+        Events for `user_id` newer than `last_id`: (events, complete). complete
+        is False when the ring no longer reaches back to `last_id`, or when the
+        id is from before a server restart.
+        """
+        with self._cond:
+            ring = self._ring(user_id)
+            events = [event for event in ring.events if event['id'] > last_id]
+            return events, ring.dropped <= last_id <= self._last_id
+
+    def wait(self, last_id, timeout):
+        """Block the calling thread until an event newer than `last_id` is published."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._last_id > last_id, timeout)
+
+    async def wait_async(self, last_id, timeout):
+        flag = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), flag)
+        with self._cond:
+            if self._last_id > last_id:
+                return True
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(flag.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._cond:
+                self._waiters.discard(waiter)
+
+    def read(self, user_id, last_id):
+        """
+        Everything newer than `last_id` for `user_id` as one SSE chunk. Returns
+        (chunk, last_id, cursor); wait on `cursor`, which also covers events
+        that went to other users' rings.
+        """
+        cursor = self.last_id
+        events, complete = self.since(user_id, last_id)
+        if not complete:
+            # Too far behind to replay: the client has to take a fresh snapshot
+            return format_sse({'id': cursor, 'type': 'reset', 'data': {}}), cursor, cursor
+        if not events:
+            return '', last_id, cursor
+        return ''.join(format_sse(event) for event in events), events[-1]['id'], max(cursor, events[-1]['id'])
+
+    def stream(self, user_id, last_id, keepalive=15):
+        """SSE generator for WSGI servers: one blocked thread per client."""
+        while True:
+            chunk, last_id, cursor = self.read(user_id, last_id)
+            if chunk:
+                yield chunk
+            if not self.wait(cursor, keepalive):
+                yield ': keepalive\n\n'
+
+    async def astream(self, user_id, last_id, keepalive=15):
+        """SSE generator for ASGI servers: waits on the event loop, no thread per client."""
+        while True:
+            chunk, last_id, cursor = self.read(user_id, last_id)
+            if chunk:
+                yield chunk
+            if not await self.wait_async(cursor, keepalive):
+                yield ': keepalive\n\n'
+
+
+def format_sse(event):
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+
+def _default_bus():
+    from django.conf import settings
+    return EventBus(ring_size=getattr(settings, 'EVENT_RING_SIZE', 512))
+
+
+EVENTS = _default_bus()
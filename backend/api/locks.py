@@ -0,0 +1,192 @@
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+SHARED = 'shared'
+EXCLUSIVE = 'exclusive'
+MODES = (SHARED, EXCLUSIVE)
+
+
+class LockTimeout(Exception):
+    """The lock could not be granted within the timeout (at once for a try-lock)."""
+
+
+class LockManager:
+    """
+    Reader/writer file locks kept in the database (api.models.FileLock), so
+    every worker process sees the same locks.
+
+    Any number of shared holders, or one exclusive holder. Requests are
+    granted in arrival order: a request waits behind an earlier incompatible
+    one, so a queued writer is not starved by new readers. Every operation on
+    a file's locks runs in one transaction serialized on the file row (row
+    lock; on SQLite the transaction's first write takes the database write
+    lock). Held locks and waiting requests carry a lease and are dropped once
+    it expires, so a crashed holder cannot keep a file locked.
+
+    Waiters poll with a short backoff; releases in this process wake them
+    at once. With SQLite, use 'OPTIONS': {'transaction_mode': 'IMMEDIATE'}
+    so concurrent read-then-write transactions queue instead of failing with
+    "database is locked".
+    """
+
+    # Poll interval bounds (seconds) while waiting for a lock
+    MIN_POLL = 0.01
+    MAX_POLL = 0.2
+    # Lease of a waiting request, renewed at every poll
+    WAIT_LEASE = 5.0
+
+    def __init__(self, lease=30.0, wait=2.0):
+        self.lease = lease
+        self.wait = wait
+        self._cond = threading.Condition()
+
+    def acquire(self, file_id, mode, owner=None, timeout=None, lease=None):
+        """
+        Lock a file; returns the lock token. Waits up to `timeout` seconds
+        (the default wait when None, a try-lock when 0) and raises
+        LockTimeout if the lock is still not granted.
+        """
+        if mode not in MODES:
+            raise ValueError(f'mode must be one of {", ".join(MODES)}')
+        timeout = self.wait if timeout is None else max(timeout, 0)
+        lease = self.lease if lease is None else lease
+        token = secrets.token_hex(16)
+        deadline = time.monotonic() + timeout
+        delay = self.MIN_POLL
+        while True:
+            queue = timeout > 0 and time.monotonic() < deadline
+            if self._attempt(file_id, mode, owner, token, lease, queue):
+                return token
+            remaining = deadline - time.monotonic()
+            if not queue or remaining <= 0:
+                self._forget(token)
+                raise LockTimeout(f'{mode} lock on file {file_id} not granted')
+            with self._cond:
+                self._cond.wait(min(delay, remaining))
+            delay = min(delay * 2, self.MAX_POLL)
+
+    def try_acquire(self, file_id, mode, owner=None, lease=None):
+        """Non-blocking acquire: the token, or None if the lock is not free right now."""
+        try:
+            return self.acquire(file_id, mode, owner, timeout=0, lease=lease)
+        except LockTimeout:
+            return None
+
+    def release(self, token):
+        """Drop a held lock (or a waiting request); False if it was not found (e.g. expired)."""
+        from .models import FileLock
+
+        deleted, _ = FileLock.objects.filter(token=token).delete()
+        self._wake()
+        return bool(deleted)
+
+    def renew(self, token, lease=None):
+        """Extend a held lock's lease; False if it has already expired."""
+        from .models import FileLock
+
+        now = timezone.now()
+        lease = self.lease if lease is None else lease
+        return bool(
+            FileLock.objects
+            .filter(token=token, granted=True, expires_at__gte=now)
+            .update(expires_at=now + timedelta(seconds=lease))
+        )
+
+    def holds(self, token, file_id, mode=None, owner=None):
+        """True if `token` is a live lock granted on the file (of `mode`, to `owner`)."""
+        from .models import FileLock
+
+        locks = FileLock.objects.filter(token=token, file_id=file_id, granted=True, expires_at__gte=timezone.now())
+        if mode is not None:
+            locks = locks.filter(mode=mode)
+        if owner is not None:
+            locks = locks.filter(owner=owner)
+        return locks.exists()
+
+    def locks(self, file_id):
+        """Live held locks and waiting requests of a file, in grant order."""
+        from .models import FileLock
+
+        return FileLock.objects.filter(file_id=file_id, expires_at__gte=timezone.now()).order_by('id')
+
+    @contextmanager
+    def hold(self, file_id, mode, owner=None, timeout=None, lease=None):
+        token = self.acquire(file_id, mode, owner, timeout=timeout, lease=lease)
+        try:
+            yield token
+        finally:
+            self.release(token)
+
+    def _attempt(self, file_id, mode, owner, token, lease, queue):
+        """
+        One grant attempt. Grants the lock if no earlier request conflicts;
+        otherwise enqueues (or keeps alive) the request when `queue` is set.
+        """
+        from .models import FileLock, FileSystemObject
+
+        now = timezone.now()
+        with transaction.atomic():
+            # Writing first takes SQLite's write lock before anything is read
+            FileLock.objects.filter(file_id=file_id, expires_at__lt=now).delete()
+            # No LIMIT: Oracle refuses FOR UPDATE on a row-limited query
+            if not list(FileSystemObject.objects.select_for_update().filter(pk=file_id).values_list('pk', flat=True)):
+                raise FileSystemObject.DoesNotExist(f'No file {file_id}')
+            ahead = []
+            mine = None
+            for lock_id, lock_mode, lock_token in (
+                FileLock.objects.filter(file_id=file_id).order_by('id').values_list('id', 'mode', 'token')
+            ):
+                if lock_token == token:
+                    mine = lock_id
+                    break
+                ahead.append(lock_mode)
+            if mode == EXCLUSIVE:
+                grantable = not ahead
+            else:
+                grantable = EXCLUSIVE not in ahead
+            if grantable:
+                expires_at = now + timedelta(seconds=lease)
+                if mine is None:
+                    FileLock.objects.create(
+                        file_id=file_id, owner=owner, mode=mode, token=token, granted=True, expires_at=expires_at,
+                    )
+                else:
+                    FileLock.objects.filter(pk=mine).update(granted=True, expires_at=expires_at)
+                return True
+            if queue:
+                expires_at = now + timedelta(seconds=self.WAIT_LEASE)
+                if mine is None:
+                    FileLock.objects.create(
+                        file_id=file_id, owner=owner, mode=mode, token=token, expires_at=expires_at,
+                    )
+                else:
+                    FileLock.objects.filter(pk=mine).update(expires_at=expires_at)
+            return False
+
+    def _forget(self, token):
+        from .models import FileLock
+
+        if FileLock.objects.filter(token=token).delete()[0]:
+            # A request that gave up may have been the one others queued behind
+            self._wake()
+
+    def _wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+
+def _default_lock_manager():
+    from django.conf import settings
+    return LockManager(
+        lease=getattr(settings, 'FILE_LOCK_LEASE', 30.0),
+        wait=getattr(settings, 'FILE_LOCK_WAIT', 2.0),
+    )
+
+
+LOCKS = _default_lock_manager()
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from api.retention import archive_finished
+
+
+class Command(BaseCommand):
+    help = 'Move finished processes older than the retention window into the process archive.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, dest='older_than',
+            help='Retention window in seconds (default: PROCESS_RETENTION).',
+        )
+
+    def handle(self, *args, **options):
+        archived = archive_finished(options['older_than'])
+        self.stdout.write(self.style.SUCCESS(f'Done: {archived} process(es) archived.'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from api.content import collect_garbage, recount_references
+
+
+class Command(BaseCommand):
+    help = 'Delete file bodies and blobs that are no longer referenced.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recount', action='store_true',
+            help='Recompute all reference counts from the actual references first.',
+        )
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            recount_references()
+            self.stdout.write('Reference counts recomputed')
+        bodies, blobs = collect_garbage()
+        self.stdout.write(self.style.SUCCESS(f'Done: {bodies} body(ies) and {blobs} blob(s) removed.'))
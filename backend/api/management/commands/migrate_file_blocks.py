@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from api.content import write_text
+from api.models import FileSystemObject
+
+
+class Command(BaseCommand):
+    help = 'Move file content still stored inline (FileSystemObject.content) into block storage (FileBody/Blob).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        converted = 0
+        while True:
+            batch = list(
+                FileSystemObject.objects
+                .filter(is_directory=False, body__isnull=True)
+                .order_by('id')[:options['batch_size']]
+            )
+            if not batch:
+                break
+            for fso in batch:
+                # Converts even empty files, so each row is visited once
+                write_text(fso, fso.content or '')
+            converted += len(batch)
+            self.stdout.write(f'{converted} file(s) converted')
+        self.stdout.write(self.style.SUCCESS(f'Done: {converted} file(s) moved to blocks.'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Recompute the search (trigram) index of every file body from its data.'
+
+    def handle(self, *args, **options):
+        bodies = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Done: {bodies} body(ies) indexed.'))
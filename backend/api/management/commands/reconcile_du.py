@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.du import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Recompute the disk usage rollups (subtree sizes and file counts) from the file sizes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users', help='Only this user id (repeatable).')
+
+    def handle(self, *args, **options):
+        corrected = reconcile(options['users'])
+        self.stdout.write(self.style.SUCCESS(f'Done: rollups of {corrected} object(s) corrected.'))
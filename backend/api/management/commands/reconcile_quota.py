@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.quota import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recompute users' storage_used from the sizes of their files."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users', help='Only this user id (repeatable).')
+
+    def handle(self, *args, **options):
+        corrected = reconcile(options['users'])
+        self.stdout.write(self.style.SUCCESS(f'Done: storage usage of {corrected} user(s) corrected.'))
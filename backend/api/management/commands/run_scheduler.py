@@ -0,0 +1,43 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.quota import start_reconciler
+from api.retention import start_archiver
+from api.runqueue import RUN_QUEUE
+from api.scheduler import start_scheduler
+from api.workers import register, start_heartbeat, unregister
+
+
+class Command(BaseCommand):
+    help = (
+        'Run a standalone scheduler worker: its simulated CPUs claim Ready processes from the '
+        'database, so any number of workers can run beside the web server (and each other).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--name', help='Worker name (default: <hostname>-<pid>).')
+        parser.add_argument(
+            '--maintenance', action='store_true',
+            help='Also run the quota reconciler and the process archiver (in one worker only).',
+        )
+
+    def handle(self, *args, **options):
+        name = register(options['name'])
+        lost = threading.Event()
+        start_heartbeat(name, lost)
+        start_scheduler(worker=name)
+        if options['maintenance']:
+            start_reconciler()
+            start_archiver()
+        # Stop the same way on SIGTERM (process managers) as on Ctrl-C
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        self.stdout.write(f'Scheduler worker {name} running on {RUN_QUEUE.cpus} CPU(s).')
+        try:
+            lost.wait()
+        except KeyboardInterrupt:
+            released = unregister(name)
+            self.stdout.write(self.style.SUCCESS(f'Stopped: {released} process(es) handed back.'))
+            return
+        raise CommandError(f'Worker {name} was presumed dead and its processes handed back; restart it.')
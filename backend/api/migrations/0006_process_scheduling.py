@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_userprofile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='process',
+            name='burst',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='process',
+            name='cpu_time',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='process',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='process',
+            name='priority',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='process',
+            name='program_counter',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='process',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='process',
+            name='turnaround',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='process',
+            name='waiting_time',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_process_scheduling'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='process',
+            name='affinity',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='process',
+            name='cpu',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+    ]
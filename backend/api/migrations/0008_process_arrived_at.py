@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_process_cpu_affinity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='process',
+            name='arrived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
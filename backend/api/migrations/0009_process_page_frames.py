@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:39
+
+from array import array
+
+from django.db import migrations, models
+
+
+def json_to_page_frames(apps, schema_editor):
+    from api.paging import UNMAPPED, encode_page_table
+
+    Process = apps.get_model('api', 'Process')
+    for proc in Process.objects.exclude(status='Finished').only('id', 'page_table'):
+        mapped = {}
+        for vkey, pframe in (proc.page_table or {}).items():
+            try:
+                mapped[int(vkey.split('_')[-1])] = int(pframe.split('_')[-1])
+            except (AttributeError, ValueError):
+                # Ignore malformed entries
+                continue
+        if not mapped:
+            continue
+        table = array('l', [UNMAPPED]) * (max(mapped) + 1)
+        for v_page, frame in mapped.items():
+            table[v_page] = frame
+        Process.objects.filter(id=proc.id).update(page_frames=encode_page_table(table))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_process_arrived_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='process',
+            name='page_frames',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+        migrations.RunPython(json_to_page_frames, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='process',
+            name='page_table',
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:44
+
+from django.db import migrations, models
+
+
+def build_paths(apps, schema_editor):
+    FileSystemObject = apps.get_model('api', 'FileSystemObject')
+    parents = dict(FileSystemObject.objects.values_list('id', 'parent_id'))
+    paths = {}
+
+    def path_of(obj_id):
+        # Iterative walk up to the nearest ancestor with a known path
+        chain = []
+        while obj_id is not None and obj_id not in paths:
+            chain.append(obj_id)
+            obj_id = parents.get(obj_id)
+        prefix = paths.get(obj_id, '/')
+        for node in reversed(chain):
+            prefix = paths[node] = f'{prefix}{node}/'
+        return prefix
+
+    objs = []
+    for obj_id in parents:
+        path = path_of(obj_id)
+        objs.append(FileSystemObject(id=obj_id, path=path, depth=path.count('/') - 2))
+    FileSystemObject.objects.bulk_update(objs, ['path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_process_page_frames'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='filesystemobject',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='filesystemobject',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=1024),
+        ),
+        migrations.RunPython(build_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:45
+
+from django.db import migrations, models
+
+
+def compute_sizes(apps, schema_editor):
+    FileSystemObject = apps.get_model('api', 'FileSystemObject')
+    batch = []
+    rows = FileSystemObject.objects.filter(is_directory=False).values_list('id', 'content')
+    for obj_id, content in rows.iterator(chunk_size=500):
+        batch.append(FileSystemObject(id=obj_id, size=len((content or '').encode('utf-8'))))
+        if len(batch) >= 500:
+            FileSystemObject.objects.bulk_update(batch, ['size'])
+            batch = []
+    if batch:
+        FileSystemObject.objects.bulk_update(batch, ['size'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_filesystemobject_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='filesystemobject',
+            name='size',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(compute_sizes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:47
+
+import sys
+from array import array
+
+from django.db import migrations, models
+
+
+def build_line_index(text):
+    # Kept here: api.content no longer builds per-file line indexes
+    starts = array('i')
+    pos = text.find('\n')
+    while pos != -1:
+        starts.append(pos + 1)
+        pos = text.find('\n', pos + 1)
+    if sys.byteorder == 'big':
+        starts.byteswap()
+    return starts.tobytes()
+
+
+def build_line_indexes(apps, schema_editor):
+    FileSystemObject = apps.get_model('api', 'FileSystemObject')
+    batch = []
+    rows = FileSystemObject.objects.filter(is_directory=False).values_list('id', 'content')
+    for obj_id, content in rows.iterator(chunk_size=500):
+        batch.append(FileSystemObject(id=obj_id, line_index=build_line_index(content or '')))
+        if len(batch) >= 500:
+            FileSystemObject.objects.bulk_update(batch, ['line_index'])
+            batch = []
+    if batch:
+        FileSystemObject.objects.bulk_update(batch, ['line_index'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_filesystemobject_size'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='filesystemobject',
+            name='line_index',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+        migrations.RunPython(build_line_indexes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_filesystemobject_line_index'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='filesystemobject',
+            name='line_index',
+        ),
+        migrations.AddField(
+            model_name='filesystemobject',
+            name='block_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='filesystemobject',
+            name='block_size',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='FileBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField()),
+                ('data', models.TextField(blank=True, default='')),
+                ('newlines', models.PositiveIntegerField(default=0)),
+                ('nbytes', models.PositiveIntegerField(default=0)),
+                ('file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocks', to='api.filesystemobject')),
+            ],
+            options={
+                'ordering': ['index'],
+                'constraints': [models.UniqueConstraint(fields=('file', 'index'), name='fileblock_file_index')],
+            },
+        ),
+    ]
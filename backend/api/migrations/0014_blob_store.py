@@ -0,0 +1,112 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:55
+
+import hashlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_blob_store(apps, schema_editor):
+    # Old blocks belonged to one file each: give every block-stored file its
+    # own body and replace the block data by (deduplicated) blobs.
+    FileSystemObject = apps.get_model('api', 'FileSystemObject')
+    FileBlock = apps.get_model('api', 'FileBlock')
+    FileBody = apps.get_model('api', 'FileBody')
+    Blob = apps.get_model('api', 'Blob')
+    blobs = {}
+    for fso in FileSystemObject.objects.filter(block_size__gt=0).only('id').iterator():
+        body = FileBody.objects.create(refcount=1)
+        FileSystemObject.objects.filter(pk=fso.pk).update(body=body)
+        blocks = list(FileBlock.objects.filter(file_id=fso.pk).order_by('index'))
+        for block in blocks:
+            digest = hashlib.sha256(block.data.encode('utf-8')).hexdigest()
+            blob = blobs.get(digest)
+            if blob is None:
+                blob = blobs[digest] = Blob.objects.create(
+                    digest=digest, data=block.data, chars=len(block.data),
+                    newlines=block.newlines, nbytes=block.nbytes,
+                )
+            blob.refcount += 1
+            block.body, block.blob = body, blob
+        FileBlock.objects.bulk_update(blocks, ['body', 'blob'], batch_size=500)
+    for blob in blobs.values():
+        Blob.objects.filter(pk=blob.pk).update(refcount=blob.refcount)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_file_blocks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('data', models.TextField(blank=True, default='')),
+                ('chars', models.PositiveIntegerField(default=0)),
+                ('newlines', models.PositiveIntegerField(default=0)),
+                ('nbytes', models.PositiveIntegerField(default=0)),
+                ('refcount', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FileBody',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('refcount', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='filesystemobject',
+            name='body',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='files', to='api.filebody'),
+        ),
+        migrations.AddField(
+            model_name='fileblock',
+            name='body',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='blocks', to='api.filebody'),
+        ),
+        migrations.AddField(
+            model_name='fileblock',
+            name='blob',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='blocks', to='api.blob'),
+        ),
+        migrations.RunPython(build_blob_store, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='fileblock',
+            name='fileblock_file_index',
+        ),
+        migrations.RemoveField(
+            model_name='fileblock',
+            name='file',
+        ),
+        migrations.RemoveField(
+            model_name='fileblock',
+            name='data',
+        ),
+        migrations.RemoveField(
+            model_name='fileblock',
+            name='newlines',
+        ),
+        migrations.RemoveField(
+            model_name='fileblock',
+            name='nbytes',
+        ),
+        migrations.AlterField(
+            model_name='fileblock',
+            name='body',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocks', to='api.filebody'),
+        ),
+        migrations.AlterField(
+            model_name='fileblock',
+            name='blob',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='blocks', to='api.blob'),
+        ),
+        migrations.AddConstraint(
+            model_name='fileblock',
+            constraint=models.UniqueConstraint(fields=('body', 'index'), name='fileblock_body_index'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def index_bodies(apps, schema_editor):
+    # Same trigrams as api.search.trigrams(), for the bodies that exist already
+    FileBlock = apps.get_model('api', 'FileBlock')
+    FileBody = apps.get_model('api', 'FileBody')
+    SearchTrigram = apps.get_model('api', 'SearchTrigram')
+    for body_id in FileBody.objects.values_list('pk', flat=True).iterator():
+        text = ''.join(FileBlock.objects.filter(body_id=body_id).order_by('index').values_list('blob__data', flat=True))
+        grams = set()
+        for line in text.casefold().split('\n'):
+            grams.update(line[i:i + 3] for i in range(len(line) - 2))
+        SearchTrigram.objects.bulk_create(
+            [SearchTrigram(body_id=body_id, trigram=gram) for gram in grams], batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_file_lock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('body', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='api.filebody')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['trigram', 'body'], name='searchtrigram_trigram_body')],
+                'constraints': [models.UniqueConstraint(fields=('body', 'trigram'), name='searchtrigram_body_trigram')],
+            },
+        ),
+        migrations.RunPython(index_bodies, migrations.RunPython.noop),
+    ]
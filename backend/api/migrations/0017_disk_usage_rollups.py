@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_rollups(apps, schema_editor):
+    # Same totals as api.du.expected(): every file counts in itself and its ancestors
+    FileSystemObject = apps.get_model('api', 'FileSystemObject')
+    totals = {}
+    files = FileSystemObject.objects.filter(is_directory=False).values_list('path', 'size')
+    for path, size in files.iterator(chunk_size=2000):
+        for pk in path.strip('/').split('/'):
+            if pk:
+                nbytes, count = totals.get(int(pk), (0, 0))
+                totals[int(pk)] = (nbytes + size, count + 1)
+    by_totals = {}
+    for pk, value in totals.items():
+        by_totals.setdefault(value, []).append(pk)
+    for (nbytes, count), pks in by_totals.items():
+        for i in range(0, len(pks), 500):
+            FileSystemObject.objects.filter(pk__in=pks[i:i + 500]).update(tree_size=nbytes, tree_files=count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='filesystemobject',
+            name='tree_files',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='filesystemobject',
+            name='tree_size',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='filesystemobject',
+            index=models.Index(fields=['owner', 'tree_size'], name='fso_owner_tree_size'),
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_disk_usage_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='process',
+            index=models.Index(fields=['owner', 'id'], name='proc_owner_id'),
+        ),
+        migrations.AddIndex(
+            model_name='process',
+            index=models.Index(fields=['owner', 'status', 'id'], name='proc_owner_status_id'),
+        ),
+    ]
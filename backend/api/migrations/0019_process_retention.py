@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_process_list_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pid', models.BigIntegerField(unique=True)),
+                ('file_name', models.CharField(blank=True, default='', max_length=255)),
+                ('priority', models.IntegerField(default=0)),
+                ('burst', models.PositiveIntegerField(default=0)),
+                ('cpu_time', models.FloatField(default=0)),
+                ('turnaround', models.FloatField(blank=True, null=True)),
+                ('waiting_time', models.FloatField(blank=True, null=True)),
+                ('faults', models.PositiveIntegerField(default=0)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='process',
+            name='faults',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='process',
+            name='hits',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='process',
+            index=models.Index(fields=['status', 'created_at'], name='proc_status_created'),
+        ),
+        migrations.AddField(
+            model_name='processarchive',
+            name='owner',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='processarchive',
+            index=models.Index(fields=['owner', 'created_at'], name='proc_archive_owner_created'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_process_retention'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchedulerWorker',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('hostname', models.CharField(blank=True, default='', max_length=255)),
+                ('pid', models.PositiveIntegerField(default=0)),
+                ('cpus', models.PositiveSmallIntegerField(default=1)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('heartbeat_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='process',
+            name='worker',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True),
+        ),
+    ]
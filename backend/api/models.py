@@ -1,6 +1,17 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Length, Substr
 from django.contrib.auth.models import User
 
+# Longest materialized path (FileSystemObject.path): about 100 levels of 8-digit ids
+PATH_MAX_LENGTH = 1024
+
+
+def check_path_length(length):
+    if length > PATH_MAX_LENGTH:
+        raise ValueError(f'Directory tree too deep: paths are limited to {PATH_MAX_LENGTH} characters')
+
+
 class FileSystemObject(models.Model):
     # The name of the file or folder
     name = models.CharField(max_length=255)
@@ -20,11 +31,281 @@ class FileSystemObject(models.Model):
     # Timestamps that are automatically set
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Legacy inline content. File data lives in a FileBody (see api.content);
+    # files written before that keep it here until their next write converts them.
     content = models.TextField(blank=True, null=True)
+    # Block list holding the data; shared by copies until one of them is written
+    body = models.ForeignKey('FileBody', on_delete=models.PROTECT, null=True, blank=True, editable=False, related_name='files')
+    # Characters per block of the body; 0 while the data is still inline
+    block_size = models.PositiveIntegerField(default=0, editable=False)
+    block_count = models.PositiveIntegerField(default=0, editable=False)
+
+    # Tree index (materialized path of ids, e.g. "/3/17/42/" for 42 in 17 in 3),
+    # so a whole subtree is one indexed prefix match. Maintained by save().
+    path = models.CharField(max_length=PATH_MAX_LENGTH, default='', blank=True, editable=False, db_index=True)
+    # Number of ancestors (0 for top-level objects)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    # Content size in bytes (UTF-8), so listings never have to load the content
+    size = models.PositiveBigIntegerField(default=0, editable=False)
+    # Disk usage rollup (see api.du): bytes and number of files in this object's
+    # subtree (for a file, its own size and 1), kept up to date on every write
+    tree_size = models.PositiveBigIntegerField(default=0, editable=False)
+    tree_files = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'tree_size'], name='fso_owner_tree_size'),
+        ]
 
     def __str__(self):
         return self.name
 
+    # Written only through api.content and api.du (with UPDATEs), never by a plain save()
+    STORAGE_FIELDS = ('content', 'body', 'size', 'block_size', 'block_count', 'tree_size', 'tree_files')
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        adding = self._state.adding
+        if adding:
+            # Rows created with inline content (fixtures, shell) still get a size
+            self.size = len((self.content or '').encode('utf-8'))
+            self.tree_size, self.tree_files = (0, 0) if self.is_directory else (self.size, 1)
+        elif update_fields is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.STORAGE_FIELDS and field.attname not in deferred
+            ]
+        from . import caching, du
+
+        if update_fields is not None and 'parent' not in update_fields:
+            super().save(*args, **kwargs)
+            caching.changed(self.owner_id, [self.path])
+            return
+        with transaction.atomic():
+            parent_path = '/'
+            if self.parent_id is not None:
+                parent_path = (
+                    FileSystemObject.objects
+                    .filter(pk=self.parent_id)
+                    .values_list('path', flat=True)
+                    .get()
+                )
+                if self.path and parent_path.startswith(self.path):
+                    raise ValueError('Cannot move a directory into itself or one of its subdirectories')
+            old_path = self.path
+            super().save(*args, **kwargs)
+            new_path = f'{parent_path}{self.pk}/'
+            if new_path != old_path:
+                longest = len(new_path)
+                if old_path and self.is_directory:
+                    # The deepest descendant moves along
+                    deepest = self.subtree().aggregate(n=models.Max(Length('path')))['n'] or len(old_path)
+                    longest += deepest - len(old_path)
+                check_path_length(longest)
+                self._reroot(old_path, new_path)
+                du.moved(self.pk, old_path, new_path, (self.tree_size, self.tree_files) if adding else None)
+            caching.changed(self.owner_id, [old_path, new_path])
+
+    def _reroot(self, old_path, new_path):
+        """Point this object and (if it had a path) its whole subtree at `new_path`: two UPDATEs."""
+        depth = new_path.count('/') - 2
+        if old_path:
+            (
+                FileSystemObject.objects
+                .filter(path__startswith=old_path)
+                .exclude(pk=self.pk)
+                .update(
+                    path=Concat(Value(new_path), Substr('path', len(old_path) + 1), output_field=models.CharField()),
+                    depth=F('depth') + (depth - self.depth),
+                )
+            )
+        FileSystemObject.objects.filter(pk=self.pk).update(path=new_path, depth=depth)
+        self.path, self.depth = new_path, depth
+
+    def subtree(self):
+        """This object and everything below it, in one indexed query."""
+        return FileSystemObject.objects.filter(owner_id=self.owner_id, path__startswith=self.path)
+
+    def move_to(self, parent, name=None):
+        """Move (and optionally rename) this object; the subtree follows in one UPDATE."""
+        self.parent = parent
+        if name:
+            self.name = name
+        self.save()
+
+    def delete_subtree(self):
+        """
+        Delete this object and all of its descendants (and their processes) with
+        one DELETE per table, instead of the collector's per-level cascade.
+        """
+        return FileSystemObject.delete_trees(self.owner_id, [self.path])
+
+    @classmethod
+    def delete_trees(cls, owner_id, paths):
+        """Delete the subtrees rooted at the materialized `paths`, one DELETE per table."""
+        from . import caching, du
+        from .content import release_bodies
+        from .scheduler import forget_processes
+
+        match = models.Q()
+        for path in paths:
+            match |= models.Q(path__startswith=path)
+
+        def rows():
+            return cls.objects.filter(match, owner_id=owner_id)
+
+        with transaction.atomic():
+            du.removed(owner_id, paths)
+            caching.changed(owner_id, paths, ids=rows().values_list('pk', flat=True))
+            processes = Process.objects.filter(file_object__in=rows().values('pk'))
+            pids = list(processes.values_list('pk', flat=True))
+            processes.delete()
+            if pids:
+                transaction.on_commit(lambda: forget_processes(pids))
+            FileLock.objects.filter(file__in=rows().values('pk')).delete()
+            release_bodies(rows())
+            subtree = rows()
+            # Nothing else references these rows any more, so skip the cascade collector
+            return subtree._raw_delete(subtree.db)
+
+    @classmethod
+    def name_paths(cls, rows):
+        """{id: '/a/b/name'} for (id, path, name) rows, with one query for all their directories."""
+        ids = {int(pk) for _, path, _ in rows for pk in path.strip('/').split('/')[:-1]}
+        ids = sorted(ids)
+        names = {}
+        for i in range(0, len(ids), 500):
+            names.update(cls.objects.filter(pk__in=ids[i:i + 500]).values_list('id', 'name'))
+        return {
+            pk: '/'.join([''] + [names.get(int(d), '?') for d in path.strip('/').split('/')[:-1]] + [name])
+            for pk, path, name in rows
+        }
+
+    @classmethod
+    def resolve(cls, owner, path):
+        """
+        Object at an absolute path such as "/a/b/c" (None for "/", DoesNotExist if
+        missing), in a single query: one join per path component.
+        """
+        names = [name for name in path.split('/') if name]
+        if not names:
+            return None
+        lookup = {'owner': owner}
+        prefix = ''
+        for name in reversed(names):
+            lookup[f'{prefix}name'] = name
+            prefix += 'parent__'
+        lookup[f'{prefix}isnull'] = True
+        obj = cls.objects.filter(**lookup).order_by('id').first()
+        if obj is None:
+            raise cls.DoesNotExist(f'No such file or directory: {path}')
+        return obj
+
+class Blob(models.Model):
+    """
+    Content-addressed piece of file text (one block), shared by every block
+    with the same data. refcount is the number of FileBlock rows using it;
+    unreferenced blobs are removed by api.content.collect_garbage().
+    """
+    digest = models.CharField(max_length=64, unique=True)  # sha256 of the UTF-8 data
+    data = models.TextField(blank=True, default='')
+    chars = models.PositiveIntegerField(default=0)
+    newlines = models.PositiveIntegerField(default=0)
+    nbytes = models.PositiveIntegerField(default=0)
+    refcount = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.digest[:12]
+
+
+class FileBody(models.Model):
+    """
+    Ordered list of blocks making up one file's data. A copied file points at
+    the same body (refcount = number of files using it) until one of them is
+    written, which gives the writer a private body first (copy-on-write).
+    """
+    refcount = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Body {self.pk} ({self.refcount} refs)"
+
+
+class FileBlock(models.Model):
+    """
+    One fixed-size piece of a body. Every block but the last holds exactly
+    block_size characters, so a character offset maps straight to a block;
+    the blob's newline and byte counts let line and byte offsets be mapped
+    without reading the other blocks.
+    """
+    body = models.ForeignKey(FileBody, on_delete=models.CASCADE, related_name='blocks')
+    index = models.PositiveIntegerField()
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT, related_name='blocks')
+
+    class Meta:
+        ordering = ['index']
+        constraints = [
+            models.UniqueConstraint(fields=['body', 'index'], name='fileblock_body_index'),
+        ]
+
+    def __str__(self):
+        return f"{self.body_id}[{self.index}]"
+
+
+class SearchTrigram(models.Model):
+    """
+    Inverted index for api.search: one row per distinct (case-folded)
+    three-character sequence of a body's lines. Kept per body, so copies
+    sharing a body share its index entries too.
+    """
+    body = models.ForeignKey(FileBody, on_delete=models.CASCADE, related_name='trigrams')
+    trigram = models.CharField(max_length=3)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['body', 'trigram'], name='searchtrigram_body_trigram'),
+        ]
+        indexes = [
+            models.Index(fields=['trigram', 'body'], name='searchtrigram_trigram_body'),
+        ]
+
+    def __str__(self):
+        return f"{self.trigram!r} in {self.body_id}"
+
+
+class FileLock(models.Model):
+    """
+    A held or requested lock on a file (see api.locks). Rows are granted in
+    id order, so waiting writers are not starved by a stream of readers, and
+    every row has a lease: a holder or waiter that stops renewing it (e.g. a
+    crashed worker) is dropped once expires_at has passed.
+    """
+    SHARED = 'shared'
+    EXCLUSIVE = 'exclusive'
+    MODE_CHOICES = [
+        (SHARED, 'Shared'),
+        (EXCLUSIVE, 'Exclusive'),
+    ]
+
+    file = models.ForeignKey(FileSystemObject, on_delete=models.CASCADE, related_name='locks')
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    mode = models.CharField(max_length=10, choices=MODE_CHOICES)
+    token = models.CharField(max_length=32, unique=True)
+    granted = models.BooleanField(default=False)
+    requested_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['file', 'expires_at'], name='filelock_file_expires'),
+        ]
+
+    def __str__(self):
+        state = 'held' if self.granted else 'waiting'
+        return f"{self.mode} lock on {self.file_id} ({state})"
+
+
 class Process(models.Model):
     STATUS_CHOICES = [
         ('Ready', 'Ready'),
@@ -36,13 +317,99 @@ class Process(models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
     file_object = models.ForeignKey(FileSystemObject, on_delete=models.CASCADE)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Ready')
-    page_table = models.JSONField(default=dict, blank=True)
+    # Dense page table (virtual page -> frame, -1 = not resident) packed as int32s;
+    # see api.paging.encode_page_table. The `page_table` property gives the JSON shape.
+    page_frames = models.BinaryField(default=b'', blank=True)
+    # Scheduling: lower number = higher priority; burst is the program length in lines (pages)
+    priority = models.IntegerField(default=0)
+    burst = models.PositiveIntegerField(default=0)
+    # SMP: CPU pinned by the user (null = any) and CPU currently dispatching the process
+    affinity = models.PositiveSmallIntegerField(null=True, blank=True)
+    cpu = models.PositiveSmallIntegerField(null=True, blank=True)
+    # Next virtual page to execute, so a preempted process resumes where it stopped
+    program_counter = models.PositiveIntegerField(default=0)
+    # Accounting in simulated (virtual) time, used for turnaround / waiting time metrics
+    cpu_time = models.FloatField(default=0)
+    arrived_at = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    turnaround = models.FloatField(null=True, blank=True)
+    waiting_time = models.FloatField(null=True, blank=True)
+    # Standalone scheduler worker (api.workers) holding the process, null for
+    # unclaimed processes and for the scheduler embedded in the web server
+    worker = models.CharField(max_length=100, null=True, blank=True, db_index=True)
+    # Page accesses that faulted / hit, added up at the end of every time slice
+    faults = models.PositiveIntegerField(default=0)
+    hits = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Cursor pages of a user's processes (newest first), all or of some statuses;
+            # its (owner, status) prefix also serves pkill and per-user status counts
+            models.Index(fields=['owner', 'id'], name='proc_owner_id'),
+            models.Index(fields=['owner', 'status', 'id'], name='proc_owner_status_id'),
+            # The Ready queue in arrival order (run queue rebuilds) and the
+            # oldest Finished rows (archival, see api.retention)
+            models.Index(fields=['status', 'created_at'], name='proc_status_created'),
+        ]
+
     def __str__(self):
         return f"PID {self.id} ({self.file_object.name}) - {self.status}"
 
+    @property
+    def page_table(self):
+        """Legacy {'v_page_<n>': 'p_frame_<m>'} view of page_frames, for the API and admin."""
+        from .paging import decode_page_table, page_table_json
+        return page_table_json(decode_page_table(self.page_frames))
+
+
+class SchedulerWorker(models.Model):
+    """
+    A running `run_scheduler` process. It renews heartbeat_at periodically;
+    once that is older than SCHEDULER_WORKER_TIMEOUT the worker is presumed
+    dead and its processes go back to the Ready pool (see api.workers).
+    """
+    name = models.CharField(max_length=100, unique=True)
+    hostname = models.CharField(max_length=255, blank=True, default='')
+    pid = models.PositiveIntegerField(default=0)
+    cpus = models.PositiveSmallIntegerField(default=1)
+    started_at = models.DateTimeField(auto_now_add=True)
+    heartbeat_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Worker {self.name} ({self.hostname}:{self.pid})"
+
+
+class ProcessArchive(models.Model):
+    """
+    Summary of a finished process moved out of the Process table once it is
+    older than the retention window (see api.retention). The program is kept
+    by name, as the file may be gone.
+    """
+    pid = models.BigIntegerField(unique=True)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE)
+    file_name = models.CharField(max_length=255, blank=True, default='')
+    priority = models.IntegerField(default=0)
+    burst = models.PositiveIntegerField(default=0)
+    cpu_time = models.FloatField(default=0)
+    turnaround = models.FloatField(null=True, blank=True)
+    waiting_time = models.FloatField(null=True, blank=True)
+    faults = models.PositiveIntegerField(default=0)
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'created_at'], name='proc_archive_owner_created'),
+        ]
+
+    def __str__(self):
+        return f"PID {self.pid} ({self.file_name}) - archived"
+
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
@@ -0,0 +1,24 @@
+from rest_framework.pagination import CursorPagination
+
+
+class NameCursorPagination(CursorPagination):
+    """
+    Stable cursor pages for directory listings (?cursor=&page_size=). Unlike
+    offset paging, a page costs the same no matter how deep into the listing
+    it is, and concurrent inserts do not shift later pages.
+    """
+    ordering = ('name', 'id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+class ProcessCursorPagination(CursorPagination):
+    """
+    Cursor pages of the process table, newest first (?cursor=&page_size=):
+    a page costs the same however many finished processes a user has.
+    """
+    ordering = ('-id',)
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
@@ -0,0 +1,470 @@
+import heapq
+import itertools
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from collections.abc import Mapping, Sequence
+
+
+class ReplacementPolicy:
+    """
+    Chooses the victim frame when physical RAM is full.
+
+    The memory calls on_load() when a page is mapped into a frame, on_hit()
+    on every access to a resident page, on_free() when a frame is released,
+    and victim() to pick the frame to evict. Hit/fault/eviction counters
+    live on the policy so strategies can be compared on the same workload.
+    """
+    name = None
+
+    def __init__(self, nframes):
+        self.nframes = nframes
+        self.hits = 0
+        self.faults = 0
+        self.evictions = 0
+
+    def on_load(self, frame):
+        raise NotImplementedError
+
+    def on_hit(self, frame):
+        pass
+
+    def on_free(self, frame):
+        raise NotImplementedError
+
+    def victim(self):
+        raise NotImplementedError
+
+    def stats(self):
+        accesses = self.hits + self.faults
+        return {
+            'policy': self.name,
+            'hits': self.hits,
+            'faults': self.faults,
+            'evictions': self.evictions,
+            'fault_rate': (self.faults / accesses) if accesses else None,
+        }
+
+
+class FIFOReplacement(ReplacementPolicy):
+    name = 'fifo'
+
+    def __init__(self, nframes):
+        super().__init__(nframes)
+        # Frames in load order (OrderedDict for O(1) removal on free)
+        self._order = OrderedDict()
+
+    def on_load(self, frame):
+        self._order[frame] = None
+        self._order.move_to_end(frame)
+
+    def on_free(self, frame):
+        self._order.pop(frame, None)
+
+    def victim(self):
+        frame, _ = self._order.popitem(last=False)
+        return frame
+
+
+class LRUReplacement(FIFOReplacement):
+    name = 'lru'
+
+    def on_hit(self, frame):
+        self._order.move_to_end(frame)
+
+
+class ClockReplacement(ReplacementPolicy):
+    """Second chance: a referenced frame gets its bit cleared and is skipped once."""
+    name = 'clock'
+
+    def __init__(self, nframes):
+        super().__init__(nframes)
+        self._referenced = bytearray(nframes)
+        self._resident = bytearray(nframes)
+        self._hand = 0
+
+    def on_load(self, frame):
+        self._resident[frame] = 1
+        self._referenced[frame] = 1
+
+    def on_hit(self, frame):
+        self._referenced[frame] = 1
+
+    def on_free(self, frame):
+        self._resident[frame] = 0
+        self._referenced[frame] = 0
+
+    def victim(self):
+        while True:
+            frame = self._hand
+            self._hand = (self._hand + 1) % self.nframes
+            if not self._resident[frame]:
+                continue
+            if self._referenced[frame]:
+                self._referenced[frame] = 0
+                continue
+            self._resident[frame] = 0
+            return frame
+
+
+class LFUReplacement(ReplacementPolicy):
+    """Least frequently used; ties go to the page loaded first. Lazy-deletion min-heap."""
+    name = 'lfu'
+
+    def __init__(self, nframes):
+        super().__init__(nframes)
+        self._count = {}
+        self._loaded = {}
+        self._heap = []
+        self._seq = itertools.count()
+
+    def on_load(self, frame):
+        self._count[frame] = 1
+        self._loaded[frame] = next(self._seq)
+        heapq.heappush(self._heap, (1, self._loaded[frame], frame))
+
+    def on_hit(self, frame):
+        self._count[frame] += 1
+        heapq.heappush(self._heap, (self._count[frame], self._loaded[frame], frame))
+
+    def on_free(self, frame):
+        self._count.pop(frame, None)
+        self._loaded.pop(frame, None)
+
+    def victim(self):
+        while True:
+            count, loaded, frame = heapq.heappop(self._heap)
+            if self._count.get(frame) == count and self._loaded.get(frame) == loaded:
+                del self._count[frame]
+                del self._loaded[frame]
+                return frame
+
+
+REPLACEMENT_POLICIES = {
+    cls.name: cls
+    for cls in (FIFOReplacement, LRUReplacement, ClockReplacement, LFUReplacement)
+}
+# Belady's OPT needs the future reference string, so it only exists in simulate()
+OFFLINE_POLICIES = sorted(REPLACEMENT_POLICIES) + ['opt']
+
+
+def make_replacement_policy(name, nframes):
+    try:
+        cls = REPLACEMENT_POLICIES[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown page replacement policy '{name}'. Choose one of: {', '.join(sorted(REPLACEMENT_POLICIES))}"
+        )
+    return cls(nframes)
+
+
+# Marker for "no frame" / "no page" in the integer arrays below
+UNMAPPED = -1
+
+
+def new_page_table(npages=0):
+    """Dense per-process page table: index = virtual page, value = frame or UNMAPPED."""
+    return array('l', [UNMAPPED]) * npages
+
+
+def encode_page_table(table):
+    """Serialize a page table for Process.page_frames (little-endian int32, trailing holes trimmed)."""
+    end = len(table)
+    while end and table[end - 1] == UNMAPPED:
+        end -= 1
+    packed = array('i', table[:end])
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def decode_page_table(data):
+    packed = array('i')
+    if data:
+        packed.frombytes(bytes(data))
+        if sys.byteorder == 'big':
+            packed.byteswap()
+    return array('l', packed)
+
+
+def page_table_json(table):
+    """The legacy JSON shape served by the API: {'v_page_<n>': 'p_frame_<m>'}."""
+    return {f"v_page_{v_page}": f"p_frame_{frame}" for v_page, frame in enumerate(table) if frame != UNMAPPED}
+
+
+class FrameView(Sequence):
+    """Read-only per-frame view in the legacy UI shape: None or {'pid', 'v_page'}."""
+
+    def __init__(self, memory):
+        self._memory = memory
+
+    def __len__(self):
+        return self._memory.nframes
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self._memory.frame(index)
+
+
+class FrameTableView(Mapping):
+    """Read-only view of the resident frames keyed "p_frame_<n>"."""
+
+    def __init__(self, memory):
+        self._memory = memory
+
+    def _index(self, key):
+        if isinstance(key, str) and key.startswith('p_frame_'):
+            try:
+                return int(key[len('p_frame_'):])
+            except ValueError:
+                return None
+        return None
+
+    def __getitem__(self, key):
+        index = self._index(key)
+        ent = self._memory.frame(index) if index is not None and 0 <= index < self._memory.nframes else None
+        if ent is None:
+            raise KeyError(key)
+        return ent
+
+    def __iter__(self):
+        for index in self._memory.used_frames():
+            yield f"p_frame_{index}"
+
+    def __len__(self):
+        return self._memory.nframes - self._memory.free_frames()
+
+
+class PhysicalMemory:
+    """
+    Simulated physical RAM shared by every CPU.
+
+    The frame table is two flat integer arrays (owner pid and virtual page
+    per frame), free frames are an integer stack, and each process has a
+    dense integer page table (virtual page -> frame) that doubles as the
+    reverse map. Lookups, loads and frees are O(1) apart from the victim
+    choice, and a frame costs a dozen bytes rather than a dict, so RAM
+    sizes of 64K+ frames stay cheap. `frames` and `frame_table` are lazy
+    views in the old list-of-dicts / "p_frame_<n>" shapes.
+    """
+
+    def __init__(self, nframes=8, policy='fifo'):
+        self.lock = threading.RLock()
+        self.nframes = nframes
+        self._frame_pid = array('q', [UNMAPPED]) * nframes
+        self._frame_vpage = array('l', [UNMAPPED]) * nframes
+        # Lowest frame on top so an empty RAM fills frames 0, 1, 2, ...
+        self._free = array('l', range(nframes - 1, -1, -1))
+        self._tables = {}
+        self.frames = FrameView(self)
+        self.frame_table = FrameTableView(self)
+        self.policy = make_replacement_policy(policy, nframes)
+        # SharedRAM every change is mirrored into for other processes (api.sharedram)
+        self.mirror = None
+
+    def _publish(self, frames=()):
+        if self.mirror is not None:
+            self.mirror.update(self, frames)
+
+    def frame(self, index):
+        with self.lock:
+            pid = self._frame_pid[index]
+            if pid == UNMAPPED:
+                return None
+            return {'pid': pid, 'v_page': self._frame_vpage[index]}
+
+    def used_frames(self):
+        with self.lock:
+            return [index for index, pid in enumerate(self._frame_pid) if pid != UNMAPPED]
+
+    def free_frames(self):
+        with self.lock:
+            return len(self._free)
+
+    def set_policy(self, name):
+        """Switch replacement policy; resident frames are handed over in frame order."""
+        with self.lock:
+            policy = make_replacement_policy(name, self.nframes)
+            for frame in self.used_frames():
+                policy.on_load(frame)
+            self.policy = policy
+            self._publish()
+            return policy
+
+    def _resident(self, pid, v_page):
+        table = self._tables.get(pid)
+        if table is None or v_page >= len(table):
+            return None
+        frame = table[v_page]
+        return None if frame == UNMAPPED else frame
+
+    def lookup(self, pid, v_page):
+        """Frame holding (pid, v_page), counting a hit; None means a page fault."""
+        with self.lock:
+            frame = self._resident(pid, v_page)
+            if frame is not None:
+                self.policy.hits += 1
+                self.policy.on_hit(frame)
+                self._publish()
+            return frame
+
+    def load(self, pid, v_page, prefetch=False):
+        """
+        Map (pid, v_page) after a fault, or ahead of use with `prefetch` (not
+        counted as a fault). Returns (frame, evicted) where evicted is the
+        (pid, v_page) that lost its frame, or None if a free frame was used.
+        """
+        with self.lock:
+            frame = self._resident(pid, v_page)
+            if frame is not None:
+                return frame, None
+            if not prefetch:
+                self.policy.faults += 1
+            evicted = None
+            if self._free:
+                frame = self._free.pop()
+            else:
+                frame = self.policy.victim()
+                self.policy.evictions += 1
+                evicted = (self._frame_pid[frame], self._frame_vpage[frame])
+                self._unmap(frame)
+            self._frame_pid[frame] = pid
+            self._frame_vpage[frame] = v_page
+            table = self._tables.get(pid)
+            if table is None:
+                table = self._tables[pid] = new_page_table()
+            if v_page >= len(table):
+                table.extend(new_page_table(v_page + 1 - len(table)))
+            table[v_page] = frame
+            self.policy.on_load(frame)
+            self._publish((frame,))
+            return frame, evicted
+
+    def release_process(self, pid):
+        """Free every frame owned by `pid`; returns the list of released frames."""
+        with self.lock:
+            table = self._tables.pop(pid, None)
+            if table is None:
+                return []
+            released = []
+            for frame in table:
+                if frame == UNMAPPED or self._frame_pid[frame] != pid:
+                    continue
+                self.policy.on_free(frame)
+                self._frame_pid[frame] = UNMAPPED
+                self._frame_vpage[frame] = UNMAPPED
+                self._free.append(frame)
+                released.append(frame)
+            self._publish(released)
+            return released
+
+    def release_page(self, pid, v_page):
+        """Free the frame of one page of `pid` (e.g. it left the working set); returns it or None."""
+        with self.lock:
+            frame = self._resident(pid, v_page)
+            if frame is None:
+                return None
+            self.policy.on_free(frame)
+            self._unmap(frame)
+            self._free.append(frame)
+            self._publish((frame,))
+            return frame
+
+    def _unmap(self, frame):
+        pid = self._frame_pid[frame]
+        if pid == UNMAPPED:
+            return
+        table = self._tables.get(pid)
+        if table is not None:
+            table[self._frame_vpage[frame]] = UNMAPPED
+        self._frame_pid[frame] = UNMAPPED
+        self._frame_vpage[frame] = UNMAPPED
+
+    def page_array(self, pid):
+        """Copy of the dense page table of `pid` (see new_page_table)."""
+        with self.lock:
+            return array('l', self._tables.get(pid, ()))
+
+    def resident_pages(self, pid):
+        with self.lock:
+            return {v_page: frame for v_page, frame in enumerate(self._tables.get(pid, ())) if frame != UNMAPPED}
+
+    def page_table(self, pid):
+        """Page table of `pid` in the API's JSON shape ({'v_page_<n>': 'p_frame_<m>'})."""
+        return page_table_json(self.page_array(pid))
+
+    def stats(self):
+        with self.lock:
+            return {
+                **self.policy.stats(),
+                'frames': self.nframes,
+                'free_frames': len(self._free),
+            }
+
+
+def _simulate_opt(reference, nframes):
+    # Precompute, for every position, when the same page is referenced next
+    next_use = [0] * len(reference)
+    last_seen = {}
+    for i in range(len(reference) - 1, -1, -1):
+        next_use[i] = last_seen.get(reference[i], float('inf'))
+        last_seen[reference[i]] = i
+
+    resident = {}
+    # Max-heap on next use (lazy: stale entries are skipped)
+    heap = []
+    hits = faults = evictions = 0
+    for i, page in enumerate(reference):
+        if page in resident:
+            hits += 1
+        else:
+            faults += 1
+            if len(resident) >= nframes:
+                while True:
+                    neg_next, victim = heapq.heappop(heap)
+                    if resident.get(victim) == -neg_next:
+                        break
+                del resident[victim]
+                evictions += 1
+        resident[page] = next_use[i]
+        heapq.heappush(heap, (-next_use[i], page))
+    accesses = hits + faults
+    return {
+        'policy': 'opt',
+        'hits': hits,
+        'faults': faults,
+        'evictions': evictions,
+        'fault_rate': (faults / accesses) if accesses else None,
+    }
+
+
+def simulate(reference, nframes, policy):
+    """Replay a page reference string against an empty RAM of `nframes` frames."""
+    if policy == 'opt':
+        return _simulate_opt(reference, nframes)
+    memory = PhysicalMemory(nframes, policy)
+    # Renumber pages densely so sparse page numbers don't blow up the page table
+    dense = {}
+    for page in reference:
+        v_page = dense.setdefault(page, len(dense))
+        if memory.lookup(0, v_page) is None:
+            memory.load(0, v_page)
+    return memory.policy.stats()
+
+
+def compare_policies(reference, nframes, policies=None):
+    return [simulate(reference, nframes, name) for name in (policies or OFFLINE_POLICIES)]
+
+
+def _default_memory():
+    from django.conf import settings
+    return PhysicalMemory(
+        nframes=getattr(settings, 'PHYSICAL_RAM_SIZE', 8),
+        policy=getattr(settings, 'PAGE_REPLACEMENT_POLICY', 'fifo'),
+    )
+
+
+# Physical RAM shared by every simulated CPU
+MEMORY = _default_memory()
@@ -0,0 +1,193 @@
+import threading
+from collections import deque
+
+
+class ProcessPaging:
+    """Read-ahead window and working set of one process."""
+    __slots__ = ('k', 'next_fault', 'prefetched', 'refs', 'last_ref', 'clock')
+
+    def __init__(self, k):
+        self.k = k
+        # Page a sequential reader faults on next, once the current window is used up
+        self.next_fault = None
+        # Prefetched pages not referenced yet
+        self.prefetched = set()
+        # (page, time) of the references in the working-set window, oldest first
+        self.refs = deque()
+        # page -> time of its latest reference (the working set is its keys)
+        self.last_ref = {}
+        self.clock = 0
+
+
+class Prefetcher:
+    """
+    Demand paging with read-ahead and working-set tracking for the scheduler.
+
+    On a page fault the next k pages of the program are loaded with the
+    faulting one, in the same disk access (see the 'prefetch_page' cost).
+    k adapts per process like a file read-ahead window: it doubles, up to
+    max_pages, while faults land right where the previous window ended, and
+    drops back to min_pages on a fault elsewhere or on a prefetched page
+    that was evicted before it was used.
+
+    With a working-set window of `window` references, a page the process
+    has not referenced in its last `window` accesses leaves its resident set
+    and its frame is freed (prefetched pages count as referenced when loaded).
+    Each process thus holds about its working set, and read-ahead only takes
+    frames outside every process's working set.
+
+    The counters report what it saved: prefetched pages that were then hit
+    are page-fault stalls avoided.
+    """
+
+    def __init__(self, enabled=False, min_pages=1, max_pages=8, window=0):
+        self._lock = threading.Lock()
+        self._procs = {}
+        self.configure(enabled, min_pages, max_pages, window)
+        self.prefetched = 0
+        self.hits = 0
+        self.wasted = 0
+        self.trimmed = 0
+
+    def configure(self, enabled=None, min_pages=None, max_pages=None, window=None):
+        """Change any of the settings; raises ValueError for an invalid combination."""
+        enabled = self.enabled if enabled is None else bool(enabled)
+        min_pages = self.min_pages if min_pages is None else int(min_pages)
+        max_pages = self.max_pages if max_pages is None else int(max_pages)
+        window = self.window if window is None else int(window)
+        if not 1 <= min_pages <= max_pages or window < 0:
+            raise ValueError('need 1 <= min_pages <= max_pages and window >= 0')
+        with self._lock:
+            self.enabled, self.min_pages, self.max_pages, self.window = enabled, min_pages, max_pages, window
+            if not window:
+                for state in self._procs.values():
+                    state.refs.clear()
+                    state.last_ref.clear()
+
+    def _state(self, pid):
+        state = self._procs.get(pid)
+        if state is None:
+            state = self._procs[pid] = ProcessPaging(self.min_pages)
+        return state
+
+    def plan(self, pid, v_page, npages, nframes):
+        """
+        Process `pid` faulted on `v_page` of its `npages`: the pages to read
+        ahead. RAM has `nframes` frames; while working sets are tracked, only
+        those outside all of them (less one for the faulting page) are used,
+        and no more pages than fit in the window.
+        """
+        if not self.enabled:
+            return []
+        with self._lock:
+            state = self._state(pid)
+            if v_page in state.prefetched:
+                # Read ahead, then evicted before use: the window is too big for the memory
+                state.prefetched.discard(v_page)
+                self.wasted += 1
+                state.k = self.min_pages
+            elif v_page == state.next_fault:
+                state.k = min(state.k * 2, self.max_pages)
+            else:
+                state.k = self.min_pages
+            k = state.k
+            if self.window:
+                # Pages further ahead than the window would leave the working set unused
+                in_use = sum(len(other.last_ref) for other in self._procs.values())
+                k = min(k, self.window - 1, max(nframes - in_use - 1, 0))
+            else:
+                k = min(k, nframes - 1)
+            state.next_fault = v_page + 1 + k
+            return list(range(v_page + 1, min(v_page + 1 + k, npages)))
+
+    def loaded(self, pid, pages):
+        """`pages` were read ahead for `pid`."""
+        with self._lock:
+            state = self._state(pid)
+            state.prefetched.update(pages)
+            self.prefetched += len(pages)
+            if self.window:
+                for page in pages:
+                    state.refs.append((page, state.clock))
+                    state.last_ref[page] = state.clock
+
+    def referenced(self, pid, v_page, hit):
+        """
+        `pid` accessed `v_page` (a hit or a serviced fault). Returns the pages
+        that just left its working set, whose frames should be freed.
+        """
+        if not self.enabled and not self.window:
+            return []
+        with self._lock:
+            state = self._state(pid)
+            if v_page in state.prefetched:
+                state.prefetched.discard(v_page)
+                if hit:
+                    self.hits += 1
+            if not self.window:
+                return []
+            state.clock += 1
+            state.refs.append((v_page, state.clock))
+            state.last_ref[v_page] = state.clock
+            trimmed = []
+            while state.refs and state.refs[0][1] <= state.clock - self.window:
+                page, when = state.refs.popleft()
+                if state.last_ref.get(page) == when:
+                    del state.last_ref[page]
+                    trimmed.append(page)
+                    if page in state.prefetched:
+                        state.prefetched.discard(page)
+                        self.wasted += 1
+            self.trimmed += len(trimmed)
+            return trimmed
+
+    def working_set(self, pid):
+        with self._lock:
+            state = self._procs.get(pid)
+            return sorted(state.last_ref) if state is not None else []
+
+    def forget(self, pid):
+        """The process finished or was killed."""
+        with self._lock:
+            state = self._procs.pop(pid, None)
+            if state is not None:
+                self.wasted += len(state.prefetched)
+
+    def counters(self):
+        with self._lock:
+            return self.prefetched, self.hits, self.wasted, self.trimmed
+
+    def stats(self, costs):
+        with self._lock:
+            settings = {
+                'enabled': self.enabled, 'min_pages': self.min_pages,
+                'max_pages': self.max_pages, 'window': self.window,
+            }
+        return {**settings, **report(self.counters(), costs)}
+
+
+def report(counters, costs):
+    """Prefetch counters (see Prefetcher.counters) with the stalls they saved, in virtual seconds."""
+    prefetched, hits, wasted, trimmed = counters
+    return {
+        'prefetched': prefetched,
+        'prefetch_hits': hits,
+        'wasted': wasted,
+        'trimmed': trimmed,
+        'stalls_saved': hits,
+        'stall_seconds_saved': hits * (costs['page_fault'] - costs['prefetch_page']),
+    }
+
+
+def _default_prefetcher():
+    from django.conf import settings
+    return Prefetcher(
+        enabled=getattr(settings, 'PAGING_PREFETCH', False),
+        min_pages=getattr(settings, 'PREFETCH_MIN_PAGES', 1),
+        max_pages=getattr(settings, 'PREFETCH_MAX_PAGES', 8),
+        window=getattr(settings, 'WORKING_SET_WINDOW', 0),
+    )
+
+
+# Read-ahead and working sets of the processes run by this process's scheduler
+PREFETCH = _default_prefetcher()
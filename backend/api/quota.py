@@ -0,0 +1,140 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+logger = logging.getLogger(__name__)
+
+
+class QuotaExceeded(Exception):
+    """The write would take the user's storage_used over storage_limit."""
+
+
+def _keys(user_id):
+    return f'quota:{user_id}:used', f'quota:{user_id}:limit'
+
+
+def charge(user_id, delta):
+    """
+    Add `delta` bytes to a user's storage_used in one conditional UPDATE: a
+    growth that would pass the limit matches no row and raises QuotaExceeded,
+    so parallel writers can neither lose updates nor overshoot together.
+    Shrinking never fails (usage stops at 0).
+    """
+    from .models import UserProfile
+
+    if not delta:
+        return
+    profiles = UserProfile.objects.filter(user_id=user_id)
+    for _ in range(2):
+        if delta > 0:
+            updated = (
+                profiles
+                .filter(storage_used__lte=F('storage_limit') - delta)
+                .update(storage_used=F('storage_used') + delta)
+            )
+        else:
+            updated = profiles.update(storage_used=Greatest(F('storage_used') + delta, Value(0)))
+        if updated:
+            break
+        # No row matched: either the profile does not exist yet (retry once) or the limit is hit
+        _, created = UserProfile.objects.get_or_create(user_id=user_id)
+        if not created:
+            raise QuotaExceeded(f'storage limit of user {user_id} exceeded')
+    else:
+        raise QuotaExceeded(f'storage limit of user {user_id} exceeded')
+    # Keep a cached reading current once the write is committed
+    transaction.on_commit(lambda: _cached_add(user_id, delta))
+
+
+def _cached_add(user_id, delta):
+    try:
+        cache.incr(_keys(user_id)[0], delta)
+    except ValueError:
+        # Not cached: the next usage() reads the row
+        pass
+
+
+def usage(user_id):
+    """{'storage_used', 'storage_limit'} of a user, cached for QUOTA_CACHE_TTL seconds."""
+    from .models import UserProfile
+
+    used_key, limit_key = _keys(user_id)
+    cached = cache.get_many([used_key, limit_key])
+    if used_key in cached and limit_key in cached:
+        return {'storage_used': max(cached[used_key], 0), 'storage_limit': cached[limit_key]}
+    profile, _ = UserProfile.objects.get_or_create(user_id=user_id)
+    cache.set_many(
+        {used_key: profile.storage_used, limit_key: profile.storage_limit},
+        timeout=getattr(settings, 'QUOTA_CACHE_TTL', 60),
+    )
+    return {'storage_used': profile.storage_used, 'storage_limit': profile.storage_limit}
+
+
+def forget(user_ids):
+    """Drop cached readings (after storage_used or storage_limit changed behind charge())."""
+    cache.delete_many([key for user_id in user_ids for key in _keys(user_id)])
+
+
+def reconcile(user_ids=None):
+    """
+    Recompute storage_used from the sizes of the users' files (all users
+    when None), in one UPDATE that only touches profiles which drifted.
+    Returns the number of profiles corrected.
+    """
+    from django.contrib.auth.models import User
+    from .models import FileSystemObject, UserProfile
+
+    users = User.objects.filter(profile__isnull=True)
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+    # A profile created concurrently is kept (where the backend can skip conflicts; not Oracle)
+    UserProfile.objects.bulk_create(
+        [UserProfile(user_id=user_id) for user_id in users.values_list('pk', flat=True)],
+        ignore_conflicts=connection.features.supports_ignore_conflicts,
+    )
+
+    actual = Coalesce(Subquery(
+        FileSystemObject.objects
+        .filter(owner=OuterRef('user_id'), is_directory=False)
+        .order_by()
+        .values('owner')
+        .annotate(total=Sum('size'))
+        .values('total')
+    ), Value(0))
+    profiles = UserProfile.objects.all()
+    if user_ids is not None:
+        profiles = profiles.filter(user_id__in=user_ids)
+    with transaction.atomic():
+        drifted = list(profiles.filter(~Q(storage_used=actual)).values_list('user_id', flat=True))
+        for i in range(0, len(drifted), 500):
+            UserProfile.objects.filter(user_id__in=drifted[i:i + 500]).update(storage_used=actual)
+    forget(drifted)
+    return len(drifted)
+
+
+def start_reconciler():
+    """Start the background thread that periodically reconciles every user's usage."""
+    interval = getattr(settings, 'QUOTA_RECONCILE_INTERVAL', 300)
+    if not interval:
+        return None
+    t = threading.Thread(target=reconcile_loop, args=(interval,), name='QuotaReconciler', daemon=True)
+    t.start()
+    return t
+
+
+def reconcile_loop(interval):
+    logger.info('Quota reconciler started (every %ss).', interval)
+    while True:
+        time.sleep(interval)
+        try:
+            corrected = reconcile()
+            if corrected:
+                logger.info('Corrected storage usage of %s user(s)', corrected)
+        except Exception:
+            logger.exception('Quota reconciliation failed')
@@ -0,0 +1,75 @@
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Finished processes moved per transaction
+ARCHIVE_BATCH = 500
+# Columns copied from a Process row into its ProcessArchive summary
+SUMMARY_FIELDS = (
+    'owner_id', 'priority', 'burst', 'cpu_time', 'turnaround', 'waiting_time',
+    'faults', 'hits', 'created_at', 'finished_at',
+)
+
+
+def archive_finished(older_than=None, batch=ARCHIVE_BATCH):
+    """
+    Move Finished processes created more than `older_than` seconds ago
+    (PROCESS_RETENTION by default) into ProcessArchive, oldest first and
+    `batch` per transaction, so the Process table only holds live processes
+    and recent history. Returns the number archived.
+    """
+    from .models import Process, ProcessArchive
+
+    if older_than is None:
+        older_than = getattr(settings, 'PROCESS_RETENTION', 7 * 24 * 60 * 60)
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    archived = 0
+    while True:
+        with transaction.atomic():
+            # Served by the (status, created_at) index however much history there is
+            rows = list(
+                Process.objects
+                .filter(status='Finished', created_at__lt=cutoff)
+                .order_by('created_at', 'id')
+                .values_list('id', 'file_object__name', *SUMMARY_FIELDS)[:batch]
+            )
+            if not rows:
+                break
+            ProcessArchive.objects.bulk_create([
+                ProcessArchive(pid=pid, file_name=file_name or '', **dict(zip(SUMMARY_FIELDS, summary)))
+                for pid, file_name, *summary in rows
+            ], batch_size=batch)
+            Process.objects.filter(pk__in=[row[0] for row in rows]).delete()
+        archived += len(rows)
+        if len(rows) < batch:
+            break
+    return archived
+
+
+def start_archiver():
+    """Start the background thread that periodically archives old finished processes."""
+    interval = getattr(settings, 'PROCESS_ARCHIVE_INTERVAL', 3600)
+    if not interval:
+        return None
+    t = threading.Thread(target=archive_loop, args=(interval,), name='ProcessArchiver', daemon=True)
+    t.start()
+    return t
+
+
+def archive_loop(interval):
+    logger.info('Process archiver started (every %ss).', interval)
+    while True:
+        time.sleep(interval)
+        try:
+            archived = archive_finished()
+            if archived:
+                logger.info('Archived %s finished process(es)', archived)
+        except Exception:
+            logger.exception('Process archival failed')
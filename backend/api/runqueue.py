@@ -0,0 +1,275 @@
+import threading
+
+from .scheduling import Job, make_policy
+
+
+class RunQueue:
+    """
+    In-memory Ready queue of one simulated CPU.
+
+    Ordering and time-slicing are delegated to a SchedulingPolicy, which can
+    be swapped at runtime with set_policy(). Entries are lazily deleted:
+    discard() only forgets the PID and pop() skips stale policy entries.
+    """
+
+    def __init__(self, policy='fcfs', quantum=None):
+        self._lock = threading.Lock()
+        self._policy = make_policy(policy, quantum)
+        # pid -> Job currently queued; policies may hold stale entries that pop() skips
+        self._queued = {}
+
+    @property
+    def policy(self):
+        return self._policy
+
+    def set_policy(self, name, quantum=None):
+        """Switch scheduling policy, carrying over every queued job."""
+        policy = make_policy(name, quantum)
+        with self._lock:
+            for job in sorted(self._queued.values(), key=lambda j: j.seq):
+                job.level = 0
+                policy.add(job)
+            self._policy = policy
+        return policy
+
+    def push_job(self, job):
+        with self._lock:
+            if job.pid in self._queued:
+                return
+            self._queued[job.pid] = job
+            self._policy.add(job)
+
+    def requeue(self, job, used, quantum_expired):
+        """Return a job whose time slice ended before it finished."""
+        with self._lock:
+            if job.pid in self._queued:
+                return
+            self._queued[job.pid] = job
+            self._policy.preempted(job, used, quantum_expired)
+
+    def pop(self):
+        """Next job according to the policy, or None if the queue is empty."""
+        with self._lock:
+            while self._queued:
+                job = self._policy.pop()
+                if job is None:
+                    break
+                if self._queued.get(job.pid) is job:
+                    del self._queued[job.pid]
+                    return job
+            return None
+
+    def steal(self):
+        """Remove and return the head-most job that is not pinned to this CPU."""
+        with self._lock:
+            for job in self._policy.jobs():
+                if self._queued.get(job.pid) is job and job.affinity is None:
+                    del self._queued[job.pid]
+                    return job
+            return None
+
+    def has_unpinned(self):
+        with self._lock:
+            return any(job.affinity is None for job in self._queued.values())
+
+    def should_preempt(self, job):
+        with self._lock:
+            return self._policy.should_preempt(job)
+
+    def quantum_for(self, job):
+        return self._policy.quantum_for(job)
+
+    def discard(self, pid):
+        with self._lock:
+            return self._queued.pop(pid, None) is not None
+
+    def reset(self, jobs):
+        with self._lock:
+            self._queued = {}
+            self._policy = make_policy(self._policy.name, self._policy.quantum)
+            for job in jobs:
+                self._queued[job.pid] = job
+                self._policy.add(job)
+
+    def snapshot(self):
+        with self._lock:
+            return [job for job in self._policy.jobs() if self._queued.get(job.pid) is job]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._queued)
+
+
+class RunQueueSet:
+    """
+    Per-CPU run queues for the SMP scheduler.
+
+    New jobs go to their pinned CPU, or else to the least loaded one (queued
+    jobs plus whatever it is running). With work stealing enabled a CPU whose
+    own queue is empty takes an unpinned job from the longest sibling queue.
+    Idle dispatchers park in wait(); queuing a job wakes exactly one of them
+    (the target CPU, else the lowest idle CPU that may steal it) and reports
+    it to `on_wake` so the simulation clock can account for it. The database
+    stays the durable record: rebuild() redistributes the Ready rows, and the
+    dispatchers' conditional claim UPDATE makes a stale entry harmless.
+    """
+
+    def __init__(self, cpus=1, policy='fcfs', quantum=None, work_stealing=True):
+        self.queues = [RunQueue(policy, quantum) for _ in range(max(int(cpus), 1))]
+        self.work_stealing = work_stealing
+        # Called with the CPU number whenever an idle CPU is woken
+        self.on_wake = None
+        # Dispatcher threads consuming these queues in this OS process; without
+        # any (standalone workers, see api.workers) web requests do not push
+        self.dispatchers = 0
+        # cpu -> pid currently dispatched there
+        self._busy = {}
+        self._idle = set()
+        self._lock = threading.Condition()
+
+    @property
+    def cpus(self):
+        return len(self.queues)
+
+    @property
+    def policy(self):
+        return self.queues[0].policy
+
+    def set_policy(self, name, quantum=None):
+        for queue in self.queues:
+            policy = queue.set_policy(name, quantum)
+        return policy
+
+    def _pick_cpu(self, job):
+        if job.affinity is not None and 0 <= job.affinity < self.cpus:
+            return job.affinity
+        with self._lock:
+            busy = set(self._busy)
+        return min(range(self.cpus), key=lambda cpu: (len(self.queues[cpu]) + (cpu in busy), cpu))
+
+    def _wake(self, cpu, job):
+        with self._lock:
+            if cpu in self._idle:
+                target = cpu
+            elif self.work_stealing and job.affinity is None and self._idle:
+                target = min(self._idle)
+            else:
+                return
+            self._idle.discard(target)
+            if self.on_wake is not None:
+                self.on_wake(target)
+            self._lock.notify_all()
+
+    def push(self, pid, burst=0, remaining=None, priority=0, affinity=None):
+        self.push_job(Job(pid, burst=burst, remaining=remaining, priority=priority, affinity=affinity))
+
+    def push_job(self, job):
+        cpu = self._pick_cpu(job)
+        self.queues[cpu].push_job(job)
+        self._wake(cpu, job)
+
+    def requeue(self, cpu, job, used, quantum_expired):
+        self.queues[cpu].requeue(job, used, quantum_expired)
+        self._wake(cpu, job)
+
+    def take(self, cpu):
+        """Next job for `cpu` without blocking: its own queue first, then (if enabled) a stolen one."""
+        job = self.queues[cpu].pop()
+        if job is None and self.work_stealing and self.cpus > 1:
+            job = self._steal_for(cpu)
+        return job
+
+    def _has_work(self, cpu):
+        if len(self.queues[cpu]):
+            return True
+        return self.work_stealing and any(queue.has_unpinned() for queue in self.queues)
+
+    def wait(self, cpu, timeout=None):
+        """Park an idle CPU until it is woken by a push; returns False on timeout."""
+        with self._lock:
+            if self._has_work(cpu):
+                return True
+            self._idle.add(cpu)
+            woken = self._lock.wait_for(lambda: cpu not in self._idle, timeout)
+            self._idle.discard(cpu)
+            return woken
+
+    def _steal_for(self, cpu):
+        victims = sorted(
+            (other for other in range(self.cpus) if other != cpu),
+            key=lambda other: len(self.queues[other]),
+            reverse=True,
+        )
+        for other in victims:
+            if not len(self.queues[other]):
+                break
+            job = self.queues[other].steal()
+            if job is not None:
+                return job
+        return None
+
+    def mark_running(self, cpu, pid):
+        with self._lock:
+            if pid is None:
+                self._busy.pop(cpu, None)
+            else:
+                self._busy[cpu] = pid
+
+    def is_running(self, pid):
+        with self._lock:
+            return pid in self._busy.values()
+
+    def should_preempt(self, cpu, job):
+        return self.queues[cpu].should_preempt(job)
+
+    def quantum_for(self, cpu, job):
+        return self.queues[cpu].quantum_for(job)
+
+    def discard(self, pid):
+        for queue in self.queues:
+            if queue.discard(pid):
+                return
+
+    def rebuild(self):
+        """Reload every CPU queue from the unclaimed Ready rows in the database (arrival order)."""
+        from .models import Process
+
+        rows = list(
+            Process.objects
+            .filter(status='Ready', worker__isnull=True)
+            .order_by('created_at', 'id')
+            .values_list('id', 'burst', 'program_counter', 'priority', 'affinity')
+        )
+        per_cpu = [[] for _ in self.queues]
+        for i, (pid, burst, pc, priority, affinity) in enumerate(rows):
+            job = Job(pid, burst=burst, remaining=max(burst - pc, 0), priority=priority, affinity=affinity)
+            cpu = affinity if affinity is not None and 0 <= affinity < self.cpus else i % self.cpus
+            per_cpu[cpu].append(job)
+        for cpu, (queue, jobs) in enumerate(zip(self.queues, per_cpu)):
+            queue.reset(jobs)
+            if jobs:
+                self._wake(cpu, jobs[0])
+        return len(rows)
+
+    def snapshot(self):
+        return [job for queue in self.queues for job in queue.snapshot()]
+
+    def snapshot_by_cpu(self):
+        return [queue.snapshot() for queue in self.queues]
+
+    def __len__(self):
+        return sum(len(queue) for queue in self.queues)
+
+
+def _default_run_queue():
+    from django.conf import settings
+    return RunQueueSet(
+        cpus=getattr(settings, 'SCHEDULER_CPUS', 1),
+        policy=getattr(settings, 'SCHEDULER_POLICY', 'fcfs'),
+        quantum=getattr(settings, 'SCHEDULER_QUANTUM', None),
+        work_stealing=getattr(settings, 'SCHEDULER_WORK_STEALING', True),
+    )
+
+
+# Shared by the web views (producers) and the per-CPU dispatcher threads (consumers)
+RUN_QUEUE = _default_run_queue()
@@ -0,0 +1,343 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+from . import apps as ram
+from .content import read_text
+from .events import EVENTS
+from .models import Process, FileSystemObject
+from .prefetch import PREFETCH
+from .runqueue import RUN_QUEUE
+from .sharedram import SHARED_RAM
+from .simclock import CLOCK
+from .workers import claim
+from .writeback import WRITE_BACK, recover
+
+logger = logging.getLogger(__name__)
+
+# Seconds the scheduler waits on an empty run queue before resyncing it from the DB
+RUN_QUEUE_IDLE_RESYNC = 30
+# Name of this standalone worker (run_scheduler), None for the scheduler embedded
+# in the web server. Every write of a dispatcher, buffered ones included (see
+# api.writeback), is conditional on the row still being held by it, so a worker
+# presumed dead cannot overwrite its successor.
+WORKER = None
+
+
+def set_last_event(msg):
+    ram.LAST_EVENT = msg
+    SHARED_RAM.set_event(msg)
+
+
+def emit(proc, kind, msg=None, **data):
+    """Publish a process event to its owner's stream (and keep LAST_EVENT for pollers)."""
+    if msg is not None:
+        set_last_event(msg)
+        data['message'] = msg
+    EVENTS.publish(kind, {'pid': proc.id, **data}, user_id=proc.owner_id)
+
+
+def emit_frames(changes):
+    """Broadcast frame-table deltas: (frame, pid, v_page) with pid None for a freed frame."""
+    if changes:
+        EVENTS.publish('frames', [
+            {'frame': frame, 'pid': pid, 'v_page': v_page} for frame, pid, v_page in changes
+        ])
+
+
+def release_memory(pid):
+    """Free the frames, read-ahead state and buffered writes of a process that will not run again."""
+    PREFETCH.forget(pid)
+    WRITE_BACK.discard(pid)
+    emit_frames([(frame, None, None) for frame in ram.MEMORY.release_process(pid)])
+
+
+def forget_processes(pids):
+    """
+    Killed or deleted processes: drop them from the run queues and release the
+    memory of those not on a CPU (a running one does so when its slice ends).
+    """
+    for pid in pids:
+        RUN_QUEUE.discard(pid)
+        if not RUN_QUEUE.is_running(pid):
+            release_memory(pid)
+
+
+def without_status(fields):
+    # Buffered Blocked/Running flips must never overwrite a final transition
+    fields.pop('status', None)
+    return fields
+
+
+def start_scheduler(worker=None):
+    """
+    Start one dispatcher thread per simulated CPU. As standalone `worker`
+    (see api.workers) the CPUs claim their processes from the database;
+    otherwise web requests queue them directly.
+    """
+    global WORKER
+    WORKER = worker
+    WRITE_BACK.worker = worker
+    if worker is None:
+        try:
+            # Simulated RAM is empty after a restart: requeue interrupted processes
+            # and drop page tables that point at frames which no longer exist
+            interrupted = recover()
+            if interrupted:
+                logger.info('Requeued %s process(es) interrupted by a restart', interrupted)
+            RUN_QUEUE.rebuild()
+        except Exception:
+            logger.exception('Could not rebuild run queue from the database')
+    RUN_QUEUE.dispatchers = RUN_QUEUE.cpus
+    try:
+        # Let web workers in other processes see this process's RAM
+        SHARED_RAM.publish(ram.MEMORY)
+    except OSError:
+        logger.exception('Could not publish the simulated RAM to %s', SHARED_RAM.path)
+    # Waking an idle CPU must register it with the clock before time moves on
+    RUN_QUEUE.on_wake = CLOCK.wake
+    CLOCK.join(range(RUN_QUEUE.cpus))
+    threads = []
+    for cpu in range(RUN_QUEUE.cpus):
+        t = threading.Thread(target=scheduler_loop, args=(cpu,), name=f'ProcessScheduler-CPU{cpu}', daemon=True)
+        t.start()
+        threads.append(t)
+    return threads
+
+
+def scheduler_loop(cpu=0):
+    logger.info('Process scheduler started on CPU %s (%s, %s time).', cpu, RUN_QUEUE.policy.name, CLOCK.mode)
+    CLOCK.resume(cpu)
+    while True:
+        try:
+            # Only take work while holding our turn in virtual time, so which CPU
+            # runs (or steals) which job never depends on thread timing
+            job = RUN_QUEUE.take(cpu)
+            if job is None and WORKER is not None:
+                connection.close_if_unusable_or_obsolete()
+                if claim(WORKER, getattr(settings, 'SCHEDULER_CLAIM_BATCH', 1)):
+                    job = RUN_QUEUE.take(cpu)
+            if job is None:
+                # Nothing to do: stop holding up the other CPUs and park until a push
+                # wakes us (a standalone worker polls the database instead)
+                CLOCK.idle(cpu)
+                if WORKER is None:
+                    woken = RUN_QUEUE.wait(cpu, timeout=RUN_QUEUE_IDLE_RESYNC)
+                else:
+                    woken = RUN_QUEUE.wait(cpu, timeout=getattr(settings, 'SCHEDULER_POLL_INTERVAL', 1.0))
+                if not woken and cpu == 0 and WORKER is None:
+                    # Idle: resync with the DB in case rows were added out-of-band (admin, shell)
+                    connection.close_if_unusable_or_obsolete()
+                    RUN_QUEUE.rebuild()
+                CLOCK.resume(cpu)
+                continue
+
+            # Ensure DB connection is usable in this thread
+            try:
+                connection.close_if_unusable_or_obsolete()
+            except Exception:
+                pass
+
+            # Attempt to claim the process atomically by status; only one CPU can win
+            claimed = (
+                Process.objects
+                .filter(id=job.pid, status='Ready', worker=WORKER)
+                .update(status='Running', cpu=cpu)
+            )
+            if claimed == 0:
+                # Killed, already run, or claimed elsewhere; a killed one may
+                # still have frames here from an earlier slice
+                if not Process.objects.filter(id=job.pid).exists():
+                    release_memory(job.pid)
+                continue
+            proc = Process.objects.filter(id=job.pid).first()
+            if not proc:
+                continue
+
+            RUN_QUEUE.mark_running(cpu, proc.id)
+            emit(proc, 'state', status='Running', cpu=cpu)
+            try:
+                run_slice(proc, job, cpu)
+            finally:
+                RUN_QUEUE.mark_running(cpu, None)
+
+        except Exception as e:
+            logger.exception('Scheduler loop error on CPU %s: %s', cpu, e)
+            CLOCK.idle(cpu)
+            time.sleep(2)
+            CLOCK.resume(cpu)
+
+
+def run_slice(proc, job, cpu=0):
+    """Run `proc` until it finishes, its quantum expires, or the policy preempts it."""
+    logger.debug('Running PID %s (%s) on CPU %s', proc.id, proc.file_object_id, cpu)
+    slice_start = CLOCK.local(cpu)
+
+    if proc.started_at is None:
+        # Slow down demo: simulate CPU work while in Running state (first dispatch only)
+        proc.started_at = CLOCK.timestamp(CLOCK.advance(cpu, CLOCK.cost('dispatch')))
+        WRITE_BACK.set(proc.id, started_at=proc.started_at)
+
+    # Load file content to simulate virtual memory (1 line = 1 virtual page)
+    try:
+        fso = FileSystemObject.objects.get(id=proc.file_object_id, owner=proc.owner, is_directory=False)
+        # Exec permission check: expect 'x' at index 2
+        perms = (fso.permissions or '')
+        if len(perms) >= 3 and perms[2] != 'x':
+            msg = f"[Scheduler] Exec denied for PID {proc.id}: file not executable"
+            logger.info(msg)
+            # Permissions may change between slices: free what earlier slices loaded
+            finish_process(proc, proc.program_counter, proc.cpu_time + (CLOCK.local(cpu) - slice_start), cpu, msg=msg)
+            return
+        content = read_text(fso)
+    except FileSystemObject.DoesNotExist:
+        content = ''
+    lines = content.split('\n') if content else []
+
+    # Work through the virtual pages sequentially, resuming at the program counter
+    pc = proc.program_counter
+    quantum = RUN_QUEUE.quantum_for(cpu, job)
+    executed = faults = 0
+    while pc < len(lines):
+        faults += access_page(proc, pc, cpu, len(lines))
+        pc += 1
+        executed += 1
+        job.remaining = len(lines) - pc
+        if pc >= len(lines):
+            break
+        if quantum and executed >= quantum:
+            break
+        if RUN_QUEUE.should_preempt(cpu, job):
+            break
+
+    cpu_time = proc.cpu_time + (CLOCK.local(cpu) - slice_start)
+    # Access counters are added to the row with the slice's final UPDATE
+    counters = {'faults': F('faults') + faults, 'hits': F('hits') + executed - faults}
+    if pc < len(lines):
+        # Time slice over: flush buffered page-table writes with the Ready transition
+        pending = without_status(WRITE_BACK.take(proc.id))
+        with transaction.atomic():
+            WRITE_BACK.flush()
+            requeued = (
+                Process.objects
+                .filter(id=proc.id, status__in=['Running', 'Blocked'], worker=WORKER)
+                .update(status='Ready', cpu=None, program_counter=pc, cpu_time=cpu_time, **counters, **pending)
+            )
+        if requeued:
+            RUN_QUEUE.requeue(cpu, job, used=executed, quantum_expired=bool(quantum and executed >= quantum))
+            emit(proc, 'state', status='Ready', cpu=None, program_counter=pc)
+        else:
+            # Killed while running: nothing will resume it, so give its frames back
+            release_memory(proc.id)
+        logger.debug('Preempted PID %s at page %s', proc.id, pc)
+        return
+
+    finish_process(proc, pc, cpu_time, cpu, counters)
+
+
+def access_page(proc, v_idx, cpu=0, npages=0):
+    """
+    Execute virtual page `v_idx` of `proc` (a program of `npages` pages);
+    returns whether it faulted. With read-ahead on (api.prefetch) a fault
+    also loads the pages after it, and pages leaving the process's working
+    set are freed.
+    """
+    # The frame table and its per-process reverse map are authoritative; the
+    # Process row only gets a (buffered) copy of the page table
+    frame = ram.MEMORY.lookup(proc.id, v_idx)
+    fault = frame is None
+    if fault:
+        # Page fault (status and page-table writes are buffered, see api.writeback)
+        WRITE_BACK.set_status(proc.id, 'Blocked')
+        msg = f"[Scheduler] Page Fault for PID {proc.id}, VPage {v_idx}!"
+        logger.info(msg)
+        emit(proc, 'state', status='Blocked', cpu=cpu)
+        # Simulate disk load (slower for demo)
+        CLOCK.advance(cpu, CLOCK.cost('page_fault'))
+        # Map and load; the replacement policy picks a victim when RAM is full
+        frame, evicted = ram.MEMORY.load(proc.id, v_idx)
+        unmapped(proc, frame, evicted)
+        loaded = [(frame, proc.id, v_idx)]
+        resident = ram.MEMORY.resident_pages(proc.id)
+        ahead = [
+            v_page for v_page in PREFETCH.plan(proc.id, v_idx, npages, ram.MEMORY.nframes)
+            if v_page not in resident
+        ]
+        if ahead:
+            # Same disk access: each further page only costs its transfer
+            CLOCK.advance(cpu, CLOCK.cost('prefetch_page') * len(ahead))
+            for v_page in ahead:
+                ahead_frame, ahead_evicted = ram.MEMORY.load(proc.id, v_page, prefetch=True)
+                unmapped(proc, ahead_frame, ahead_evicted)
+                loaded.append((ahead_frame, proc.id, v_page))
+            PREFETCH.loaded(proc.id, ahead)
+        WRITE_BACK.set_page_table(proc.id, ram.MEMORY.page_array(proc.id))
+        # Fault serviced: the process keeps the CPU for the rest of its slice
+        WRITE_BACK.set_status(proc.id, 'Running')
+        emit(proc, 'fault', msg, v_page=v_idx, frame=frame, evicted=evicted, cpu=cpu, prefetched=ahead)
+        emit_frames(loaded)
+    else:
+        # Memory hit
+        msg = f"[Scheduler] Memory hit for PID {proc.id}, VPage {v_idx}."
+        logger.debug(msg)
+        emit(proc, 'hit', msg, v_page=v_idx, frame=frame, cpu=cpu)
+        # Simulate brief CPU time per page hit
+        CLOCK.advance(cpu, CLOCK.cost('page_hit'))
+    trimmed = [
+        (ram.MEMORY.release_page(proc.id, v_page), None, None)
+        for v_page in PREFETCH.referenced(proc.id, v_idx, hit=not fault)
+    ]
+    if trimmed:
+        WRITE_BACK.set_page_table(proc.id, ram.MEMORY.page_array(proc.id))
+        emit_frames([change for change in trimmed if change[0] is not None])
+    if fault or trimmed:
+        SHARED_RAM.set_prefetch(PREFETCH.counters())
+    return fault
+
+
+def unmapped(proc, frame, evicted):
+    """Bookkeeping for the page `evicted` from `frame` to make room for `proc` (None: a free frame was used)."""
+    if evicted is None:
+        return
+    ev_pid, ev_vpage = evicted
+    logger.info('[Scheduler] Evicted PID %s, VPage %s from frame %s (%s)',
+                ev_pid, ev_vpage, frame, ram.MEMORY.policy.name)
+    if ev_pid != proc.id:
+        # The frame table knows the victim's remaining pages; no need to read its row
+        WRITE_BACK.set_page_table(ev_pid, ram.MEMORY.page_array(ev_pid))
+
+
+def finish_process(proc, pc, cpu_time, cpu=0, counters=None, msg=None):
+    # After all pages accessed, mark as finished and record turnaround / waiting time
+    # (all in virtual time, so they do not depend on the simulation mode)
+    finished_at = CLOCK.timestamp(CLOCK.local(cpu))
+    turnaround = (finished_at - (proc.arrived_at or proc.created_at)).total_seconds()
+    released = []
+    try:
+        # Free all physical frames this process still owns
+        PREFETCH.forget(proc.id)
+        released = ram.MEMORY.release_process(proc.id)
+    except Exception:
+        # Do not let cleanup errors crash the scheduler
+        logger.exception('Error freeing frames for PID %s', proc.id)
+    # Buffered writes for this PID are superseded; page table cleared in the same UPDATE
+    pending = without_status(WRITE_BACK.take(proc.id))
+    pending['page_frames'] = b''
+    Process.objects.filter(id=proc.id, worker=WORKER).update(
+        status='Finished',
+        cpu=None,
+        program_counter=pc,
+        cpu_time=cpu_time,
+        finished_at=finished_at,
+        turnaround=turnaround,
+        waiting_time=max(turnaround - cpu_time, 0),
+        **(counters or {}),
+        **pending,
+    )
+    emit(proc, 'state', msg, status='Finished', cpu=None, turnaround=turnaround)
+    emit_frames([(frame, None, None) for frame in released])
+    logger.debug('Finished PID %s', proc.id)
@@ -0,0 +1,232 @@
+import heapq
+import itertools
+from collections import deque
+
+
+class Job:
+    """Scheduler-side view of a Ready process (1 line of the program = 1 unit of CPU work)."""
+    __slots__ = ('pid', 'burst', 'remaining', 'priority', 'level', 'seq', 'affinity')
+
+    def __init__(self, pid, burst=0, remaining=None, priority=0, level=0, affinity=None):
+        self.pid = pid
+        self.burst = burst
+        self.remaining = burst if remaining is None else remaining
+        self.priority = priority
+        self.level = level
+        self.seq = 0
+        # CPU this job is pinned to (None = may run on / be stolen by any CPU)
+        self.affinity = affinity
+
+    def __repr__(self):
+        return f"Job(pid={self.pid}, remaining={self.remaining}/{self.burst}, prio={self.priority}, level={self.level})"
+
+
+class SchedulingPolicy:
+    """
+    Ordering of the Ready queue plus time-slice rules.
+
+    Subclasses implement add/pop/peek/__len__. The scheduler asks
+    quantum_for() how many pages a job may execute before it is preempted,
+    should_preempt() after every page, and hands the job back via
+    preempted() when its slice ends early.
+    """
+    name = None
+    preemptive = False
+
+    def __init__(self, quantum=None):
+        self.quantum = quantum
+        self._seq = itertools.count()
+
+    def add(self, job):
+        raise NotImplementedError
+
+    def pop(self):
+        raise NotImplementedError
+
+    def peek(self):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def quantum_for(self, job):
+        return self.quantum
+
+    def should_preempt(self, current):
+        return False
+
+    def preempted(self, job, used, quantum_expired):
+        self.add(job)
+
+    def jobs(self):
+        raise NotImplementedError
+
+
+class FIFOPolicy(SchedulingPolicy):
+    name = 'fcfs'
+
+    def __init__(self, quantum=None):
+        # FCFS always runs to completion
+        super().__init__(None)
+        self._queue = deque()
+
+    def add(self, job):
+        job.seq = next(self._seq)
+        self._queue.append(job)
+
+    def pop(self):
+        return self._queue.popleft() if self._queue else None
+
+    def peek(self):
+        return self._queue[0] if self._queue else None
+
+    def __len__(self):
+        return len(self._queue)
+
+    def jobs(self):
+        return list(self._queue)
+
+
+class RoundRobinPolicy(FIFOPolicy):
+    name = 'rr'
+
+    def __init__(self, quantum=None):
+        super().__init__()
+        self.quantum = quantum or 4
+
+
+class _HeapPolicy(SchedulingPolicy):
+    def __init__(self, quantum=None):
+        super().__init__(quantum)
+        self._heap = []
+
+    def key(self, job):
+        raise NotImplementedError
+
+    def add(self, job):
+        job.seq = next(self._seq)
+        heapq.heappush(self._heap, (self.key(job), job.seq, job))
+
+    def pop(self):
+        return heapq.heappop(self._heap)[2] if self._heap else None
+
+    def peek(self):
+        return self._heap[0][2] if self._heap else None
+
+    def __len__(self):
+        return len(self._heap)
+
+    def jobs(self):
+        return [entry[2] for entry in sorted(self._heap)]
+
+    def should_preempt(self, current):
+        if not self.preemptive:
+            return False
+        head = self.peek()
+        return head is not None and self.key(head) < self.key(current)
+
+
+class SJFPolicy(_HeapPolicy):
+    """Shortest Job First (non-preemptive), keyed on total program length."""
+    name = 'sjf'
+
+    def __init__(self, quantum=None):
+        super().__init__(None)
+
+    def key(self, job):
+        return job.burst
+
+
+class SRTFPolicy(_HeapPolicy):
+    """Shortest Remaining Time First: preempts as soon as a shorter job is queued."""
+    name = 'srtf'
+    preemptive = True
+
+    def key(self, job):
+        return job.remaining
+
+
+class PriorityPolicy(_HeapPolicy):
+    """Lower number = higher priority; preempts for a strictly higher priority arrival."""
+    name = 'priority'
+    preemptive = True
+
+    def key(self, job):
+        return job.priority
+
+
+class MLFQPolicy(SchedulingPolicy):
+    """
+    Multilevel feedback queue: new jobs enter level 0, a job that burns its
+    whole quantum drops one level (quantum doubles per level), and every
+    `boost_every` dispatches all jobs are lifted back to level 0 so long
+    programs cannot starve.
+    """
+    name = 'mlfq'
+    preemptive = True
+
+    def __init__(self, quantum=None, levels=3, boost_every=50):
+        super().__init__(quantum or 2)
+        self.levels = [deque() for _ in range(levels)]
+        self.boost_every = boost_every
+        self._dispatches = 0
+
+    def add(self, job):
+        job.seq = next(self._seq)
+        job.level = min(max(job.level, 0), len(self.levels) - 1)
+        self.levels[job.level].append(job)
+
+    def pop(self):
+        self._dispatches += 1
+        if self.boost_every and self._dispatches % self.boost_every == 0:
+            self._boost()
+        for queue in self.levels:
+            if queue:
+                return queue.popleft()
+        return None
+
+    def peek(self):
+        for queue in self.levels:
+            if queue:
+                return queue[0]
+        return None
+
+    def __len__(self):
+        return sum(len(q) for q in self.levels)
+
+    def jobs(self):
+        return [job for queue in self.levels for job in queue]
+
+    def quantum_for(self, job):
+        return self.quantum * (2 ** job.level)
+
+    def should_preempt(self, current):
+        head = self.peek()
+        return head is not None and head.level < current.level
+
+    def preempted(self, job, used, quantum_expired):
+        if quantum_expired:
+            job.level = min(job.level + 1, len(self.levels) - 1)
+        self.add(job)
+
+    def _boost(self):
+        jobs = self.jobs()
+        for queue in self.levels:
+            queue.clear()
+        for job in sorted(jobs, key=lambda j: j.seq):
+            job.level = 0
+            self.levels[0].append(job)
+
+
+POLICIES = {
+    cls.name: cls
+    for cls in (FIFOPolicy, RoundRobinPolicy, SJFPolicy, SRTFPolicy, PriorityPolicy, MLFQPolicy)
+}
+
+
+def make_policy(name, quantum=None):
+    try:
+        cls = POLICIES[name]
+    except KeyError:
+        raise ValueError(f"Unknown scheduling policy '{name}'. Choose one of: {', '.join(sorted(POLICIES))}")
+    return cls(quantum=quantum)
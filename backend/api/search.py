@@ -0,0 +1,212 @@
+import heapq
+
+from django.db import connection, transaction
+from django.db.models import Count, Prefetch, Q
+
+from .content import _batches, iter_text
+from .models import FileBlock, FileSystemObject, SearchTrigram
+
+# Length of the indexed character sequences
+GRAM = 3
+# A pattern narrows the candidates by at most this many of its trigrams (any
+# subset still finds every match; more only trims false candidates)
+MAX_QUERY_GRAMS = 16
+# Candidate files whose blocks are loaded together while matching
+SEARCH_CHUNK = 100
+# Index rows per executemany
+INSERT_BATCH = 5000
+ORDERS = ('rank', 'path')
+
+
+def trigrams(text):
+    """Distinct case-folded trigrams of the lines of `text` (none spans a newline)."""
+    grams = set()
+    for line in text.casefold().split('\n'):
+        grams.update(line[i:i + GRAM] for i in range(len(line) - GRAM + 1))
+    return grams
+
+
+def _insert(rows):
+    """
+    Insert (body_id, trigram) rows. A file has about as many entries as
+    characters, so they go through one executemany per batch rather than
+    bulk_create, whose per-object work costs more than the INSERTs.
+    """
+    table = connection.ops.quote_name(SearchTrigram._meta.db_table)
+    body, trigram = (connection.ops.quote_name(SearchTrigram._meta.get_field(f).column) for f in ('body', 'trigram'))
+    sql = f'INSERT INTO {table} ({body}, {trigram}) VALUES (%s, %s)'
+    rows = list(rows)
+    with transaction.atomic(), connection.cursor() as cursor:
+        for i in range(0, len(rows), INSERT_BATCH):
+            cursor.executemany(sql, rows[i:i + INSERT_BATCH])
+
+
+def _add(entries):
+    """Insert {body_id: trigrams} entries that are not indexed yet."""
+    rows = []
+    for body_id, grams in entries.items():
+        for batch in _batches(grams):
+            grams -= set(SearchTrigram.objects.filter(body_id=body_id, trigram__in=batch).values_list('trigram', flat=True))
+        rows.extend((body_id, gram) for gram in grams)
+    _insert(rows)
+
+
+def index_body(body_id, text):
+    """Make a body's entries those of `text`, its new data: only the difference is written."""
+    grams = trigrams(text)
+    existing = set(SearchTrigram.objects.filter(body_id=body_id).values_list('trigram', flat=True))
+    for batch in _batches(existing - grams):
+        SearchTrigram.objects.filter(body_id=body_id, trigram__in=batch).delete()
+    _insert((body_id, gram) for gram in grams - existing)
+
+
+def index_new(texts):
+    """Entries of bodies that were just created, {body_id: text}, in one bulk insert."""
+    _insert((body_id, gram) for body_id, text in texts.items() for gram in trigrams(text))
+
+
+def extend_body(body_id, before, text):
+    """Entries for `text` appended to a body whose data ended with `before` (its last GRAM - 1 characters)."""
+    _add({body_id: trigrams(before + text)})
+
+
+def copy_index(source_id, body_id):
+    """Give a body copied from `source_id` (copy-on-write) the same entries."""
+    _insert(
+        (body_id, gram)
+        for gram in SearchTrigram.objects.filter(body_id=source_id).values_list('trigram', flat=True).iterator()
+    )
+
+
+def rebuild_index():
+    """Recompute every body's entries from its data (repair after out-of-band writes). Returns the bodies indexed."""
+    from .models import FileBody
+
+    count = 0
+    for body_id in FileBody.objects.values_list('pk', flat=True).iterator():
+        text = ''.join(FileBlock.objects.filter(body_id=body_id).order_by('index').values_list('blob__data', flat=True))
+        with transaction.atomic():
+            index_body(body_id, text)
+        count += 1
+    return count
+
+
+def candidates(user, pattern, root=None, invert=False):
+    """
+    The user's files (under `root`) that can hold a line matching `pattern`:
+    those whose body has every trigram of the pattern. Short patterns and
+    inverted searches cannot be narrowed down and get every file; so do
+    legacy files whose content is not in a body yet. Files without the owner
+    read bit are left out, as their content GET refuses them.
+    """
+    files = (
+        FileSystemObject.objects
+        .filter(owner=user, is_directory=False)
+        .filter(Q(permissions__startswith='r') | Q(permissions=''))
+    )
+    if root is not None:
+        files = files.filter(path__startswith=root.path)
+    grams = sorted(trigrams(pattern))
+    if invert or not grams or '\n' in pattern:
+        return files
+    if len(grams) > MAX_QUERY_GRAMS:
+        # Evenly spread, so the kept ones still cover the whole pattern
+        step = len(grams) / MAX_QUERY_GRAMS
+        grams = [grams[int(i * step)] for i in range(MAX_QUERY_GRAMS)]
+    bodies = (
+        SearchTrigram.objects
+        .filter(trigram__in=grams)
+        .order_by()
+        .values('body')
+        .annotate(n=Count('id'))
+        .filter(n=len(grams))
+        .values('body')
+    )
+    return files.filter(Q(body__in=bodies) | Q(body__isnull=True))
+
+
+def _with_paths(matched):
+    for i in range(0, len(matched), SEARCH_CHUNK):
+        chunk = matched[i:i + SEARCH_CHUNK]
+        paths = FileSystemObject.name_paths([(pk, path, name) for pk, path, name, _ in chunk])
+        for pk, _, _, result in chunk:
+            yield {'id': pk, 'path': paths[pk], **result}
+
+
+def match_lines(text, pattern, ignore_case=False, invert=False, count=False, max_count=None):
+    """(number of matching lines, [{'line', 'text'}] unless `count`, number of lines) of `text`."""
+    if ignore_case:
+        pattern = pattern.casefold()
+    lines = text.split('\n') if text else []
+    if lines and not lines[-1]:
+        # A final newline ends the last line rather than starting another
+        lines.pop()
+    total = 0
+    matched = []
+    for number, line in enumerate(lines, 1):
+        if (pattern in (line.casefold() if ignore_case else line)) != invert:
+            total += 1
+            if not count:
+                matched.append({'line': number, 'text': line})
+            if max_count is not None and total >= max_count:
+                break
+    return total, matched, len(lines)
+
+
+def search(user, pattern, root=None, ignore_case=False, invert=False, count=False,
+           max_count=None, limit=None, order='rank'):
+    """
+    grep over the user's files (recursively under directory or file `root`).
+    Yields {'id', 'path', 'count', 'score', 'lines': [{'line', 'text'}]} for
+    every file with matching lines, then a summary {'done', 'files',
+    'matches', 'candidates', 'truncated'}. The pattern is a literal matched
+    within lines; `invert` selects the lines without it, `count` leaves the
+    lines out and `max_count` stops reading a file after that many matches.
+
+    Only the candidate files are read (see candidates()), a chunk at a time
+    with their blocks prefetched (inline legacy content comes with the row). order='path' yields files as they are
+    matched; order='rank' yields them best first once all are matched, the
+    score being the matching lines over the square root of the file's lines
+    (only the best `limit` are held meanwhile, ties going to the first path).
+    At most `limit` files are returned.
+    """
+    files = (
+        candidates(user, pattern, root, invert)
+        .order_by('path')
+        .prefetch_related(Prefetch('body__blocks', queryset=FileBlock.objects.select_related('blob')))
+    )
+    scanned = found = hits = 0
+    matched = []  # (id, path, name, result) waiting to be yielded
+    best = []  # order='rank': min-heap of (score, -found, match), the worst kept one first
+    truncated = False
+    for obj in files.iterator(chunk_size=SEARCH_CHUNK):
+        if order == 'path' and limit is not None and found >= limit:
+            truncated = True
+            break
+        scanned += 1
+        text = ''.join(iter_text(obj)) if obj.body_id is not None else obj.content
+        total, lines, line_count = match_lines(text, pattern, ignore_case, invert, count, max_count)
+        if not total:
+            continue
+        found += 1
+        hits += total
+        result = {'name': obj.name, 'count': total, 'score': round(total / max(line_count, 1) ** 0.5, 4)}
+        if not count:
+            result['lines'] = lines
+        match = (obj.pk, obj.path, obj.name, result)
+        if order == 'rank':
+            entry = (result['score'], -found, match)
+            if limit is None or len(best) < limit:
+                heapq.heappush(best, entry)
+            else:
+                heapq.heappushpop(best, entry)
+                truncated = True
+            continue
+        matched.append(match)
+        if len(matched) >= SEARCH_CHUNK:
+            yield from _with_paths(matched)
+            matched = []
+    if order == 'rank':
+        matched = [match for _, _, match in sorted(best, reverse=True)]
+    yield from _with_paths(matched)
+    yield {'done': True, 'files': found, 'matches': hits, 'candidates': scanned, 'truncated': truncated}
@@ -1,14 +1,77 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db.models import Max
 from .models import FileSystemObject
-from .models import Process
+from .models import Process, SchedulerWorker
 
 class FileSystemObjectSerializer(serializers.ModelSerializer):
+    # Stored in blocks of shared blobs (api.content), not in the model's content column
+    content = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
     class Meta:
         model = FileSystemObject
         # The owner is now a read-only field
-        fields = ['id', 'name', 'is_directory', 'owner', 'parent', 'permissions', 'created_at','content']
-        read_only_fields = ['owner'] # This tells the serializer not to expect the owner on create/update
+        fields = ['id', 'name', 'is_directory', 'owner', 'parent', 'permissions', 'created_at','content', 'size']
+        read_only_fields = ['owner', 'size'] # This tells the serializer not to expect the owner on create/update
+
+    def to_representation(self, instance):
+        from .content import read_text
+        data = super().to_representation(instance)
+        if 'content' in data:
+            data['content'] = read_text(instance)
+        return data
+
+    def create(self, validated_data):
+        from .content import write_text
+        content = validated_data.pop('content', None)
+        instance = super().create(validated_data)
+        if content and not instance.is_directory:
+            write_text(instance, content)
+        return instance
+
+    def update(self, instance, validated_data):
+        from .content import write_text
+        content = validated_data.pop('content', None)
+        instance = super().update(instance, validated_data)
+        if content is not None and not instance.is_directory:
+            write_text(instance, content)
+        return instance
+
+    def validate_parent(self, value):
+        if value is None:
+            return value
+        request = self.context.get('request')
+        if request is not None and value.owner_id != request.user.id:
+            raise serializers.ValidationError("Parent directory not found.")
+        if not value.is_directory:
+            raise serializers.ValidationError("Parent must be a directory.")
+        if self.instance is not None and self.instance.path and value.path.startswith(self.instance.path):
+            raise serializers.ValidationError("Cannot move a directory into itself.")
+        return value
+
+class FileSystemListSerializer(serializers.ModelSerializer):
+    """
+    Directory entries without file content (size in bytes instead, and for
+    directories the bytes and files below them). Pass fields=[...] to return
+    only some of them.
+    """
+    class Meta:
+        model = FileSystemObject
+        fields = ['id', 'name', 'is_directory', 'owner', 'parent', 'permissions', 'size', 'tree_size', 'tree_files', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+class FileSystemTreeSerializer(serializers.ModelSerializer):
+    """Tree entries without file content, for recursive listings."""
+    class Meta:
+        model = FileSystemObject
+        fields = ['id', 'name', 'is_directory', 'parent', 'permissions', 'size', 'path', 'depth', 'created_at']
+        read_only_fields = fields
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -25,11 +88,36 @@ class UserSerializer(serializers.ModelSerializer):
 
 class ProcessSerializer(serializers.ModelSerializer):
     file_name = serializers.SerializerMethodField(read_only=True)
+    # Stored compactly in page_frames; served in the original JSON shape
+    page_table = serializers.ReadOnlyField()
 
     class Meta:
         model = Process
-        fields = ['id', 'owner', 'file_object', 'file_name', 'status', 'page_table', 'created_at']
-        read_only_fields = ['owner', 'status', 'file_name', 'page_table']
+        fields = [
+            'id', 'owner', 'file_object', 'file_name', 'status', 'page_table', 'priority',
+            'affinity', 'cpu', 'burst', 'program_counter', 'turnaround', 'waiting_time',
+            'faults', 'hits', 'created_at',
+        ]
+        read_only_fields = [
+            'owner', 'status', 'file_name', 'page_table', 'cpu',
+            'burst', 'program_counter', 'turnaround', 'waiting_time', 'faults', 'hits',
+        ]
+
+    def __init__(self, *args, page_table=True, **kwargs):
+        # Listings leave the page table out unless asked for (?page_table=1)
+        super().__init__(*args, **kwargs)
+        if not page_table:
+            self.fields.pop('page_table')
+
+    def validate_affinity(self, value):
+        from .runqueue import RUN_QUEUE
+        cpus = RUN_QUEUE.cpus
+        if not RUN_QUEUE.dispatchers:
+            # Scheduled by standalone workers: any of them may claim it
+            cpus = SchedulerWorker.objects.aggregate(cpus=Max('cpus'))['cpus'] or cpus
+        if value is not None and value >= cpus:
+            raise serializers.ValidationError(f"CPU {value} does not exist (0-{cpus - 1}).")
+        return value
 
     def get_file_name(self, obj):
         return obj.file_object.name if obj.file_object else None
\ No newline at end of file
@@ -0,0 +1,252 @@
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # not on Windows: any number of writers then
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Fixed binary layout of the shared region (little-endian):
+#
+#   0   magic 'VFSR', layout version (u32)
+#   8   seq (u64): odd while the writer is changing the region
+#   16  frames (u32), writer pid (u32)
+#   24  resident frames (u32), LAST_EVENT length (u32), hits, faults, evictions (u64), policy (8s)
+#   64  read-ahead: prefetched, prefetch hits, wasted, trimmed (u64, see api.prefetch)
+#   96  LAST_EVENT, UTF-8, EVENT_SIZE bytes
+#   608 one record per frame: owner pid (i64, -1 = free), virtual page (i32)
+MAGIC = b'VFSR'
+LAYOUT = 2
+PREFIX = struct.Struct('<4sIQII')
+SEQ = struct.Struct('<Q')
+SEQ_OFFSET = 8
+STATE = struct.Struct('<IIQQQ8s')
+STATE_OFFSET = PREFIX.size
+PREFETCH = struct.Struct('<QQQQ')
+PREFETCH_OFFSET = 64
+EVENT_OFFSET = PREFETCH_OFFSET + PREFETCH.size
+EVENT_SIZE = 512
+FRAME = struct.Struct('<qi')
+FRAMES_OFFSET = EVENT_OFFSET + EVENT_SIZE
+# Attempts at a consistent read before giving up (a write holds the region for microseconds)
+READ_RETRIES = 1000
+
+
+class SharedRAM:
+    """
+    The simulated RAM (frame table, replacement counters and LAST_EVENT)
+    published in an mmap-backed file, so every web worker process can read
+    what the scheduler process holds in api.paging.MEMORY.
+
+    One process writes: publish() makes the PhysicalMemory mirror each change
+    into the region. Writers are serialized by a lock; readers take none and
+    use the seq counter as a seqlock, retrying a copy that overlapped a write.
+    The writer creates a fresh file and renames it into place, so readers
+    notice a new writer (or RAM size) by its inode and map it again. Once
+    the writer process has exited, snapshot() returns None again.
+    """
+
+    def __init__(self, path):
+        self.path = str(path) if path else None
+        self._lock = threading.Lock()
+        self._map = None
+        self._seq = 0
+        self._lock_file = None
+        self._reader = None
+        self._reader_id = None
+        self._read_lock = threading.Lock()
+
+    @property
+    def publishing(self):
+        return self._map is not None
+
+    def publish(self, memory):
+        """
+        Become the writer for `memory`: lay out a region of its size, copy its
+        current state and mirror every change from now on. Returns False when
+        sharing is disabled or another process already publishes.
+        """
+        if not self.path or self.publishing:
+            return self.publishing
+        lock_file = open(f'{self.path}.lock', 'a+b')
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                logger.info('Shared RAM %s is published by another process', self.path)
+                return False
+        size = FRAMES_OFFSET + memory.nframes * FRAME.size
+        tmp = f'{self.path}.{os.getpid()}'
+        with open(tmp, 'w+b') as f:
+            f.truncate(size)
+            region = mmap.mmap(f.fileno(), size)
+        PREFIX.pack_into(region, 0, MAGIC, LAYOUT, 0, memory.nframes, os.getpid())
+        with memory.lock:
+            self._map = region
+            self._lock_file = lock_file
+            memory.mirror = self
+            self.update(memory, range(memory.nframes))
+        os.replace(tmp, self.path)
+        return True
+
+    def update(self, memory, frames=()):
+        """Write the counters and the given frames of `memory`. Called by it, under its lock."""
+        policy = memory.policy
+        with self._lock:
+            region = self._map
+            seq = self._seq + 1
+            SEQ.pack_into(region, SEQ_OFFSET, seq)
+            event_len = STATE.unpack_from(region, STATE_OFFSET)[1]
+            STATE.pack_into(
+                region, STATE_OFFSET, memory.nframes - memory.free_frames(), event_len,
+                policy.hits, policy.faults, policy.evictions, policy.name.encode('ascii')[:8],
+            )
+            for frame in frames:
+                FRAME.pack_into(
+                    region, FRAMES_OFFSET + frame * FRAME.size, memory._frame_pid[frame], memory._frame_vpage[frame],
+                )
+            self._seq = seq + 1
+            SEQ.pack_into(region, SEQ_OFFSET, self._seq)
+
+    def set_event(self, message):
+        """Publish the last scheduler event text (cut to EVENT_SIZE bytes)."""
+        if not self.publishing:
+            return
+        data = (message or '').encode('utf-8')[:EVENT_SIZE]
+        # Never leave half a character at the cut
+        data = data.decode('utf-8', 'ignore').encode('utf-8')
+        with self._lock:
+            region = self._map
+            seq = self._seq + 1
+            SEQ.pack_into(region, SEQ_OFFSET, seq)
+            state = list(STATE.unpack_from(region, STATE_OFFSET))
+            state[1] = len(data)
+            STATE.pack_into(region, STATE_OFFSET, *state)
+            region[EVENT_OFFSET:EVENT_OFFSET + len(data)] = data
+            self._seq = seq + 1
+            SEQ.pack_into(region, SEQ_OFFSET, self._seq)
+
+    def set_prefetch(self, counters):
+        """Publish the read-ahead counters (see api.prefetch.Prefetcher.counters)."""
+        if not self.publishing:
+            return
+        with self._lock:
+            region = self._map
+            seq = self._seq + 1
+            SEQ.pack_into(region, SEQ_OFFSET, seq)
+            PREFETCH.pack_into(region, PREFETCH_OFFSET, *counters)
+            self._seq = seq + 1
+            SEQ.pack_into(region, SEQ_OFFSET, self._seq)
+
+    def _region(self):
+        # Map the published file, again whenever a new writer replaced it
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        if self._reader_id != (st.st_ino, st.st_size):
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = self._reader_id = None
+            if st.st_size < FRAMES_OFFSET:
+                return None
+            with open(self.path, 'rb') as f:
+                self._reader = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._reader_id = (st.st_ino, st.st_size)
+        return self._reader
+
+    def version(self):
+        """Changes whenever the published RAM does (None when nothing is published)."""
+        if not self.path:
+            return None
+        with self._read_lock:
+            region = self._region()
+            if region is None:
+                return None
+            return self._reader_id, SEQ.unpack_from(region, SEQ_OFFSET)[0]
+
+    def _writer_alive(self, pid):
+        if pid == os.getpid():
+            return self.publishing
+        if os.name != 'posix':
+            # No cheap probe for another process: trust the region
+            return True
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            # Exists, but runs as another user
+            return True
+        return True
+
+    def snapshot(self, offset=0, limit=None):
+        """
+        Consistent copy of the published RAM, frames[offset:offset + limit]
+        in the legacy shape (None or {'pid', 'v_page'}), or None when nothing
+        is published (or sharing is disabled).
+        """
+        if not self.path:
+            return None
+        # One remap at a time, and never while another thread copies from the old map
+        with self._read_lock:
+            return self._snapshot(offset, limit)
+
+    def _snapshot(self, offset, limit):
+        region = self._region()
+        if region is None:
+            return None
+        for attempt in range(READ_RETRIES):
+            seq, = SEQ.unpack_from(region, SEQ_OFFSET)
+            if seq & 1:
+                time.sleep(0)
+                continue
+            magic, layout, _, nframes, writer = PREFIX.unpack_from(region, 0)
+            if magic != MAGIC or layout != LAYOUT:
+                return None
+            used, event_len, hits, faults, evictions, policy = STATE.unpack_from(region, STATE_OFFSET)
+            prefetch = PREFETCH.unpack_from(region, PREFETCH_OFFSET)
+            event = region[EVENT_OFFSET:EVENT_OFFSET + event_len]
+            start = min(max(offset, 0), nframes)
+            end = nframes if limit is None else min(start + limit, nframes)
+            records = region[FRAMES_OFFSET + start * FRAME.size:FRAMES_OFFSET + end * FRAME.size]
+            if SEQ.unpack_from(region, SEQ_OFFSET)[0] == seq:
+                break
+        else:
+            return None
+        if not self._writer_alive(writer):
+            # The scheduler process is gone: its last frames would be served forever
+            return None
+        accesses = hits + faults
+        return {
+            'frames': [
+                None if pid < 0 else {'pid': pid, 'v_page': v_page}
+                for pid, v_page in FRAME.iter_unpack(records)
+            ],
+            'frames_total': nframes,
+            'free_frames': nframes - used,
+            'last_event': event.decode('utf-8') or None,
+            'policy': policy.rstrip(b'\0').decode('ascii'),
+            'hits': hits,
+            'faults': faults,
+            'evictions': evictions,
+            'fault_rate': (faults / accesses) if accesses else None,
+            'prefetch': prefetch,
+            'writer_pid': writer,
+        }
+
+
+def _default_shared_ram():
+    from django.conf import settings
+    return SharedRAM(getattr(settings, 'SHARED_RAM_PATH', None))
+
+
+# Published by the process running the scheduler, read by every web worker
+SHARED_RAM = _default_shared_ram()
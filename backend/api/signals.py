@@ -0,0 +1,22 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import caching, quota
+from .models import FileBody, FileSystemObject, UserProfile
+
+
+@receiver(post_delete, sender=FileSystemObject)
+def release_body(sender, instance, **kwargs):
+    # Deletes through the ORM (cascades from a user or a parent, admin...) drop
+    # their body reference here; delete_subtree() does it in bulk instead.
+    if instance.body_id:
+        FileBody.objects.filter(pk=instance.body_id).update(refcount=F('refcount') - 1)
+    caching.changed(instance.owner_id, [instance.path])
+
+
+@receiver(post_save, sender=UserProfile)
+def forget_cached_usage(sender, instance, **kwargs):
+    # A limit (or usage) changed in the admin or the shell must not wait for the cache TTL
+    transaction.on_commit(lambda: quota.forget([instance.user_id]))
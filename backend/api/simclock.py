@@ -0,0 +1,171 @@
+import heapq
+import threading
+import time
+from datetime import timedelta
+
+from django.utils import timezone
+
+
+DEFAULT_COSTS = {
+    # First dispatch of a process (the old time.sleep(15))
+    'dispatch': 15.0,
+    # Loading a page from disk on a fault (the old time.sleep(5))
+    'page_fault': 5.0,
+    # CPU time of one access to a resident page (the old time.sleep(0.5))
+    'page_hit': 0.5,
+    # Each further page read ahead with a fault (same disk access, transfer only)
+    'prefetch_page': 0.5,
+}
+
+MODES = ('realtime', 'fast')
+
+
+class SimClock:
+    """
+    Virtual clock shared by the CPU dispatchers.
+
+    Instead of sleeping, a dispatcher calls advance(cpu, cost): that posts a
+    wake-up event at the CPU's local time + cost on the event queue and
+    blocks until every earlier event (ties broken by CPU number) has been
+    released and no other CPU is mid-step. CPUs therefore interleave in
+    strict virtual-time order, so a workload produces the same timestamps
+    whatever the pacing:
+
+    - 'realtime' additionally waits for the wall clock to reach each event,
+      keeping the demo's visible pace (CPUs still wait in parallel);
+    - 'fast' releases events as soon as they reach the head of the queue.
+
+    Timestamps are the clock's epoch plus virtual seconds.
+    """
+
+    def __init__(self, mode='realtime', costs=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown simulation mode '{mode}'. Choose one of: {', '.join(MODES)}")
+        self._cond = threading.Condition()
+        self.mode = mode
+        self.costs = {**DEFAULT_COSTS, **(costs or {})}
+        self.epoch = timezone.now()
+        self._wall_epoch = time.monotonic()
+        # Virtual time of the last released event
+        self._now = 0.0
+        self._local = {}
+        self._events = []
+        self._seq = 0
+        # CPUs currently between two events (at most one may run at a time)
+        self._running = set()
+        # CPUs that must take a turn at the current time before any event is released
+        self._pending = set()
+
+    def set_mode(self, mode):
+        if mode not in MODES:
+            raise ValueError(f"Unknown simulation mode '{mode}'. Choose one of: {', '.join(MODES)}")
+        with self._cond:
+            # Re-anchor so virtual 'now' lines up with the wall clock from here on
+            self._wall_epoch = time.monotonic() - self._now
+            self.mode = mode
+            self._cond.notify_all()
+
+    def cost(self, name):
+        return self.costs[name]
+
+    def now(self):
+        """Current virtual time; in realtime mode idle time counts too."""
+        with self._cond:
+            return self._now_locked()
+
+    def _now_locked(self):
+        if self.mode == 'realtime' and not self._running and not self._pending:
+            # Let idle wall time pass, but never beyond a pending event
+            wall = time.monotonic() - self._wall_epoch
+            if self._events:
+                wall = min(wall, self._events[0][0])
+            return max(self._now, wall)
+        return self._now
+
+    def timestamp(self, vtime=None):
+        return self.epoch + timedelta(seconds=self.now() if vtime is None else vtime)
+
+    def local(self, cpu):
+        with self._cond:
+            return self._local.get(cpu, self._now)
+
+    def join(self, cpus):
+        """Register CPUs that are about to start; each takes a turn before time moves on."""
+        with self._cond:
+            self._now = self._now_locked()
+            self._pending.update(cpus)
+
+    def wake(self, cpu):
+        """
+        An idle CPU was handed work. Called synchronously by whoever queued it,
+        so no event is released until that CPU has rejoined at the current time.
+        """
+        with self._cond:
+            if cpu not in self._running:
+                # In realtime mode the idle wall time up to this push becomes virtual time
+                self._now = self._now_locked()
+                self._pending.add(cpu)
+
+    def resume(self, cpu):
+        """A CPU picked up work after idling: join the simulation at the current virtual time."""
+        with self._cond:
+            self._pending.add(cpu)
+            # Pending CPUs take their turn one at a time, lowest number first
+            while self._running or min(self._pending) != cpu:
+                self._cond.wait()
+            self._pending.discard(cpu)
+            self._local[cpu] = max(self._local.get(cpu, 0.0), self._now)
+            self._running.add(cpu)
+
+    def idle(self, cpu):
+        """A CPU has nothing to run: stop holding up the other CPUs."""
+        with self._cond:
+            self._running.discard(cpu)
+            self._cond.notify_all()
+
+    def advance(self, cpu, cost):
+        """Spend `cost` virtual seconds on `cpu`; returns the CPU's new local time."""
+        with self._cond:
+            due = self._local.get(cpu, self._now) + cost
+            self._seq += 1
+            event = (due, cpu, self._seq)
+            heapq.heappush(self._events, event)
+            self._running.discard(cpu)
+            self._cond.notify_all()
+
+        if self.mode == 'realtime':
+            delay = due - (time.monotonic() - self._wall_epoch)
+            if delay > 0:
+                time.sleep(delay)
+
+        with self._cond:
+            while self._events[0] is not event or self._running or self._pending:
+                self._cond.wait()
+            heapq.heappop(self._events)
+            self._now = max(self._now, due)
+            self._local[cpu] = due
+            self._running.add(cpu)
+            self._cond.notify_all()
+        return due
+
+    def status(self):
+        with self._cond:
+            return {
+                'mode': self.mode,
+                'now': self._now_locked(),
+                'epoch': self.epoch,
+                'costs': dict(self.costs),
+                'pending_events': len(self._events),
+            }
+
+
+def _default_clock():
+    from django.conf import settings
+    return SimClock(
+        mode=getattr(settings, 'SIMULATION_MODE', 'realtime'),
+        costs=getattr(settings, 'SIMULATION_COSTS', None),
+    )
+
+
+# Virtual time source for the scheduler and paging code
+CLOCK = _default_clock()
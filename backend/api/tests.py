@@ -1,3 +1,723 @@
-from django.test import TestCase
+import io
+import json
+import random
+import tarfile
+import zipfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from . import du, quota, workers
+from .content import collect_garbage
+from .models import Blob, FileBlock, FileBody, FileLock, FileSystemObject, Process, SchedulerWorker, UserProfile
+from .paging import MEMORY, OFFLINE_POLICIES, compare_policies, simulate
+from .prefetch import PREFETCH
+from .runqueue import RUN_QUEUE, RunQueue
+from .scheduling import Job, make_policy
+
+# The classic string that shows Belady's anomaly under FIFO
+BELADY = [1, 2, 3, 4, 1, 2, 5, 1, 2, 3, 4, 5]
+
+
+class PageReplacementTests(SimpleTestCase):
+    def test_known_fault_counts(self):
+        self.assertEqual(simulate(BELADY, 3, 'fifo')['faults'], 9)
+        self.assertEqual(simulate(BELADY, 3, 'lru')['faults'], 10)
+        self.assertEqual(simulate(BELADY, 3, 'opt')['faults'], 7)
+
+    def test_fifo_belady_anomaly(self):
+        # More frames, more faults
+        self.assertEqual(simulate(BELADY, 4, 'fifo')['faults'], 10)
+
+    def test_opt_never_worse(self):
+        rng = random.Random(7)
+        references = [BELADY] + [[rng.randrange(8) for _ in range(60)] for _ in range(20)]
+        for reference in references:
+            for nframes in range(1, 6):
+                results = {r['policy']: r['faults'] for r in compare_policies(reference, nframes)}
+                for policy, faults in results.items():
+                    self.assertLessEqual(results['opt'], faults, (policy, nframes, reference))
+
+    def test_compare_covers_every_policy(self):
+        results = compare_policies(BELADY, 3)
+        self.assertEqual(sorted(r['policy'] for r in results), sorted(OFFLINE_POLICIES))
+        for r in results:
+            self.assertEqual(r['hits'] + r['faults'], len(BELADY))
+
+    def test_sparse_page_numbers(self):
+        result = simulate([10 ** 9, 5, 10 ** 9, 10 ** 9], 1, 'lru')
+        self.assertEqual((result['faults'], result['hits'], result['evictions']), (3, 1, 2))
+
+
+class SchedulingPolicyTests(SimpleTestCase):
+    def drain(self, policy):
+        order = []
+        while len(policy):
+            order.append(policy.pop().pid)
+        return order
+
+    def test_fcfs_keeps_arrival_order(self):
+        policy = make_policy('fcfs')
+        for pid, burst in ((1, 9), (2, 1), (3, 5)):
+            policy.add(Job(pid, burst=burst))
+        self.assertEqual(self.drain(policy), [1, 2, 3])
+        self.assertIsNone(policy.quantum_for(Job(4)))
+
+    def test_sjf_orders_by_burst(self):
+        policy = make_policy('sjf')
+        for pid, burst in ((1, 9), (2, 1), (3, 5), (4, 1)):
+            policy.add(Job(pid, burst=burst))
+        self.assertEqual(self.drain(policy), [2, 4, 3, 1])
+
+    def test_srtf_preempts_for_shorter_remaining(self):
+        policy = make_policy('srtf')
+        running = Job(1, burst=10, remaining=6)
+        policy.add(Job(2, burst=8))
+        self.assertFalse(policy.should_preempt(running))
+        policy.add(Job(3, burst=3))
+        self.assertTrue(policy.should_preempt(running))
+
+    def test_priority_lower_number_first(self):
+        policy = make_policy('priority')
+        for pid, priority in ((1, 5), (2, 0), (3, 2)):
+            policy.add(Job(pid, priority=priority))
+        self.assertTrue(policy.should_preempt(Job(9, priority=1)))
+        self.assertEqual(self.drain(policy), [2, 3, 1])
+
+    def test_round_robin_default_quantum(self):
+        self.assertEqual(make_policy('rr').quantum_for(Job(1)), 4)
+        self.assertEqual(make_policy('rr', 2).quantum_for(Job(1)), 2)
+
+    def test_mlfq_demotes_on_expired_quantum(self):
+        policy = make_policy('mlfq', 2)
+        job = Job(1, burst=20)
+        self.assertEqual(policy.quantum_for(job), 2)
+        policy.preempted(job, used=2, quantum_expired=True)
+        self.assertEqual((job.level, policy.quantum_for(job)), (1, 4))
+        newcomer = Job(2, burst=1)
+        policy.add(newcomer)
+        self.assertTrue(policy.should_preempt(job))
+        self.assertIs(policy.pop(), newcomer)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            make_policy('lottery')
+
+
+class RunQueueTests(SimpleTestCase):
+    def test_set_policy_carries_jobs_over(self):
+        queue = RunQueue('fcfs')
+        for pid, burst in ((1, 9), (2, 1), (3, 5)):
+            queue.push_job(Job(pid, burst=burst))
+        queue.set_policy('sjf')
+        self.assertEqual([queue.pop().pid for _ in range(3)], [2, 3, 1])
+        self.assertIsNone(queue.pop())
+
+    def test_discard_and_duplicates(self):
+        queue = RunQueue('rr', 2)
+        queue.push_job(Job(1))
+        queue.push_job(Job(1))
+        queue.push_job(Job(2))
+        self.assertEqual(len(queue), 2)
+        self.assertTrue(queue.discard(1))
+        self.assertFalse(queue.discard(1))
+        self.assertEqual(queue.pop().pid, 2)
+        self.assertIsNone(queue.pop())
+
+    def test_requeue_goes_to_the_back(self):
+        queue = RunQueue('rr', 2)
+        first, second = Job(1, burst=5), Job(2, burst=5)
+        queue.push_job(first)
+        queue.push_job(second)
+        job = queue.pop()
+        queue.requeue(job, used=2, quantum_expired=True)
+        self.assertEqual([queue.pop().pid, queue.pop().pid], [2, 1])
+
+
+class QuotaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('quota', password='x')
+        UserProfile.objects.create(user=self.user, storage_limit=100)
+
+    def used(self):
+        return UserProfile.objects.get(user=self.user).storage_used
+
+    def test_charge_within_limit(self):
+        quota.charge(self.user.id, 60)
+        quota.charge(self.user.id, 40)
+        self.assertEqual(self.used(), 100)
+
+    def test_charge_over_limit_is_refused(self):
+        quota.charge(self.user.id, 60)
+        with self.assertRaises(quota.QuotaExceeded):
+            quota.charge(self.user.id, 41)
+        self.assertEqual(self.used(), 60)
+
+    def test_release_stops_at_zero(self):
+        quota.charge(self.user.id, 10)
+        quota.charge(self.user.id, -50)
+        self.assertEqual(self.used(), 0)
+
+    def test_missing_profile_is_created(self):
+        other = User.objects.create_user('fresh', password='x')
+        quota.charge(other.id, 5)
+        self.assertEqual(UserProfile.objects.get(user=other).storage_used, 5)
+
+    def test_cached_usage_follows_charges(self):
+        self.assertEqual(quota.usage(self.user.id)['storage_used'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            quota.charge(self.user.id, 30)
+        self.assertEqual(quota.usage(self.user.id), {'storage_used': 30, 'storage_limit': 100})
+
+    def test_reconcile_corrects_drift(self):
+        FileSystemObject.objects.create(name='a', owner=self.user, content='abcd')
+        folder = FileSystemObject.objects.create(name='d', owner=self.user, is_directory=True)
+        FileSystemObject.objects.create(name='b', owner=self.user, parent=folder, content='xyz')
+        UserProfile.objects.filter(user=self.user).update(storage_used=77)
+        self.assertEqual(quota.reconcile([self.user.id]), 1)
+        self.assertEqual(self.used(), 7)
+        self.assertEqual(quota.usage(self.user.id)['storage_used'], 7)
+        # Nothing drifted any more
+        self.assertEqual(quota.reconcile([self.user.id]), 0)
+
+
+class FileLockViewTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('locker', password='x')
+        self.client.force_authenticate(self.user)
+        self.file = FileSystemObject.objects.create(name='f', owner=self.user)
+        self.url = f'/api/objects/{self.file.pk}/lock/'
+
+    def lock(self, mode):
+        return self.client.post(self.url, {'mode': mode, 'timeout': 0}, format='json')
+
+    def release(self, token):
+        return self.client.delete(f'{self.url}?token={token}')
+
+    def test_shared_then_exclusive(self):
+        first, second = self.lock('shared'), self.lock('shared')
+        self.assertEqual((first.status_code, second.status_code), (201, 201))
+        self.assertEqual(self.lock('exclusive').status_code, 423)
+        self.assertEqual(self.release(first.data['token']).status_code, 204)
+        self.assertEqual(self.release(second.data['token']).status_code, 204)
+        self.assertEqual(self.release(second.data['token']).status_code, 404)
+
+        exclusive = self.lock('exclusive')
+        self.assertEqual(exclusive.status_code, 201)
+        self.assertEqual(self.lock('shared').status_code, 423)
+        content = f'/api/objects/{self.file.pk}/content/'
+        response = self.client.patch(content, {'content': 'locked', 'lock': exclusive.data['token']}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.release(exclusive.data['token']).status_code, 204)
+        self.assertFalse(FileLock.objects.exists())
+
+    def test_patch_takes_and_releases_its_own_lock(self):
+        content = f'/api/objects/{self.file.pk}/content/'
+        self.assertEqual(self.client.patch(content, {'content': 'abc'}, format='json').status_code, 200)
+        self.assertEqual(self.client.get(content).data['content'], 'abc')
+        self.assertFalse(FileLock.objects.exists())
+
+    def test_missing_file(self):
+        self.assertEqual(self.client.post('/api/objects/999999/lock/', {'mode': 'shared'}, format='json').status_code, 404)
+
+
+class SearchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('searcher', password='x')
+        self.client.force_authenticate(self.user)
+
+    def make_file(self, name, content, permissions='rwx------'):
+        obj = FileSystemObject.objects.create(name=name, owner=self.user, permissions=permissions)
+        response = self.client.patch(f'/api/objects/{obj.pk}/content/', {'content': content}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return obj
+
+    def search(self, **params):
+        response = self.client.get('/api/search/', params)
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_unreadable_files_are_never_returned(self):
+        readable = self.make_file('open', 'needle here\nhay\n')
+        hidden = self.make_file('closed', 'needle there\nneedle again\n')
+        FileSystemObject.objects.filter(pk=hidden.pk).update(permissions='-wx------')
+        for params, matches in (
+            ({'q': 'needle'}, 1), ({'q': 'needle', 'c': 1}, 1),
+            ({'q': 'zzz', 'v': 1}, 2), ({'q': 'needle', 'order': 'path'}, 1),
+        ):
+            *files, summary = self.search(**params)
+            self.assertEqual([f['id'] for f in files], [readable.pk], params)
+            self.assertEqual(summary['matches'], matches, params)
+
+    def test_counts_and_rank(self):
+        dense = self.make_file('dense', 'needle\nneedle\n')
+        sparse = self.make_file('sparse', 'needle\n' + 'hay\n' * 8)
+        *files, summary = self.search(q='needle', c=1)
+        self.assertEqual([(f['id'], f['count']) for f in files], [(dense.pk, 2), (sparse.pk, 1)])
+        self.assertNotIn('lines', files[0])
+        self.assertEqual((summary['files'], summary['matches']), (2, 3))
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('exporter', password='x')
+        self.client.force_authenticate(self.user)
+        self.folder = FileSystemObject.objects.create(name='d', owner=self.user, is_directory=True)
+        for name, content in (('open', 'visible'), ('closed', 'secret')):
+            obj = FileSystemObject.objects.create(name=name, owner=self.user, parent=self.folder)
+            self.client.patch(f'/api/objects/{obj.pk}/content/', {'content': content}, format='json')
+        FileSystemObject.objects.filter(name='closed').update(permissions='-wx------')
+
+    def export(self, fmt):
+        response = self.client.get(f'/api/objects/{self.folder.pk}/export/', {'format': fmt})
+        self.assertEqual(response.status_code, 200)
+        return io.BytesIO(b''.join(response.streaming_content))
+
+    def test_tar_leaves_out_unreadable_data(self):
+        with tarfile.open(fileobj=self.export('tar')) as archive:
+            self.assertEqual(archive.extractfile('d/open').read(), b'visible')
+            closed = archive.getmember('d/closed')
+            self.assertEqual((closed.size, closed.mode), (0, 0o300))
+            self.assertEqual(archive.extractfile(closed).read(), b'')
+
+    def test_zip_leaves_out_unreadable_data(self):
+        with zipfile.ZipFile(self.export('zip')) as archive:
+            self.assertEqual(archive.read('d/open'), b'visible')
+            self.assertEqual(archive.read('d/closed'), b'')
+
+
+class PagingViewTests(APITestCase):
+    def setUp(self):
+        admin = User.objects.create_superuser('pager', password='x')
+        self.client.force_authenticate(admin)
+        dispatchers = mock.patch.object(RUN_QUEUE, 'dispatchers', 1)
+        dispatchers.start()
+        self.addCleanup(dispatchers.stop)
+        self.addCleanup(PREFETCH.configure, PREFETCH.enabled, PREFETCH.min_pages, PREFETCH.max_pages, PREFETCH.window)
+        self.addCleanup(MEMORY.set_policy, MEMORY.policy.name)
+
+    def test_bad_policy_changes_nothing(self):
+        PREFETCH.configure(enabled=True)
+        policy = MEMORY.stats()['policy']
+        response = self.client.put('/api/paging/', {'prefetch': False, 'policy': 'bogus'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(PREFETCH.enabled)
+        self.assertEqual(MEMORY.stats()['policy'], policy)
+
+    def test_bad_read_ahead_changes_nothing(self):
+        policy = MEMORY.stats()['policy']
+        other = 'fifo' if policy != 'fifo' else 'lru'
+        response = self.client.put('/api/paging/', {'min_pages': 4, 'max_pages': 2, 'policy': other}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(MEMORY.stats()['policy'], policy)
+
+    def test_both_applied(self):
+        response = self.client.put('/api/paging/', {'prefetch': True, 'max_pages': 4, 'policy': 'clock'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['policy'], response.data['prefetch']['max_pages']), ('clock', 4))
+        self.assertTrue(PREFETCH.enabled)
+
+
+@override_settings(FILE_BLOCK_SIZE=4)
+class FileContentTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('writer', password='x')
+        self.client.force_authenticate(self.user)
+        self.file = FileSystemObject.objects.create(name='f', owner=self.user)
+        self.url = f'/api/objects/{self.file.pk}/content/'
+
+    def write(self, content, **extra):
+        response = self.client.patch(self.url, {'content': content, **extra}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.file.refresh_from_db()
+        return response
+
+    def blocks(self):
+        self.file.refresh_from_db()
+        return list(
+            FileBlock.objects.filter(body_id=self.file.body_id).order_by('index').values_list('pk', 'blob__data')
+        )
+
+    def test_write_splits_into_blocks(self):
+        self.assertEqual(self.write('abcdefghij').data['size'], 10)
+        self.assertEqual([data for _, data in self.blocks()], ['abcd', 'efgh', 'ij'])
+        self.assertEqual((self.file.block_count, self.file.size, self.file.content), (3, 10, None))
+        self.assertEqual(self.client.get(self.url).data['content'], 'abcdefghij')
+        part = self.client.get(self.url, {'offset': 3, 'length': 4}).data
+        self.assertEqual((part['content'], part['eof']), ('defg', False))
+
+    def test_append_only_touches_the_tail(self):
+        self.write('abcdefghij')
+        before = self.blocks()
+        self.assertEqual(self.write('klmnop', append=True).data['size'], 17)
+        after = self.blocks()
+        # The full blocks are the very same rows; the tail is filled, then new blocks follow
+        self.assertEqual(after[:2], before[:2])
+        self.assertEqual(after[2][0], before[2][0])
+        self.assertEqual([data for _, data in after], ['abcd', 'efgh', 'ij\nk', 'lmno', 'p'])
+        self.assertEqual(self.client.get(self.url).data['content'], 'abcdefghij\nklmnop')
+        self.assertEqual(self.file.size, 17)
+
+    def test_sizes_count_bytes(self):
+        self.write('\u00e9\u00e9\u00e9\u00e9\u00e9')
+        self.assertEqual((self.file.size, self.file.block_count), (10, 2))
+        self.write('\u20ac', append=True)
+        self.assertEqual(self.file.size, 14)
+        self.assertEqual(self.client.get(self.url, {'tail': 1}).data['content'], '\u20ac')
+
+
+@override_settings(FILE_BLOCK_SIZE=4)
+class CopyOnWriteTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('copier', password='x')
+        self.client.force_authenticate(self.user)
+        self.original = FileSystemObject.objects.create(name='f', owner=self.user)
+        self.write(self.original, 'aaaabbbb')
+
+    def write(self, obj, content, **extra):
+        response = self.client.patch(f'/api/objects/{obj.pk}/content/', {'content': content, **extra}, format='json')
+        self.assertEqual(response.status_code, 200)
+        obj.refresh_from_db()
+
+    def copy(self):
+        response = self.client.post(f'/api/objects/{self.original.pk}/copy/', {'name': 'g'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return FileSystemObject.objects.get(pk=response.data['id'])
+
+    def read(self, obj):
+        return self.client.get(f'/api/objects/{obj.pk}/content/').data['content']
+
+    def blob_refs(self):
+        return dict(Blob.objects.values_list('data', 'refcount'))
+
+    def test_copy_shares_the_body(self):
+        copy = self.copy()
+        self.assertEqual(copy.body_id, self.original.body_id)
+        self.assertEqual(FileBody.objects.get(pk=copy.body_id).refcount, 2)
+        self.assertEqual(self.blob_refs(), {'aaaa': 1, 'bbbb': 1})
+        self.assertEqual((self.read(copy), copy.size), ('aaaabbbb', 8))
+
+    def test_writing_a_copy_leaves_the_original(self):
+        copy = self.copy()
+        self.write(copy, 'xy', append=True)
+        self.assertNotEqual(copy.body_id, self.original.body_id)
+        self.assertEqual(FileBody.objects.get(pk=self.original.body_id).refcount, 1)
+        self.assertEqual(FileBody.objects.get(pk=copy.body_id).refcount, 1)
+        # The copy's block list was copied; the blobs themselves stay shared
+        self.assertEqual(self.blob_refs(), {'aaaa': 2, 'bbbb': 2, '\nxy': 1})
+        self.assertEqual((self.read(self.original), self.read(copy)), ('aaaabbbb', 'aaaabbbb\nxy'))
+
+        self.write(self.original, 'aaaacccc')
+        self.assertEqual(self.blob_refs(), {'aaaa': 2, 'bbbb': 1, 'cccc': 1, '\nxy': 1})
+        self.assertEqual(self.read(copy), 'aaaabbbb\nxy')
+
+    def test_garbage_is_collected_at_zero_references(self):
+        copy = self.copy()
+        self.write(copy, 'xy', append=True)
+        self.write(self.original, 'aaaacccc')
+        self.assertEqual(self.client.delete(f'/api/objects/{copy.pk}/').status_code, 204)
+        self.assertEqual(FileBody.objects.get(pk=copy.body_id).refcount, 0)
+        self.assertEqual(collect_garbage(), (1, 2))
+        self.assertFalse(FileBody.objects.filter(pk=copy.body_id).exists())
+        self.assertEqual(self.blob_refs(), {'aaaa': 1, 'cccc': 1})
+        self.assertEqual(self.read(self.original), 'aaaacccc')
+        # Nothing is left to collect while the original uses its blocks
+        self.assertEqual(collect_garbage(), (0, 0))
+
+    def test_deleting_one_of_two_sharers_keeps_the_body(self):
+        copy = self.copy()
+        self.assertEqual(self.client.delete(f'/api/objects/{self.original.pk}/').status_code, 204)
+        self.assertEqual(FileBody.objects.get(pk=copy.body_id).refcount, 1)
+        self.assertEqual(collect_garbage(), (0, 0))
+        self.assertEqual(self.read(copy), 'aaaabbbb')
+
+
+class BatchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('batcher', password='x')
+        UserProfile.objects.create(user=self.user, storage_limit=100)
+        self.client.force_authenticate(self.user)
+        self.file = FileSystemObject.objects.create(name='keep', owner=self.user, permissions='rw-------')
+
+    def batch(self, ops, **extra):
+        return self.client.post('/api/objects/batch/', {'ops': ops, **extra}, format='json')
+
+    def snapshot(self):
+        return (
+            sorted(FileSystemObject.objects.filter(owner=self.user).values_list('name', 'permissions', 'path')),
+            UserProfile.objects.get(user=self.user).storage_used,
+        )
+
+    def test_ops_apply_in_order(self):
+        response = self.batch([
+            {'op': 'create', 'name': 'src', 'is_directory': True, 'parent': None, 'ref': 'src'},
+            {'op': 'create', 'name': 'main.c', 'parent': '$src', 'content': 'int main;', 'ref': 'main'},
+            {'op': 'chmod', 'id': '$main', 'permissions': 'r--------'},
+            {'op': 'move', 'id': self.file.pk, 'parent': '$src', 'name': 'kept'},
+        ], parent=None)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['op'] for r in response.data['results']], ['create', 'create', 'chmod', 'move'])
+        self.assertEqual([entry['name'] for entry in response.data['listing']], ['src'])
+        folder = FileSystemObject.objects.get(name='src')
+        main = FileSystemObject.objects.get(name='main.c')
+        self.file.refresh_from_db()
+        self.assertEqual((main.parent_id, main.permissions, main.size), (folder.pk, 'r--------', 9))
+        self.assertEqual((self.file.name, self.file.path), ('kept', f'{folder.path}{self.file.pk}/'))
+        self.assertEqual(UserProfile.objects.get(user=self.user).storage_used, 9)
+
+    def test_invalid_op_rolls_everything_back(self):
+        before = self.snapshot()
+        response = self.batch([
+            {'op': 'create', 'name': 'new', 'content': 'data'},
+            {'op': 'chmod', 'id': self.file.pk, 'permissions': 'rwx------'},
+            {'op': 'chmod', 'id': self.file.pk, 'permissions': 'bogus'},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['op'], 2)
+        self.assertEqual(self.snapshot(), before)
+
+    def test_error_index_of_missing_and_deleted_objects(self):
+        response = self.batch([{'op': 'chmod', 'id': self.file.pk, 'permissions': 'r--'}, {'op': 'delete', 'id': 999999}])
+        self.assertEqual((response.status_code, response.data['op']), (400, 1))
+        response = self.batch([
+            {'op': 'delete', 'id': self.file.pk},
+            {'op': 'create', 'name': 'x'},
+            {'op': 'chmod', 'id': self.file.pk, 'permissions': 'r--'},
+        ])
+        self.assertEqual((response.status_code, response.data['op']), (400, 2))
+        self.assertTrue(FileSystemObject.objects.filter(pk=self.file.pk).exists())
+
+    def test_directory_cannot_move_into_itself(self):
+        response = self.batch([
+            {'op': 'create', 'name': 'a', 'is_directory': True, 'ref': 'a'},
+            {'op': 'create', 'name': 'b', 'is_directory': True, 'parent': '$a', 'ref': 'b'},
+            {'op': 'move', 'id': '$a', 'parent': '$b'},
+        ])
+        self.assertEqual((response.status_code, response.data['op']), (400, 2))
+        self.assertFalse(FileSystemObject.objects.filter(name__in=['a', 'b']).exists())
+
+    def test_quota_exceeded_rolls_back(self):
+        before = self.snapshot()
+        response = self.batch([
+            {'op': 'create', 'name': 'small', 'content': 'x' * 60},
+            {'op': 'create', 'name': 'large', 'content': 'x' * 60},
+        ])
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.snapshot(), before)
+
+
+class DiskUsageTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('du', password='x')
+        self.client.force_authenticate(self.user)
+        self.a = self.make('a', None, directory=True)
+        self.b = self.make('b', self.a, directory=True)
+        self.c = self.make('c', None, directory=True)
+        self.f1 = self.make('f1', self.b, content='0123456789')
+        self.f2 = self.make('f2', self.a, content='01234')
+
+    def make(self, name, parent, directory=False, content=None):
+        obj = FileSystemObject.objects.create(name=name, owner=self.user, parent=parent, is_directory=directory)
+        if content is not None:
+            response = self.client.patch(f'/api/objects/{obj.pk}/content/', {'content': content}, format='json')
+            self.assertEqual(response.status_code, 200)
+        return obj
+
+    def du(self, obj=None, **params):
+        url = f'/api/objects/{obj.pk}/du/' if obj is not None else '/api/du/'
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def totals(self, obj=None):
+        data = self.du(obj)
+        return data['size'], data['files']
+
+    def assertConsistent(self):
+        # The maintained rollups equal what the file sizes add up to
+        self.assertEqual(du.reconcile([self.user.id]), 0)
+
+    def test_rollups_after_writes(self):
+        self.assertEqual(self.totals(), (15, 2))
+        self.assertEqual((self.totals(self.a), self.totals(self.b), self.totals(self.c)), ((15, 2), (10, 1), (0, 0)))
+        self.client.patch(f'/api/objects/{self.f1.pk}/content/', {'content': 'xy', 'append': True}, format='json')
+        self.assertEqual((self.totals(self.a), self.totals(self.b)), ((18, 2), (13, 1)))
+        self.assertConsistent()
+
+    def test_rollups_after_moves(self):
+        response = self.client.post(f'/api/objects/{self.b.pk}/move/', {'parent': self.c.pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((self.totals(self.a), self.totals(self.c)), ((5, 1), (10, 1)))
+        response = self.client.post('/api/objects/batch/', {'ops': [
+            {'op': 'move', 'id': self.f2.pk, 'parent': self.b.pk},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((self.totals(self.a), self.totals(self.b), self.totals(self.c)), ((0, 0), (15, 2), (15, 2)))
+        self.assertEqual(self.totals(), (15, 2))
+        self.assertConsistent()
+
+    def test_rollups_after_deletes(self):
+        self.assertEqual(self.client.delete(f'/api/objects/{self.f2.pk}/').status_code, 204)
+        self.assertEqual((self.totals(self.a), self.totals()), ((10, 1), (10, 1)))
+        self.assertEqual(self.client.delete(f'/api/objects/{self.b.pk}/').status_code, 204)
+        self.assertEqual((self.totals(self.a), self.totals()), ((0, 0), (0, 0)))
+        self.assertConsistent()
+
+    def test_entries_by_size(self):
+        data = self.du(order='size', depth=2, all=1)
+        # Two levels from the top: f1, three levels down, is left out
+        self.assertEqual(
+            [(entry['name'], entry['size']) for entry in data['entries']],
+            [('a', 15), ('b', 10), ('f2', 5), ('c', 0)],
+        )
+        self.assertFalse(data['truncated'])
+
+
+class CachingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cached', password='x')
+        self.client.force_authenticate(self.user)
+        self.folder = FileSystemObject.objects.create(name='d', owner=self.user, is_directory=True)
+        self.file = FileSystemObject.objects.create(name='f', owner=self.user, parent=self.folder)
+        self.url = f'/api/objects/{self.file.pk}/content/'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(self.url, {'content': 'one'}, format='json')
+
+    def get(self, url, tag=None, **params):
+        extra = {'HTTP_IF_NONE_MATCH': tag} if tag else {}
+        return self.client.get(url, params, **extra)
+
+    def test_matching_etag_gets_304(self):
+        first = self.get(self.url)
+        self.assertEqual((first.status_code, first.data['content']), (200, 'one'))
+        tag = first['ETag']
+        again = self.get(self.url, tag)
+        self.assertEqual((again.status_code, again['ETag']), (304, tag))
+        # Another representation of the same file has its own tag
+        ranged = self.get(self.url, tag, offset=1)
+        self.assertEqual((ranged.status_code, ranged.data['content']), (200, 'ne'))
+        self.assertNotEqual(ranged['ETag'], tag)
+
+    def test_write_invalidates_the_read(self):
+        tag = self.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(self.url, {'content': 'two'}, format='json')
+        response = self.get(self.url, tag)
+        self.assertEqual((response.status_code, response.data['content']), (200, 'two'))
+        self.assertNotEqual(response['ETag'], tag)
+
+    def test_chmod_is_not_answered_from_the_cache(self):
+        tag = self.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/objects/{self.file.pk}/', {'permissions': '-w-------'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get(self.url, tag).status_code, 403)
+        self.assertEqual(self.get(self.url).status_code, 403)
+
+    def test_listing_follows_creates_and_writes(self):
+        listing = f'/api/objects/?parent={self.folder.pk}'
+        first = self.client.get(listing)
+        tag = first['ETag']
+        self.assertEqual([entry['name'] for entry in first.data], ['f'])
+        self.assertEqual(self.client.get(listing, HTTP_IF_NONE_MATCH=tag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            created = self.client.post('/api/objects/', {'name': 'g', 'parent': self.folder.pk}, format='json')
+        self.assertEqual(created.status_code, 201)
+        response = self.client.get(listing, HTTP_IF_NONE_MATCH=tag)
+        self.assertEqual([entry['name'] for entry in response.data], ['f', 'g'])
+        # Writing a file changes the sizes its directory's listing shows
+        tag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(self.url, {'content': 'longer'}, format='json')
+        self.assertEqual(self.client.get(listing, HTTP_IF_NONE_MATCH=tag).status_code, 200)
+
+    def test_nothing_changes_before_commit(self):
+        tag = self.get(self.url)['ETag']
+        # The new versions are only drawn once the write commits
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.client.patch(self.url, {'content': 'two'}, format='json')
+        self.assertTrue(callbacks)
+        self.assertEqual(self.get(self.url, tag).status_code, 304)
+
+
+class WorkerTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('worker', password='x')
+        program = FileSystemObject.objects.create(name='prog', owner=user)
+        self.pids = [
+            Process.objects.create(owner=user, file_object=program, burst=5).pk
+            for _ in range(4)
+        ]
+        push = mock.patch.object(RUN_QUEUE, 'push')
+        self.push = push.start()
+        self.addCleanup(push.stop)
+
+    def held(self, name):
+        return sorted(Process.objects.filter(worker=name).values_list('id', flat=True))
+
+    def test_claim_takes_the_oldest_once(self):
+        self.assertEqual(workers.claim('one', limit=3), 3)
+        self.assertEqual(workers.claim('two', limit=3), 1)
+        self.assertEqual(workers.claim('two', limit=3), 0)
+        self.assertEqual((self.held('one'), self.held('two')), (self.pids[:3], self.pids[3:]))
+        self.assertEqual([c.args[0] for c in self.push.call_args_list], self.pids)
+
+    def test_claim_skips_rows_taken_meanwhile(self):
+        if connection.features.has_select_for_update_skip_locked:
+            self.skipTest('SKIP LOCKED claims never race on the conditional UPDATE')
+        raced = []
+
+        def other_worker(execute, sql, params, many, context):
+            # Another worker claims the oldest row between our SELECT and our UPDATE
+            if not raced and sql.startswith('UPDATE') and 'worker' in sql:
+                raced.append(True)
+                Process.objects.filter(pk=self.pids[0]).update(worker='other')
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(other_worker):
+            self.assertEqual(workers.claim('mine', limit=2), 2)
+        self.assertEqual((self.held('other'), self.held('mine')), (self.pids[:1], self.pids[1:3]))
+
+    def test_stale_heartbeat_is_taken_over(self):
+        workers.register('dead')
+        workers.register('alive')
+        workers.claim('dead', limit=2)
+        workers.claim('alive', limit=1)
+        Process.objects.filter(pk=self.pids[0]).update(status='Running', cpu=0, page_frames=b'\x00\x00\x00\x00')
+        SchedulerWorker.objects.filter(name='dead').update(heartbeat_at=timezone.now() - timedelta(seconds=60))
+
+        self.assertEqual(workers.recover_dead(timeout=30), 2)
+        self.assertEqual(self.held('dead'), [])
+        self.assertEqual(self.held('alive'), self.pids[2:3])
+        released = Process.objects.get(pk=self.pids[0])
+        self.assertEqual((released.status, released.cpu, bytes(released.page_frames)), ('Ready', None, b''))
+        # The dead worker finds out on its next heartbeat and must stop
+        self.assertFalse(workers.heartbeat('dead'))
+        self.assertTrue(workers.heartbeat('alive'))
+        self.assertEqual(workers.recover_dead(timeout=30), 0)
+        self.assertEqual(workers.claim('alive', limit=4), 3)
+
+    def test_processes_of_unknown_workers_are_released(self):
+        workers.claim('vanished', limit=2)
+        self.assertEqual(workers.recover_dead(timeout=30), 2)
+        self.assertEqual(self.held('vanished'), [])
+
+    def test_unregister_hands_processes_back(self):
+        workers.register('leaving')
+        workers.claim('leaving', limit=4)
+        self.assertEqual(workers.unregister('leaving'), 4)
+        self.assertFalse(SchedulerWorker.objects.filter(name='leaving').exists())
+        self.assertEqual(Process.objects.filter(status='Ready', worker__isnull=True).count(), 4)
@@ -4,9 +4,23 @@ from .views import (
     CreateUserView,
     FileSystemObjectList,
     FileSystemObjectDetail,
+    ResolvePathView,
+    TreeView,
+    MoveView,
+    CopyView,
+    BatchView,
+    ExportView,
+    ImportView,
+    SearchView,
+    DiskUsageView,
     FileContentView,
+    FileLockView,
     ProcessViewSet,
     MemorySnapshotView,
+    EventStreamView,
+    SchedulerView,
+    PagingView,
+    PagingCompareView,
     QuotaView
 )
 
@@ -22,9 +36,34 @@ urlpatterns = [
     # Retrieve, Update, Delete a specific file/folder
     path('objects/<int:pk>/', FileSystemObjectDetail.as_view()),
 
+    # Tree index: absolute path lookup, recursive listing, subtree move
+    path('objects/resolve/', ResolvePathView.as_view()),
+    path('objects/tree/', TreeView.as_view()),
+    path('objects/<int:pk>/tree/', TreeView.as_view()),
+    path('objects/<int:pk>/move/', MoveView.as_view()),
+    # Copy-on-write file copy (shares the data until either file is written)
+    path('objects/<int:pk>/copy/', CopyView.as_view()),
+    # Many create/move/chmod/delete operations in one request and transaction
+    path('objects/batch/', BatchView.as_view()),
+    # Subtrees as tar/zip archives (streamed out, bulk-inserted in)
+    path('objects/export/', ExportView.as_view()),
+    path('objects/<int:pk>/export/', ExportView.as_view()),
+    path('objects/import/', ImportView.as_view()),
+    # Server-side grep over the user's files (trigram index, streamed matches)
+    path('search/', SearchView.as_view()),
+    # du: subtree sizes and file counts from the maintained rollups
+    path('du/', DiskUsageView.as_view()),
+    path('objects/<int:pk>/du/', DiskUsageView.as_view()),
+
     # Read and Write content for a specific file
     path('objects/<int:pk>/content/', FileContentView.as_view()),
+    # Shared/exclusive file locks visible to every worker
+    path('objects/<int:pk>/lock/', FileLockView.as_view()),
     path('memory-snapshot/', MemorySnapshotView.as_view()),
+    path('events/', EventStreamView.as_view()),
+    path('scheduler/', SchedulerView.as_view()),
+    path('paging/', PagingView.as_view()),
+    path('paging/compare/', PagingCompareView.as_view()),
     path('quota/', QuotaView.as_view()),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,20 +1,54 @@
+import asyncio
+import json
+import time
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from django.contrib.auth.models import User
-from .models import FileSystemObject
-from .serializers import UserSerializer, FileSystemObjectSerializer
-import time
+from .models import FileBlock, FileSystemObject
+from .serializers import UserSerializer, FileSystemObjectSerializer, FileSystemListSerializer, FileSystemTreeSerializer
+from .pagination import NameCursorPagination, ProcessCursorPagination
 from rest_framework.views import APIView
 from rest_framework import viewsets
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.decorators import action
-from .models import Process # Add Process to imports
+from .models import Process, ProcessArchive # Add Process to imports
 from .serializers import ProcessSerializer # Add ProcessSerializer to imports
-from .apps import PHYSICAL_RAM_FRAMES, LAST_EVENT
+from . import apps as ram
+from .paging import MEMORY, OFFLINE_POLICIES, REPLACEMENT_POLICIES, compare_policies, make_replacement_policy
+from .prefetch import PREFETCH, report as prefetch_report
+from .runqueue import RUN_QUEUE
+from .scheduler import forget_processes
+from .sharedram import SHARED_RAM
+from .simclock import CLOCK, MODES
+from .scheduling import POLICIES
+from .authentication import QueryParamJWTAuthentication
+from .events import EVENTS, format_sse
+from .locks import EXCLUSIVE, LOCKS, MODES as LOCK_MODES, LockTimeout
+from . import caching, quota
+from .batch import Batch, BatchError
+from .archive import FORMATS, ArchiveError, export_archive, import_archive
+from .search import ORDERS as SEARCH_ORDERS, search
+from .du import ORDERS as DU_ORDERS, usage as disk_usage
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Avg, Count, Prefetch, Q, Sum
+from .content import append_text, copy_file, line_total, read_bytes, read_lines, read_text, write_text
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from rest_framework_simplejwt.authentication import JWTAuthentication
 
-# ... (Keep CreateUserView, FileSystemObjectList, FileSystemObjectDetail the same) ...
-# This part is just for context, no changes needed here.
-LOCK_MANAGER = {}
+# Default number of frames returned by one memory snapshot
+SNAPSHOT_FRAMES_LIMIT = 1024
+
+def _cacheable(response, tag):
+    # Clients may keep the response but must revalidate it (If-None-Match) before each use
+    response['ETag'] = tag
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ['Authorization'])
+    return response
 
 class CreateUserView(generics.CreateAPIView):
     queryset = User.objects.all()
@@ -22,19 +56,82 @@ class CreateUserView(generics.CreateAPIView):
     permission_classes = [permissions.AllowAny]
 
 class FileSystemObjectList(generics.ListCreateAPIView):
+    """
+    GET ?parent=<id|null>: directory listing. With ?lite=1 file content is
+    never loaded (entries carry their size in bytes), results come in cursor
+    pages (?cursor=, ?page_size=) and ?fields=id,name,size selects columns.
+    """
     serializer_class = FileSystemObjectSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NameCursorPagination
+
+    def is_lite(self):
+        return self.request.method == 'GET' and self.request.query_params.get('lite') in ('1', 'true')
 
     def get_queryset(self):
         user = self.request.user
         parent_id = self.request.query_params.get('parent')
         if parent_id == 'null' or parent_id is None:
-            return FileSystemObject.objects.filter(owner=user, parent__isnull=True).order_by('name')
+            qs = FileSystemObject.objects.filter(owner=user, parent__isnull=True).order_by('name')
         else:
-            return FileSystemObject.objects.filter(owner=user, parent_id=parent_id).order_by('name')
+            qs = FileSystemObject.objects.filter(owner=user, parent_id=parent_id).order_by('name')
+        if self.is_lite():
+            qs = qs.defer('content')
+        else:
+            qs = qs.prefetch_related(Prefetch('body__blocks', queryset=FileBlock.objects.select_related('blob')))
+        return qs
+
+    def get_serializer_class(self):
+        return FileSystemListSerializer if self.is_lite() else FileSystemObjectSerializer
+
+    def get_serializer(self, *args, **kwargs):
+        if self.is_lite():
+            fields = self.request.query_params.get('fields')
+            if fields:
+                kwargs['fields'] = [name.strip() for name in fields.split(',') if name.strip()]
+        return super().get_serializer(*args, **kwargs)
+
+    def paginate_queryset(self, queryset):
+        # Plain listings stay a bare list for existing clients
+        if not self.is_lite():
+            return None
+        return super().paginate_queryset(queryset)
+
+    def list(self, request, *args, **kwargs):
+        """
+        Listings are cached per (user, parent) under a version that every
+        write to the directory's entries replaces (api.caching): a repeated
+        listing skips the database and the serializers, and a client sending
+        the ETag it holds gets a 304.
+        """
+        parent_id = request.query_params.get('parent')
+        try:
+            parent_id = None if parent_id in (None, 'null') else int(parent_id)
+        except ValueError:
+            return super().list(request, *args, **kwargs)
+        # Pagination links are absolute, so the host is part of the representation
+        variant = f'{request.get_host()}?{request.query_params.urlencode()}'
+        tag = caching.etag('ls', request.user.id, parent_id, variant)
+        if caching.not_modified(request, tag):
+            return _cacheable(Response(status=status.HTTP_304_NOT_MODIFIED), tag)
+        data = caching.get('ls', request.user.id, parent_id, tag)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            caching.put('ls', request.user.id, parent_id, tag, data)
+        return _cacheable(Response(data), tag)
+
+    def create(self, request, *args, **kwargs):
+        try:
+            return super().create(request, *args, **kwargs)
+        except quota.QuotaExceeded:
+            return Response({"error": "Disk quota exceeded"}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
+        with transaction.atomic():
+            obj = serializer.save(owner=self.request.user)
+            quota.charge(self.request.user.id, obj.size)
 
 class FileSystemObjectDetail(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = FileSystemObjectSerializer
@@ -43,78 +140,632 @@ class FileSystemObjectDetail(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         return FileSystemObject.objects.filter(owner=self.request.user)
 
-# --- THIS IS THE PART TO FOCUS ON ---
+    def update(self, request, *args, **kwargs):
+        try:
+            return super().update(request, *args, **kwargs)
+        except quota.QuotaExceeded:
+            return Response({"error": "Disk quota exceeded"}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            old_size = serializer.instance.size
+            obj = serializer.save()
+            quota.charge(self.request.user.id, obj.size - old_size)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            freed = instance.subtree().filter(is_directory=False).aggregate(total=Sum('size'))['total'] or 0
+            # Whole subtree in one DELETE per table instead of a per-level cascade
+            instance.delete_subtree()
+            quota.charge(self.request.user.id, -freed)
+
+
+class ResolvePathView(APIView):
+    """GET ?path=/a/b/c: the object at an absolute path, resolved in one query."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        path = request.query_params.get('path', '')
+        if not path.startswith('/'):
+            return Response({"error": "path must be absolute"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            obj = FileSystemObject.resolve(request.user, path)
+        except FileSystemObject.DoesNotExist:
+            return Response({"error": f"No such file or directory: {path}"}, status=status.HTTP_404_NOT_FOUND)
+        if obj is None:
+            # "/" is the implicit root, it has no row
+            return Response({"id": None, "name": "/", "is_directory": True, "parent": None, "path": "/", "depth": -1})
+        return Response(FileSystemTreeSerializer(obj).data)
+
+
+class TreeView(APIView):
+    """
+    GET: recursive listing (pre-order, without file content) of a directory, or
+    of the whole tree without a pk. ?depth=N limits how far below it to go.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk=None):
+        try:
+            max_depth = request.query_params.get('depth')
+            max_depth = int(max_depth) if max_depth is not None else None
+        except ValueError:
+            return Response({"error": "depth must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        qs = FileSystemObject.objects.filter(owner=request.user)
+        base_depth = -1
+        if pk is not None:
+            try:
+                root = qs.only('id', 'path', 'depth', 'owner_id').get(pk=pk, is_directory=True)
+            except FileSystemObject.DoesNotExist:
+                return Response({"error": "Directory not found."}, status=status.HTTP_404_NOT_FOUND)
+            qs = qs.filter(path__startswith=root.path).exclude(pk=root.pk)
+            base_depth = root.depth
+        if max_depth is not None:
+            qs = qs.filter(depth__lte=base_depth + max_depth)
+        entries = qs.defer('content').order_by('path')
+        return Response(FileSystemTreeSerializer(entries, many=True).data)
+
+
+class MoveView(APIView):
+    """POST { "parent": <dir id or null>, "name": "<optional new name>" }: move a file or subtree."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, pk):
+        try:
+            obj = FileSystemObject.objects.defer('content').get(pk=pk, owner=request.user)
+        except FileSystemObject.DoesNotExist:
+            return Response({"error": "File or directory not found."}, status=status.HTTP_404_NOT_FOUND)
+        if 'parent' not in request.data:
+            return Response({"error": "parent is required"}, status=status.HTTP_400_BAD_REQUEST)
+        parent = None
+        parent_id = request.data.get('parent')
+        if parent_id is not None:
+            try:
+                parent = FileSystemObject.objects.only('id', 'path').get(pk=parent_id, owner=request.user, is_directory=True)
+            except (FileSystemObject.DoesNotExist, ValueError, TypeError):
+                return Response({"error": "Target directory not found."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            obj.move_to(parent, name=request.data.get('name'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(FileSystemTreeSerializer(obj).data)
+
+
+class CopyView(APIView):
+    """
+    POST { "parent": <dir id or null>, "name": "<optional new name>" }: copy a
+    file. The copy shares the source's data until either is written, so it
+    takes the same few queries whatever the file size.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, pk):
+        try:
+            src = FileSystemObject.objects.defer('content').get(pk=pk, owner=request.user)
+        except FileSystemObject.DoesNotExist:
+            return Response({"error": "File or directory not found."}, status=status.HTTP_404_NOT_FOUND)
+        if src.is_directory:
+            return Response({"error": "Only files can be copied"}, status=status.HTTP_400_BAD_REQUEST)
+        perms = (src.permissions or '')
+        if len(perms) >= 1 and perms[0] != 'r':
+            return Response({"error": "Permission denied: read not allowed"}, status=status.HTTP_403_FORBIDDEN)
+        parent_id = request.data.get('parent', src.parent_id)
+        parent = None
+        if parent_id is not None:
+            try:
+                parent = FileSystemObject.objects.only('id', 'path').get(pk=parent_id, owner=request.user, is_directory=True)
+            except (FileSystemObject.DoesNotExist, ValueError, TypeError):
+                return Response({"error": "Target directory not found."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Quota is logical: the copy is charged its full size even though the
+        # data is shared on disk until one side is written
+        try:
+            with transaction.atomic():
+                quota.charge(request.user.id, src.size)
+                copy = copy_file(
+                    src,
+                    name=request.data.get('name') or src.name,
+                    owner=request.user,
+                    parent=parent,
+                    permissions=src.permissions,
+                )
+        except quota.QuotaExceeded:
+            return Response({"error": "Disk quota exceeded"}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        return Response(FileSystemTreeSerializer(copy).data, status=status.HTTP_201_CREATED)
+
+class BatchView(APIView):
+    """
+    POST { "ops": [...], "parent": <dir id or null> }: run an ordered list of
+    create / move / chmod / delete operations in one transaction (see
+    api.batch.Batch for their shape). Either every op applies or none does.
+    Returns one result per op and, when "parent" is given, that directory's
+    new listing, so a client needs no extra round-trip to refresh it.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        ops = request.data.get('ops')
+        max_ops = getattr(settings, 'BATCH_MAX_OPS', 1000)
+        if isinstance(ops, list) and len(ops) > max_ops:
+            return Response({"error": f"At most {max_ops} ops per batch"}, status=status.HTTP_400_BAD_REQUEST)
+        listing = 'parent' in request.data
+        parent_id = request.data.get('parent')
+        if parent_id is not None:
+            try:
+                parent_id = int(parent_id)
+            except (TypeError, ValueError):
+                return Response({"error": "parent must be a directory id or null"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            results = Batch(request.user).run(ops)
+        except BatchError as e:
+            return Response({"error": str(e), "op": e.index}, status=status.HTTP_400_BAD_REQUEST)
+        except quota.QuotaExceeded:
+            return Response({"error": "Disk quota exceeded"}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        data = {"results": results}
+        if listing:
+            entries = (
+                FileSystemObject.objects
+                .filter(owner=request.user, parent_id=parent_id)
+                .defer('content')
+                .order_by('name', 'id')
+            )
+            data["listing"] = FileSystemListSerializer(entries, many=True).data
+        return Response(data)
+
+def _streamed(request, chunks):
+    """A StreamingHttpResponse body producing the chunks of a (database-reading) generator."""
+    if not isinstance(request._request, ASGIRequest):
+        return chunks
+
+    # An async server would buffer a sync iterator whole; pull each chunk
+    # (and its queries) on the sync thread instead
+    async def body():
+        step = sync_to_async(next, thread_sensitive=True)
+        while (chunk := await step(chunks, None)) is not None:
+            yield chunk
+    return body()
+
+
+class ExportView(APIView):
+    """
+    GET ?format=tar|zip: a directory's subtree (the whole tree without a pk) as
+    an archive, streamed while it is read from the database.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def perform_content_negotiation(self, request, force=False):
+        # ?format= names the archive type, not a DRF renderer
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, pk=None):
+        fmt = request.query_params.get('format', 'tar')
+        if fmt not in FORMATS:
+            return Response({"error": f"format must be one of: {', '.join(FORMATS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        root = None
+        if pk is not None:
+            try:
+                root = FileSystemObject.objects.only('id', 'name', 'parent_id', 'path').get(pk=pk, owner=request.user, is_directory=True)
+            except FileSystemObject.DoesNotExist:
+                return Response({"error": "Directory not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        chunks = export_archive(request.user, root, fmt)
+        response = StreamingHttpResponse(_streamed(request, chunks), content_type=FORMATS[fmt])
+        filename = f"{root.name if root is not None else request.user.username}.{fmt}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class ImportView(APIView):
+    """
+    POST multipart { archive: <tar, tar.gz or zip file>, parent: <dir id> }:
+    unpack an archive into a directory (the top level without parent).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        upload = request.FILES.get('archive')
+        if upload is None:
+            return Response({"error": "archive file is required"}, status=status.HTTP_400_BAD_REQUEST)
+        parent_id = request.data.get('parent')
+        if parent_id in (None, '', 'null'):
+            parent_id = None
+        else:
+            try:
+                parent_id = FileSystemObject.objects.only('id').get(pk=parent_id, owner=request.user, is_directory=True).pk
+            except (FileSystemObject.DoesNotExist, ValueError, TypeError):
+                return Response({"error": "Target directory not found."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            stats = import_archive(request.user, upload, parent_id)
+        except (ArchiveError, BatchError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except quota.QuotaExceeded:
+            return Response({"error": "Disk quota exceeded"}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        return Response(stats, status=status.HTTP_201_CREATED)
+
+def non_negative(value):
+    value = int(value)
+    if value < 0:
+        raise ValueError(value)
+    return value
+
+
+class DiskUsageView(APIView):
+    """
+    GET ?depth=<n>&all=1&order=path|size&limit=<n>: du of a directory (the
+    top level without a pk), read from the maintained rollups: its totals and
+    the directories (files too with all=1) down to `depth` levels below it.
+    order=size lists the biggest first.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk=None):
+        params = request.query_params
+        order = params.get('order', 'path')
+        if order not in DU_ORDERS:
+            return Response({"error": f"order must be one of: {', '.join(DU_ORDERS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            depth = max(int(params.get('depth', 1)), 0)
+            max_entries = getattr(settings, 'DU_MAX_ENTRIES', 1000)
+            limit = min(max(int(params.get('limit', max_entries)), 1), max_entries)
+        except ValueError:
+            return Response({"error": "depth and limit must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        root = None
+        if pk is not None:
+            try:
+                root = FileSystemObject.objects.only('id', 'path', 'depth').get(pk=pk, owner=request.user, is_directory=True)
+            except FileSystemObject.DoesNotExist:
+                return Response({"error": "Directory not found."}, status=status.HTTP_404_NOT_FOUND)
+        totals, entries = disk_usage(
+            request.user, root, depth=depth, files=params.get('all') in ('1', 'true'), order=order, limit=limit + 1,
+        )
+        return Response({**totals, 'entries': entries[:limit], 'truncated': len(entries) > limit})
+
+
+class SearchView(APIView):
+    """
+    GET ?q=<text>[&root=<id>][&i=1][&v=1][&c=1][&m=<n>][&limit=<n>][&order=rank|path]:
+    grep through the user's files (recursively under directory or file
+    `root`) on the server, using the trigram index. Streams one JSON object
+    per line: a file with its matching lines, then a final summary.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        params = request.query_params
+        pattern = params.get('q', '')
+        if not pattern or '\n' in pattern:
+            return Response({"error": "q must be a non-empty single-line pattern"}, status=status.HTTP_400_BAD_REQUEST)
+        order = params.get('order', 'rank')
+        if order not in SEARCH_ORDERS:
+            return Response({"error": f"order must be one of: {', '.join(SEARCH_ORDERS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            max_count = int(params['m']) if params.get('m') else None
+            max_files = getattr(settings, 'SEARCH_MAX_FILES', 1000)
+            limit = min(int(params.get('limit', max_files)), max_files)
+        except ValueError:
+            return Response({"error": "m and limit must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        root = None
+        if params.get('root') not in (None, '', 'null'):
+            try:
+                root = FileSystemObject.objects.only('id', 'path').get(pk=params['root'], owner=request.user)
+            except (FileSystemObject.DoesNotExist, ValueError):
+                return Response({"error": "root not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        def flag(name):
+            return params.get(name, '').lower() in ('1', 'true', 'yes')
+
+        results = search(
+            request.user, pattern, root,
+            ignore_case=flag('i'), invert=flag('v'), count=flag('c'),
+            max_count=max_count, limit=max(limit, 1), order=order,
+        )
+        lines = (json.dumps(result) + '\n' for result in results)
+        return StreamingHttpResponse(_streamed(request, lines), content_type='application/x-ndjson')
+
+
 class FileContentView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, pk):
-        # ... (this method stays the same)
+        """
+        Whole content, or a range of it: ?offset=&length= (bytes), ?line=&count=
+        (1-based lines), ?head=N or ?tail=N. Sends an ETag and answers a
+        matching If-None-Match with 304 without reading the content.
+        """
+        # Existence and permissions first: a 304 (or cached copy) must not
+        # stand in for a 404 or 403
         try:
-            file_object = FileSystemObject.objects.get(pk=pk, owner=request.user, is_directory=False)
-            perms = (file_object.permissions or '')
-            # Owner read check (simplified): expect 'r' at index 0 for owner read
-            if len(perms) >= 1 and perms[0] != 'r':
-                return Response({"error": "Permission denied: read not allowed"}, status=status.HTTP_403_FORBIDDEN)
-            return Response({"content": file_object.content or ""})
+            file_object = (
+                FileSystemObject.objects
+                .defer('content')
+                .get(pk=pk, owner=request.user, is_directory=False)
+            )
         except FileSystemObject.DoesNotExist:
             return Response({"error": "File not found or it is a directory."}, status=status.HTTP_404_NOT_FOUND)
+        perms = (file_object.permissions or '')
+        # Owner read check (simplified): expect 'r' at index 0 for owner read
+        if len(perms) >= 1 and perms[0] != 'r':
+            return Response({"error": "Permission denied: read not allowed"}, status=status.HTTP_403_FORBIDDEN)
+
+        # Reads are cached per object under a version that every write and
+        # chmod of it replaces (api.caching), so only misses read the content
+        tag = caching.etag('obj', request.user.id, pk, request.query_params.urlencode())
+        if caching.not_modified(request, tag):
+            return _cacheable(Response(status=status.HTTP_304_NOT_MODIFIED), tag)
+        entry = caching.get('obj', request.user.id, pk, tag)
+        if entry is not None:
+            return _cacheable(Response(entry['data'], headers={'Last-Modified': entry['modified']}), tag)
+
+        params = request.query_params
+        try:
+            if any(name in params for name in ('line', 'head', 'tail')):
+                data = self.read_lines(file_object, params)
+            elif 'offset' in params or 'length' in params:
+                data = self.read_bytes(file_object, params)
+            else:
+                data = {"content": read_text(file_object)}
+        except ValueError:
+            return Response({"error": "offset, length, line, count, head and tail must be non-negative integers"}, status=status.HTTP_400_BAD_REQUEST)
+        modified = http_date(file_object.updated_at.timestamp())
+        caching.put('obj', request.user.id, pk, tag, {'data': data, 'modified': modified})
+        return _cacheable(Response(data, headers={'Last-Modified': modified}), tag)
+
+    def read_lines(self, file_object, params):
+        if 'tail' in params:
+            text, first, last, total = read_lines(file_object, 0, tail=non_negative(params['tail']))
+        elif 'head' in params:
+            text, first, last, total = read_lines(file_object, 0, non_negative(params['head']))
+        else:
+            count = non_negative(params['count']) if 'count' in params else None
+            text, first, last, total = read_lines(file_object, max(non_negative(params['line']) - 1, 0), count)
+        return {
+            "content": text,
+            "first_line": first + 1,
+            "last_line": last,
+            "total_lines": total,
+            "size": file_object.size,
+        }
+
+    def read_bytes(self, file_object, params):
+        offset = non_negative(params.get('offset', 0))
+        length = non_negative(params['length']) if 'length' in params else None
+        end = file_object.size if length is None else min(offset + length, file_object.size)
+        offset = min(offset, file_object.size)
+        return {
+            "content": read_bytes(file_object, offset, end),
+            "offset": offset,
+            "length": end - offset,
+            "size": file_object.size,
+            "eof": end >= file_object.size,
+        }
 
     def patch(self, request, pk):
         try:
-            file_object = FileSystemObject.objects.get(pk=pk, owner=request.user, is_directory=False)
+            file_object = FileSystemObject.objects.defer('content').get(pk=pk, owner=request.user, is_directory=False)
             # Write permission check: expect 'w' at index 1
             perms = (file_object.permissions or '')
             if len(perms) >= 2 and perms[1] != 'w':
                 return Response({"error": "Permission denied: write not allowed"}, status=status.HTTP_403_FORBIDDEN)
 
-            # File locking: prevent concurrent writes
-            fid = int(pk)
-            if LOCK_MANAGER.get(fid):
-                return Response({"error": "File is locked for writing"}, status=status.HTTP_423_LOCKED)
-            LOCK_MANAGER[fid] = True
             new_content = request.data.get("content", "")
-
+            append = request.data.get("append", False)
+            # A client holding an exclusive lock (see FileLockView) writes under
+            # it; otherwise the write takes one for its own duration, waiting up
+            # to FILE_LOCK_WAIT seconds for current holders (then 423)
+            token = request.data.get("lock") or request.META.get('HTTP_X_LOCK_TOKEN')
+            if token:
+                if not LOCKS.holds(token, file_object.pk, EXCLUSIVE, owner=request.user):
+                    return Response({"error": "Lock token is not a live exclusive lock on this file"}, status=status.HTTP_423_LOCKED)
+                return self.write(request, file_object, new_content, append)
             try:
-                # Simulate write processing time so concurrent requests see the lock
-                time.sleep(5)
-                old_content = file_object.content or ""
-                # compute the would-be content based on append vs overwrite
-                if request.data.get("append", False):
-                    new_full = (old_content + ("\n" if old_content and new_content else "") + new_content)
+                with LOCKS.hold(file_object.pk, EXCLUSIVE, owner=request.user):
+                    return self.write(request, file_object, new_content, append)
+            except LockTimeout:
+                return Response({"error": "File is locked"}, status=status.HTTP_423_LOCKED)
+        except FileSystemObject.DoesNotExist:
+            return Response({"error": "File not found or it is a directory."}, status=status.HTTP_404_NOT_FOUND)
+
+    def write(self, request, file_object, new_content, append):
+        # The size may have changed while waiting for the lock
+        file_object.refresh_from_db(fields=['size'])
+        # Only the appended text (or the new content) is ever encoded;
+        # the stored size stands in for the old content
+        if append:
+            new_content = ("\n" if file_object.size and new_content else "") + new_content
+            delta = len(new_content.encode('utf-8'))
+        else:
+            delta = len(new_content.encode('utf-8')) - file_object.size
+
+        # Disk quota enforcement: storage_used moves by this write's delta in
+        # the same transaction, with the limit checked by the UPDATE itself
+        try:
+            with transaction.atomic():
+                quota.charge(request.user.id, delta)
+                # Apply write: an append only touches the file's tail block
+                if append:
+                    append_text(file_object, new_content)
                 else:
-                    new_full = new_content
-
-                # Disk quota enforcement
-                # storage_used tracks total user bytes across files; adjust by delta of this file
-                from .models import UserProfile
-                profile, _ = UserProfile.objects.get_or_create(user=request.user)
-                old_len = len(old_content.encode('utf-8'))
-                new_len = len(new_full.encode('utf-8'))
-                delta = new_len - old_len
-                if delta > 0 and (profile.storage_used + delta) > profile.storage_limit:
-                    return Response({"error": "Disk quota exceeded"}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
-
-                # Apply write
-                file_object.content = new_full
-                file_object.save()
-
-                # Update quota usage
-                profile.storage_used = max(0, profile.storage_used + delta)
-                profile.save(update_fields=['storage_used'])
-
-                return Response({"content": file_object.content})
-            finally:
-                LOCK_MANAGER.pop(fid, None)
+                    write_text(file_object, new_content)
+        except quota.QuotaExceeded:
+            return Response({"error": "Disk quota exceeded"}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        if append:
+            return Response({"size": file_object.size})
+        return Response({"content": new_content, "size": file_object.size})
+
+
+class FileLockView(APIView):
+    """
+    Advisory reader/writer locks on a file, shared by all workers (api.locks).
+
+    GET: held locks and waiting requests.
+    POST { "mode": "shared"|"exclusive", "timeout": <s>, "lease": <s> }: lock
+    the file, waiting up to timeout seconds (0 = try-lock); 423 if not
+    granted. POST { "token": ... } renews a held lock's lease.
+    DELETE ?token=: release. Writes (PATCH content) wait for shared holders;
+    reads never take or wait for a lock.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_file(self, request, pk):
+        return FileSystemObject.objects.only('id').get(pk=pk, owner=request.user, is_directory=False)
+
+    def get(self, request, pk):
+        try:
+            file_object = self.get_file(request, pk)
+        except FileSystemObject.DoesNotExist:
+            return Response({"error": "File not found or it is a directory."}, status=status.HTTP_404_NOT_FOUND)
+        return Response([
+            {
+                "mode": lock.mode,
+                "granted": lock.granted,
+                "mine": lock.owner_id == request.user.id,
+                "requested_at": lock.requested_at,
+                "expires_at": lock.expires_at,
+            }
+            for lock in LOCKS.locks(file_object.pk)
+        ])
+
+    def post(self, request, pk):
+        try:
+            file_object = self.get_file(request, pk)
+        except FileSystemObject.DoesNotExist:
+            return Response({"error": "File not found or it is a directory."}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            lease = float(request.data['lease']) if 'lease' in request.data else None
+            timeout = float(request.data['timeout']) if 'timeout' in request.data else None
+        except (TypeError, ValueError):
+            return Response({"error": "timeout and lease must be numbers"}, status=status.HTTP_400_BAD_REQUEST)
+        if lease is not None and lease <= 0:
+            return Response({"error": "lease must be positive"}, status=status.HTTP_400_BAD_REQUEST)
+        if timeout is not None and timeout > getattr(settings, 'FILE_LOCK_MAX_WAIT', 10):
+            # Waiting ties up a worker; long waits are the client's loop to run
+            timeout = getattr(settings, 'FILE_LOCK_MAX_WAIT', 10)
+
+        token = request.data.get('token')
+        if token:
+            if not LOCKS.holds(token, file_object.pk, owner=request.user) or not LOCKS.renew(token, lease):
+                return Response({"error": "Lock not held (released or expired)"}, status=status.HTTP_404_NOT_FOUND)
+            return Response({"token": token})
+
+        mode = request.data.get('mode', EXCLUSIVE)
+        if mode not in LOCK_MODES:
+            return Response({"error": f"mode must be one of: {', '.join(LOCK_MODES)}"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            token = LOCKS.acquire(file_object.pk, mode, owner=request.user, timeout=timeout, lease=lease)
+        except LockTimeout:
+            return Response({"error": "File is locked"}, status=status.HTTP_423_LOCKED)
+        return Response({"token": token, "mode": mode}, status=status.HTTP_201_CREATED)
+
+    def delete(self, request, pk):
+        token = request.query_params.get('token') or request.data.get('token')
+        if not token:
+            return Response({"error": "token is required"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            file_object = self.get_file(request, pk)
         except FileSystemObject.DoesNotExist:
             return Response({"error": "File not found or it is a directory."}, status=status.HTTP_404_NOT_FOUND)
+        if not LOCKS.locks(file_object.pk).filter(token=token, owner=request.user).exists() or not LOCKS.release(token):
+            return Response({"error": "Lock not held (released or expired)"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 class ProcessViewSet(viewsets.ModelViewSet):
+    """
+    GET lists the user's processes in cursor pages, newest first
+    (?cursor=, ?page_size=), optionally filtered by ?status=Ready,Running,
+    ?file=<id> or ?name=<file name>. The page table is left out unless
+    ?page_table=1. GET stats/ summarizes them.
+    """
     serializer_class = ProcessSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ProcessCursorPagination
+
+    def wants_page_table(self):
+        return self.action != 'list' or self.request.query_params.get('page_table') in ('1', 'true')
 
     def get_queryset(self):
-        # Users can only see their own processes
-        return Process.objects.filter(owner=self.request.user)
+        # Users can only see their own processes; file_name comes from the same query
+        qs = Process.objects.filter(owner=self.request.user).select_related('file_object')
+        if self.action == 'list':
+            qs = qs.defer('file_object__content')
+            if not self.wants_page_table():
+                qs = qs.defer('page_frames')
+        return qs
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('page_table', self.wants_page_table())
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_processes(self, qs):
+        """Apply ?status=, ?file= and ?name=; returns (queryset, None) or (None, error message)."""
+        params = self.request.query_params
+        if params.get('status'):
+            statuses = [s.strip() for s in params['status'].split(',') if s.strip()]
+            valid = [choice for choice, _ in Process.STATUS_CHOICES]
+            if set(statuses) - set(valid):
+                return None, f"status must be one or more of: {', '.join(valid)}"
+            qs = qs.filter(status__in=statuses)
+        if params.get('file'):
+            try:
+                qs = qs.filter(file_object_id=int(params['file']))
+            except ValueError:
+                return None, "file must be an id"
+        if params.get('name'):
+            qs = qs.filter(file_object__name=params['name'])
+        return qs, None
+
+    def list(self, request, *args, **kwargs):
+        qs, error = self.filter_processes(self.get_queryset())
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+        page = self.paginate_queryset(qs)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """
+        Processes per status and average turnaround/waiting time, in one
+        aggregate query (honours ?file= and ?name=), plus the same summary of
+        the archived ones (see api.retention).
+        """
+        qs, error = self.filter_processes(Process.objects.filter(owner=request.user))
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+        statuses = [choice for choice, _ in Process.STATUS_CHOICES]
+        totals = qs.aggregate(
+            total=Count('id'),
+            avg_turnaround=Avg('turnaround', filter=Q(status='Finished')),
+            avg_waiting=Avg('waiting_time', filter=Q(status='Finished')),
+            total_cpu_time=Sum('cpu_time'),
+            **{s: Count('id', filter=Q(status=s)) for s in statuses},
+        )
+        return Response({
+            'total': totals['total'],
+            'by_status': {s: totals[s] for s in statuses},
+            'avg_turnaround': totals['avg_turnaround'],
+            'avg_waiting': totals['avg_waiting'],
+            'cpu_time': totals['total_cpu_time'] or 0,
+            'archived': self.archived(request),
+        })
+
+    def archived(self, request):
+        archive = ProcessArchive.objects.filter(owner=request.user)
+        if request.query_params.get('name'):
+            archive = archive.filter(file_name=request.query_params['name'])
+        if request.query_params.get('file'):
+            # Archived rows keep the program by name only
+            name = FileSystemObject.objects.filter(pk=request.query_params['file'], owner=request.user).values('name')
+            archive = archive.filter(file_name__in=name)
+        return archive.aggregate(
+            total=Count('id'),
+            avg_turnaround=Avg('turnaround'),
+            avg_waiting=Avg('waiting_time'),
+            faults=Sum('faults'),
+            hits=Sum('hits'),
+        )
 
     def create(self, request, *args, **kwargs):
         # Validate exec permission before creating
@@ -128,9 +779,25 @@ class ProcessViewSet(viewsets.ModelViewSet):
             raise PermissionDenied('Permission denied: execute not allowed')
         return super().create(request, *args, **kwargs)
 
+    def perform_destroy(self, instance):
+        pid = instance.pk
+        instance.delete()
+        forget_processes([pid])
+
     def perform_create(self, serializer):
         # Automatically set the owner to the current user
-        serializer.save(owner=self.request.user)
+        file_object = serializer.validated_data['file_object']
+        proc = serializer.save(
+            owner=self.request.user,
+            burst=line_total(file_object),
+            arrived_at=CLOCK.timestamp(),
+        )
+        # Wake the scheduler once the row is visible to its DB connection (standalone
+        # workers find it in the database themselves)
+        if RUN_QUEUE.dispatchers:
+            transaction.on_commit(lambda: RUN_QUEUE.push(
+                proc.id, burst=proc.burst, priority=proc.priority, affinity=proc.affinity,
+            ))
 
     @action(detail=False, methods=['post'])
     def pkill(self, request):
@@ -147,37 +814,336 @@ class ProcessViewSet(viewsets.ModelViewSet):
             status__in=['Ready', 'Running'],
             file_object__name=name,
         )
-        count = qs.count()
+        pids = list(qs.values_list('id', flat=True))
         qs.delete()
+        forget_processes(pids)
+        for pid in pids:
+            EVENTS.publish('state', {'pid': pid, 'status': 'Killed', 'cpu': None}, user_id=request.user.id)
+        count = len(pids)
         return Response({"killed": count})
 
 
+def memory_snapshot(user, offset=0, limit=SNAPSHOT_FRAMES_LIMIT):
+    # Every process of this user currently on a CPU (Blocked = stalled on a page fault)
+    on_cpu = (
+        Process.objects
+        .filter(owner=user, status__in=['Running', 'Blocked'], cpu__isnull=False)
+        .order_by('cpu')
+    )
+    cpus = [{'cpu': cpu, 'running': None} for cpu in range(RUN_QUEUE.cpus)]
+    for proc in on_cpu:
+        if proc.cpu < len(cpus):
+            cpus[proc.cpu]['running'] = {
+                'pid': proc.id,
+                'status': proc.status,
+                'page_table': proc.page_table or {},
+            }
+    running_info = next((c['running'] for c in cpus if c['running']), None)
+    # The RAM published by the scheduler process, whichever process this is
+    shared = SHARED_RAM.snapshot(offset, limit)
+    if shared is not None:
+        frames, frames_total, last_event = shared['frames'], shared['frames_total'], shared['last_event']
+    else:
+        with MEMORY.lock:
+            frames = MEMORY.frames[offset:offset + limit]
+        frames_total, last_event = MEMORY.nframes, ram.LAST_EVENT
+    return {
+        'frames': frames,
+        'frames_total': frames_total,
+        'frames_offset': offset,
+        # First running process, kept for clients that only show one CPU
+        'running': running_info,
+        'cpus': cpus,
+        'last_event': last_event,
+    }
+
+
+def frame_window(request):
+    # Large RAM sizes are served a window at a time: ?frames_offset=&frames_limit=
+    offset = max(int(request.query_params.get('frames_offset', 0)), 0)
+    limit = max(int(request.query_params.get('frames_limit', SNAPSHOT_FRAMES_LIMIT)), 0)
+    return offset, limit
+
+
 class MemorySnapshotView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        running = Process.objects.filter(owner=request.user, status='Running').first()
-        running_info = None
-        if running:
-            running_info = {
-                'pid': running.id,
-                'page_table': running.page_table or {},
-            }
-        frames = PHYSICAL_RAM_FRAMES
+        try:
+            offset, limit = frame_window(request)
+        except ValueError:
+            return Response({"error": "frames_offset and frames_limit must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(memory_snapshot(request.user, offset, limit))
+
+
+class EventStreamView(APIView):
+    """
+    Server-Sent Events stream of the caller's scheduler and memory events:
+    'snapshot' (same body as /memory-snapshot/), 'frames' (frame-table deltas),
+    'fault', 'hit', 'state' and 'reset' (too far behind: take a new snapshot).
+
+    Reconnecting clients send Last-Event-ID (EventSource does this itself) or
+    ?last_event_id= and get the missed events replayed from a bounded
+    per-user buffer. EventSource cannot set headers, so ?token= is accepted too.
+    Served asynchronously under ASGI (vfs_project.asgi), one thread per client under WSGI.
+
+    A process without its own scheduler (standalone workers, see api.workers)
+    has no events to send; it sends a new 'snapshot' whenever the shared RAM
+    changes instead, at most every EVENT_STREAM_SNAPSHOT_INTERVAL seconds.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [JWTAuthentication, QueryParamJWTAuthentication]
+
+    def perform_content_negotiation(self, request, force=False):
+        # EventSource sends Accept: text/event-stream, which no DRF renderer offers
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request):
+        user_id = request.user.id
+        last_id = request.META.get('HTTP_LAST_EVENT_ID') or request.query_params.get('last_event_id')
+        try:
+            last_id = int(last_id) if last_id not in (None, '') else None
+            offset, limit = frame_window(request)
+        except ValueError:
+            return Response({"error": "last_event_id, frames_offset and frames_limit must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+        cursor = EVENTS.subscribe(user_id)
+        head = ''
+        if last_id is None or not EVENTS.since(user_id, last_id)[1]:
+            # Fresh (or hopelessly stale) client: start from a full snapshot
+            head = format_sse({'id': cursor, 'type': 'snapshot', 'data': memory_snapshot(request.user, offset, limit)})
+            last_id = cursor
+
+        keepalive = getattr(settings, 'EVENT_STREAM_KEEPALIVE', 15)
+        if not RUN_QUEUE.dispatchers:
+            return self.snapshot_stream(request, offset, limit, keepalive)
+        if isinstance(request._request, ASGIRequest):
+            async def body():
+                if head:
+                    yield head
+                async for chunk in EVENTS.astream(user_id, last_id, keepalive):
+                    yield chunk
+        else:
+            def body():
+                if head:
+                    yield head
+                yield from EVENTS.stream(user_id, last_id, keepalive)
+
+        return self.sse_response(body())
+
+    def snapshot_stream(self, request, offset, limit, keepalive):
+        interval = getattr(settings, 'EVENT_STREAM_SNAPSHOT_INTERVAL', 0.5)
+        idle_ticks = max(int(keepalive / interval), 1)
+
+        def step(seen, idle):
+            # (version sent last, polls since the last chunk) -> (chunk or None, seen, idle)
+            version = SHARED_RAM.version()
+            if version != seen:
+                data = memory_snapshot(request.user, offset, limit)
+                return format_sse({'id': version[1] if version else 0, 'type': 'snapshot', 'data': data}), version, 0
+            if idle + 1 >= idle_ticks:
+                return ': keepalive\n\n', seen, 0
+            return None, seen, idle + 1
+
+        if isinstance(request._request, ASGIRequest):
+            async def body():
+                seen, idle = (), 0
+                while True:
+                    chunk, seen, idle = await sync_to_async(step)(seen, idle)
+                    if chunk:
+                        yield chunk
+                    await asyncio.sleep(interval)
+        else:
+            def body():
+                seen, idle = (), 0
+                while True:
+                    chunk, seen, idle = step(seen, idle)
+                    if chunk:
+                        yield chunk
+                    time.sleep(interval)
+        return self.sse_response(body())
+
+    def sse_response(self, body):
+        response = StreamingHttpResponse(body, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Keep reverse proxies from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class RuntimeSettingsView(APIView):
+    """
+    Readable by any user; a PUT changes the scheduler for everyone, so it is
+    for admins only, and only where the scheduler runs (see scheduler_elsewhere).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_permissions(self):
+        if self.request.method == 'PUT':
+            return [permissions.IsAdminUser()]
+        return super().get_permissions()
+
+
+def scheduler_elsewhere():
+    # Standalone workers (manage.py run_scheduler) keep their own queues, RAM and
+    # read-ahead settings: a change here would silently not reach them
+    if RUN_QUEUE.dispatchers:
+        return None
+    return Response(
+        {"error": "The scheduler runs in separate worker processes; set this in their settings and restart them"},
+        status=status.HTTP_409_CONFLICT,
+    )
+
+
+class SchedulerView(RuntimeSettingsView):
+    """
+    GET: active scheduling policy, per-CPU queue contents, simulation clock and
+    the caller's average turnaround / waiting time.
+    PUT (admins): switch policy or simulation mode at runtime. Body: { "policy": "rr", "quantum": 4, "mode": "fast" }
+    """
+
+    def get(self, request):
+        policy = RUN_QUEUE.policy
+        stats = (
+            Process.objects
+            .filter(owner=request.user, status='Finished', turnaround__isnull=False)
+            .aggregate(
+                finished=Count('id'),
+                avg_turnaround=Avg('turnaround'),
+                avg_waiting=Avg('waiting_time'),
+            )
+        )
         return Response({
-            'frames': frames,
-            'running': running_info,
-            'last_event': LAST_EVENT,
+            'policy': policy.name,
+            'quantum': policy.quantum,
+            'policies': sorted(POLICIES),
+            'cpus': RUN_QUEUE.cpus,
+            'work_stealing': RUN_QUEUE.work_stealing,
+            'queues': [
+                [
+                    {'pid': job.pid, 'remaining': job.remaining, 'priority': job.priority, 'level': job.level}
+                    for job in jobs
+                ]
+                for jobs in RUN_QUEUE.snapshot_by_cpu()
+            ],
+            'simulation': CLOCK.status(),
+            **stats,
         })
 
+    def put(self, request):
+        conflict = scheduler_elsewhere()
+        if conflict:
+            return conflict
+        mode = request.data.get('mode', CLOCK.mode)
+        if mode not in MODES:
+            return Response({"error": f"mode must be one of: {', '.join(MODES)}"}, status=status.HTTP_400_BAD_REQUEST)
+        name = request.data.get('policy', RUN_QUEUE.policy.name)
+        quantum = request.data.get('quantum', RUN_QUEUE.policy.quantum)
+        if quantum is not None:
+            try:
+                quantum = int(quantum)
+            except (TypeError, ValueError):
+                return Response({"error": "quantum must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+            if quantum < 1:
+                return Response({"error": "quantum must be at least 1"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            policy = RUN_QUEUE.set_policy(name, quantum)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if mode != CLOCK.mode:
+            CLOCK.set_mode(mode)
+        return Response({'policy': policy.name, 'quantum': policy.quantum, 'mode': CLOCK.mode})
 
-class QuotaView(APIView):
-    permission_classes = [permissions.IsAuthenticated]
+
+class PagingView(RuntimeSettingsView):
+    """
+    GET: active page replacement policy with its hit/fault counters, and the
+    read-ahead settings with what they saved ('prefetch', see api.prefetch).
+    PUT (admins): switch policy at runtime (counters restart) and/or change read-ahead.
+    Body: { "policy": "lru", "prefetch": true, "min_pages": 1, "max_pages": 8, "working_set_window": 16 }
+    """
 
     def get(self, request):
-        from .models import UserProfile
-        profile, _ = UserProfile.objects.get_or_create(user=request.user)
+        shared = SHARED_RAM.snapshot(limit=0)
+        if shared is not None:
+            stats = {key: shared[key] for key in ('policy', 'hits', 'faults', 'evictions', 'fault_rate', 'free_frames')}
+            stats['frames'] = shared['frames_total']
+            prefetch = {**PREFETCH.stats(CLOCK.costs), **prefetch_report(shared['prefetch'], CLOCK.costs)}
+        else:
+            stats = MEMORY.stats()
+            prefetch = PREFETCH.stats(CLOCK.costs)
         return Response({
-            'storage_used': profile.storage_used,
-            'storage_limit': profile.storage_limit,
+            **stats,
+            'prefetch': prefetch,
+            'policies': sorted(REPLACEMENT_POLICIES),
         })
+
+    def put(self, request):
+        conflict = scheduler_elsewhere()
+        if conflict:
+            return conflict
+        data = request.data
+        read_ahead = {
+            'enabled': data.get('prefetch'),
+            'min_pages': data.get('min_pages'),
+            'max_pages': data.get('max_pages'),
+            'window': data.get('working_set_window'),
+        }
+        # The policy may be left out when only read-ahead changes
+        switch = 'policy' in data or not any(value is not None for value in read_ahead.values())
+        try:
+            # The policy name is checked before anything changes, so a bad
+            # one leaves read-ahead as it was (configure is all or nothing)
+            if switch:
+                make_replacement_policy(data.get('policy'), 1)
+            PREFETCH.configure(**read_ahead)
+            if switch:
+                MEMORY.set_policy(data.get('policy'))
+        except (TypeError, ValueError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({**MEMORY.stats(), 'prefetch': PREFETCH.stats(CLOCK.costs)})
+
+
+class PagingCompareView(APIView):
+    """
+    Offline comparison of every replacement policy, including Belady's OPT.
+    Body: { "reference": [0, 1, 2, 0, 3, ...], "frames": 8, "policies": ["lru", "opt"] }
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        reference = request.data.get('reference')
+        if (not isinstance(reference, list) or not reference
+                or not all(isinstance(page, int) and not isinstance(page, bool) for page in reference)):
+            return Response({"error": "reference must be a non-empty list of page numbers"}, status=status.HTTP_400_BAD_REQUEST)
+        max_references = getattr(settings, 'PAGING_COMPARE_MAX_REFERENCES', 100000)
+        if len(reference) > max_references:
+            return Response({"error": f"reference is limited to {max_references} pages"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            nframes = int(request.data.get('frames', MEMORY.nframes))
+        except (TypeError, ValueError):
+            return Response({"error": "frames must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        if nframes < 1:
+            return Response({"error": "frames must be at least 1"}, status=status.HTTP_400_BAD_REQUEST)
+        policies = request.data.get('policies') or OFFLINE_POLICIES
+        if not isinstance(policies, list) or not all(isinstance(name, str) for name in policies):
+            return Response({"error": "policies must be a list of policy names"}, status=status.HTTP_400_BAD_REQUEST)
+        unknown = [name for name in policies if name not in OFFLINE_POLICIES]
+        if unknown:
+            return Response({"error": f"Unknown policies: {', '.join(map(str, unknown))}"}, status=status.HTTP_400_BAD_REQUEST)
+        # Frames beyond the number of distinct pages never change the outcome,
+        # and would only be allocated for nothing
+        results = compare_policies(reference, min(nframes, len(set(reference))), policies)
+        return Response({
+            'frames': nframes,
+            'references': len(reference),
+            'results': sorted(results, key=lambda r: r['faults']),
+        })
+
+
+class QuotaView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        # Cached reading, kept current by quota.charge() and the reconciler
+        return Response(quota.usage(request.user.id))
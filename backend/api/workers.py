@@ -0,0 +1,160 @@
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .runqueue import RUN_QUEUE
+
+logger = logging.getLogger(__name__)
+
+# Statuses of the processes a worker holds (queued on its CPUs or running there)
+HELD = ('Ready', 'Running', 'Blocked')
+# Ready rows looked at per claimed one where the conditional UPDATE decides (see claim())
+CLAIM_CANDIDATES = 4
+
+
+def register(name=None):
+    """
+    Record this OS process as standalone scheduler worker `name` (default
+    <hostname>-<pid>) and return the name. A worker restarted under the same
+    name first hands back whatever its previous run held.
+    """
+    from .models import SchedulerWorker
+
+    hostname = socket.gethostname()
+    name = name or f'{hostname}-{os.getpid()}'
+    with transaction.atomic():
+        release(name)
+        SchedulerWorker.objects.update_or_create(name=name, defaults={
+            'hostname': hostname, 'pid': os.getpid(), 'cpus': RUN_QUEUE.cpus, 'heartbeat_at': timezone.now(),
+        })
+    return name
+
+
+def heartbeat(name):
+    """Renew the worker's heartbeat; False if it was presumed dead (its row is gone) meanwhile."""
+    from .models import SchedulerWorker
+
+    return SchedulerWorker.objects.filter(name=name).update(heartbeat_at=timezone.now()) > 0
+
+
+def release(name):
+    """
+    Put every unfinished process held by worker `name` back in the Ready
+    pool for any worker to claim. Its pages were in that worker's simulated
+    RAM, so the page tables are cleared. Returns the number released.
+    """
+    from .models import Process
+
+    return (
+        Process.objects
+        .filter(worker=name, status__in=HELD)
+        .update(status='Ready', cpu=None, worker=None, page_frames=b'')
+    )
+
+
+def unregister(name):
+    """Graceful shutdown: hand back the worker's processes and drop its row."""
+    from .models import SchedulerWorker
+
+    with transaction.atomic():
+        released = release(name)
+        SchedulerWorker.objects.filter(name=name).delete()
+    return released
+
+
+def recover_dead(timeout=None):
+    """
+    Release the processes of workers whose heartbeat is older than `timeout`
+    seconds (SCHEDULER_WORKER_TIMEOUT by default), and of worker names that
+    have no row at all. Any worker may run this; each dead worker is
+    recovered once, by whoever deletes its row. Returns the processes released.
+    """
+    from .models import Process, SchedulerWorker
+
+    if timeout is None:
+        timeout = getattr(settings, 'SCHEDULER_WORKER_TIMEOUT', 30)
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    recovered = 0
+    for name in SchedulerWorker.objects.filter(heartbeat_at__lt=cutoff).values_list('name', flat=True):
+        with transaction.atomic():
+            deleted, _ = SchedulerWorker.objects.filter(name=name, heartbeat_at__lt=cutoff).delete()
+            if deleted:
+                released = release(name)
+                recovered += released
+                logger.warning('Worker %s stopped sending heartbeats; released %s process(es)', name, released)
+    recovered += (
+        Process.objects
+        .filter(status__in=HELD, worker__isnull=False)
+        .exclude(worker__in=SchedulerWorker.objects.values('name'))
+        .update(status='Ready', cpu=None, worker=None, page_frames=b'')
+    )
+    return recovered
+
+
+def claim(name, limit=1):
+    """
+    Take up to `limit` unclaimed Ready processes, oldest first, for worker
+    `name` and queue them on its CPUs; returns how many. Where the database
+    has SELECT ... FOR UPDATE SKIP LOCKED (with a row limit), rows another
+    worker is claiming are skipped rather than waited for. Elsewhere (SQLite,
+    Oracle) a conditional UPDATE per row decides which worker gets it.
+    """
+    from .models import Process
+
+    ready = Process.objects.filter(status='Ready', worker__isnull=True).order_by('created_at', 'id')
+    features = connection.features
+    with transaction.atomic():
+        if features.has_select_for_update_skip_locked and features.supports_select_for_update_with_limit:
+            pids = list(ready.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit])
+            Process.objects.filter(pk__in=pids).update(worker=name)
+        else:
+            pids = []
+            for pid in ready.values_list('id', flat=True)[:limit * CLAIM_CANDIDATES]:
+                if Process.objects.filter(pk=pid, status='Ready', worker__isnull=True).update(worker=name):
+                    pids.append(pid)
+                    if len(pids) >= limit:
+                        break
+        rows = list(
+            Process.objects
+            .filter(pk__in=pids)
+            .order_by('created_at', 'id')
+            .values_list('id', 'burst', 'program_counter', 'priority', 'affinity')
+        )
+    for pid, burst, pc, priority, affinity in rows:
+        RUN_QUEUE.push(pid, burst=burst, remaining=max(burst - pc, 0), priority=priority, affinity=affinity)
+    return len(rows)
+
+
+def start_heartbeat(name, lost):
+    """
+    Start the thread that renews the worker's heartbeat and recovers dead
+    workers every SCHEDULER_HEARTBEAT_INTERVAL seconds. Sets the `lost`
+    event if this worker was itself presumed dead: its processes may already
+    run elsewhere, so it has to stop.
+    """
+    interval = getattr(settings, 'SCHEDULER_HEARTBEAT_INTERVAL', 5)
+    t = threading.Thread(target=heartbeat_loop, args=(name, interval, lost), name='SchedulerHeartbeat', daemon=True)
+    t.start()
+    return t
+
+
+def heartbeat_loop(name, interval, lost):
+    logger.info('Worker %s heartbeat started (every %ss).', name, interval)
+    while True:
+        time.sleep(interval)
+        try:
+            connection.close_if_unusable_or_obsolete()
+            if not heartbeat(name):
+                logger.error('Worker %s was presumed dead by another worker; stopping', name)
+                lost.set()
+                return
+            recover_dead()
+        except Exception:
+            logger.exception('Worker %s heartbeat failed', name)
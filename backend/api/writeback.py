@@ -0,0 +1,134 @@
+import threading
+import time
+
+from django.db import transaction
+
+from .paging import encode_page_table
+
+
+class ProcessWriteBack:
+    """
+    Write-behind buffer for the scheduler's per-page Process updates.
+
+    Page-table changes and the Blocked/Running flips of a page fault are
+    kept in memory (latest value wins per pid and field) and written with
+    one bulk_update per field set inside a single transaction. A flush
+    happens when `max_pending` processes are dirty, when `interval` seconds
+    have passed since the last flush, or explicitly at quantum and process
+    boundaries, where the scheduler folds the pending fields into its own
+    final UPDATE via take().
+
+    Nothing here has to survive a crash: the frames the page tables point
+    at are in-memory too, so recover() clears page tables on startup.
+
+    Rows are only written while they are still held by `worker` (the
+    standalone scheduler worker, None for the embedded scheduler) and not
+    Finished, so a killed process or one handed to another worker is never
+    overwritten by a late flush.
+    """
+
+    def __init__(self, max_pending=64, interval=1.0):
+        self.max_pending = max_pending
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._dirty = {}
+        self._last_flush = time.monotonic()
+        self.worker = None
+        self.flushes = 0
+        self.rows_written = 0
+
+    def set(self, pid, **fields):
+        with self._lock:
+            self._dirty.setdefault(pid, {}).update(fields)
+            due = (
+                len(self._dirty) >= self.max_pending
+                or time.monotonic() - self._last_flush >= self.interval
+            )
+        if due:
+            self.flush()
+
+    def set_page_table(self, pid, table):
+        """Buffer a dense page table (see api.paging) in its compact column encoding."""
+        self.set(pid, page_frames=encode_page_table(table))
+
+    def set_status(self, pid, status):
+        self.set(pid, status=status)
+
+    def take(self, pid):
+        """Remove and return the pending fields of one process (to merge into a final UPDATE)."""
+        with self._lock:
+            return self._dirty.pop(pid, {})
+
+    def discard(self, pid):
+        with self._lock:
+            self._dirty.pop(pid, None)
+
+    def flush(self):
+        from .models import Process
+
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            self._last_flush = time.monotonic()
+        if not dirty:
+            return 0
+
+        # bulk_update writes the same columns for every row, so group by field set
+        groups = {}
+        for pid, fields in dirty.items():
+            groups.setdefault(tuple(sorted(fields)), []).append(Process(id=pid, **fields))
+        held = Process.objects.filter(worker=self.worker).exclude(status='Finished')
+        written = 0
+        try:
+            with transaction.atomic():
+                for field_names, objs in groups.items():
+                    # Still one UPDATE per field set: bulk_update keeps the queryset's filter
+                    written += held.bulk_update(objs, list(field_names))
+        except Exception:
+            # Put the batch back (newer values win) so the next flush retries it
+            with self._lock:
+                for pid, fields in dirty.items():
+                    self._dirty[pid] = {**fields, **self._dirty.get(pid, {})}
+            raise
+        self.flushes += 1
+        self.rows_written += written
+        return written
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._dirty)
+        return {
+            'pending': pending,
+            'flushes': self.flushes,
+            'rows_written': self.rows_written,
+            'max_pending': self.max_pending,
+            'interval': self.interval,
+        }
+
+
+def recover():
+    """
+    Make the Process table consistent after a restart: simulated RAM starts
+    empty, so no page table can point at a frame, and nothing is on a CPU.
+    Processes held by standalone workers (api.workers) are left to them.
+    """
+    from .models import Process
+
+    with transaction.atomic():
+        interrupted = (
+            Process.objects
+            .filter(status__in=['Running', 'Blocked'], worker__isnull=True)
+            .update(status='Ready', cpu=None)
+        )
+        Process.objects.filter(worker__isnull=True).exclude(status='Finished').update(page_frames=b'')
+    return interrupted
+
+
+def _default_write_back():
+    from django.conf import settings
+    return ProcessWriteBack(
+        max_pending=getattr(settings, 'PAGE_TABLE_FLUSH_MAX_PENDING', 64),
+        interval=getattr(settings, 'PAGE_TABLE_FLUSH_INTERVAL', 1.0),
+    )
+
+
+WRITE_BACK = _default_write_back()
@@ -12,5 +12,11 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vfs_project.settings')
+# ASGI worker processes only serve requests: run the scheduler beside them with
+#   python manage.py run_scheduler --maintenance   (and more plain workers if wanted)
+# Its simulated RAM is published through api.sharedram, and the event stream
+# (/api/events/) sends a snapshot whenever it changes. For a single-process
+# setup with per-event streaming, set VFS_EMBEDDED_SCHEDULER=1 and run exactly
+# one ASGI worker: an embedded scheduler keeps RAM in its own process.
 
 application = get_asgi_application()
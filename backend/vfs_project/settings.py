@@ -137,4 +137,96 @@ REST_FRAMEWORK = {
 # Add this at the end of the file
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173", # The address of your React Vite app
-]
\ No newline at end of file
+]
+
+# Process scheduler: one of 'fcfs', 'rr', 'sjf', 'srtf', 'priority', 'mlfq'.
+# The quantum is measured in pages (program lines) executed per time slice.
+SCHEDULER_POLICY = 'fcfs'
+SCHEDULER_QUANTUM = 4
+# Number of simulated CPUs (one dispatcher thread each); idle CPUs steal
+# unpinned jobs from their siblings' run queues when work stealing is on.
+SCHEDULER_CPUS = 2
+SCHEDULER_WORK_STEALING = True
+# Page replacement when physical RAM is full: 'fifo', 'lru', 'clock' or 'lfu'
+PAGE_REPLACEMENT_POLICY = 'fifo'
+# Simulated time: 'realtime' paces the scheduler with the wall clock (demo),
+# 'fast' runs the same event sequence as fast as possible. Costs are in
+# simulated seconds and override api.simclock.DEFAULT_COSTS.
+SIMULATION_MODE = 'realtime'
+SIMULATION_COSTS = {
+    'dispatch': 15.0,
+    'page_fault': 5.0,
+    'page_hit': 0.5,
+    'prefetch_page': 0.5,
+}
+# Scheduler write-behind: buffered page-table/status writes are flushed in one
+# bulk_update once this many processes are dirty or this many seconds passed
+# (and always at quantum and process boundaries).
+PAGE_TABLE_FLUSH_MAX_PENDING = 64
+PAGE_TABLE_FLUSH_INTERVAL = 1.0
+# Simulated physical RAM size in frames (the frame table is array-backed, so
+# realistic sizes such as 65536 are fine)
+PHYSICAL_RAM_SIZE = 8
+# Event stream (/api/events/): events kept per user for Last-Event-ID resume,
+# and seconds between keepalive comments on an idle stream.
+EVENT_RING_SIZE = 512
+EVENT_STREAM_KEEPALIVE = 15
+# File data is stored in blocks of this many characters; appends rewrite only
+# the last block (see api.content)
+FILE_BLOCK_SIZE = 4096
+# File locks (api.locks): lease in seconds after which a lock whose holder
+# stopped renewing it is dropped; how long a write waits for current holders
+# before answering 423; upper bound on the wait a client may ask for.
+FILE_LOCK_LEASE = 30
+FILE_LOCK_WAIT = 2
+FILE_LOCK_MAX_WAIT = 10
+# Disk quota (api.quota): seconds a user's usage reading stays cached for
+# /api/quota/, and seconds between background recomputations of every
+# user's usage from their file sizes (0 disables the reconciler thread).
+QUOTA_CACHE_TTL = 60
+QUOTA_RECONCILE_INTERVAL = 300
+# Most operations accepted by one /api/objects/batch/ request
+BATCH_MAX_OPS = 1000
+# Most files returned by one /api/search/ request
+SEARCH_MAX_FILES = 1000
+# Most entries returned by one du request (/api/du/)
+DU_MAX_ENTRIES = 1000
+# Listing/content cache (api.caching): cache alias used and seconds an entry
+# is kept. The default local-memory cache is per process; with several
+# worker processes use a shared backend so invalidations reach all of them,
+# e.g. CACHES = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+#                            'LOCATION': BASE_DIR / 'cache'}}
+VFS_CACHE = 'default'
+VFS_CACHE_TTL = 300
+# Process history (api.retention): finished processes created more than this
+# many seconds ago are moved into the compact ProcessArchive table, by a
+# background job every PROCESS_ARCHIVE_INTERVAL seconds (0 disables it; the
+# archive_processes command does the same on demand).
+PROCESS_RETENTION = 7 * 24 * 60 * 60
+PROCESS_ARCHIVE_INTERVAL = 3600
+# Standalone scheduler workers (manage.py run_scheduler, api.workers): seconds
+# an idle CPU waits before polling the database for Ready processes, processes
+# claimed per poll, seconds between heartbeats, and seconds without one after
+# which a worker is presumed dead and its processes are handed to the others.
+SCHEDULER_POLL_INTERVAL = 1.0
+SCHEDULER_CLAIM_BATCH = 1
+SCHEDULER_HEARTBEAT_INTERVAL = 5
+SCHEDULER_WORKER_TIMEOUT = 30
+# Simulated RAM shared with every web worker process (api.sharedram): the file
+# the scheduler process publishes its frame table and last event in (on tmpfs
+# where there is one). None disables sharing: each process serves its own RAM.
+SHARED_RAM_PATH = Path('/dev/shm/vfs_ram') if Path('/dev/shm').is_dir() else BASE_DIR / 'vfs_ram'
+# Read-ahead paging (api.prefetch): a page fault also loads the next pages of
+# the program, starting at PREFETCH_MIN_PAGES and doubling up to
+# PREFETCH_MAX_PAGES while the process reads sequentially. With a
+# WORKING_SET_WINDOW of n references (0 disables it) a page not referenced in
+# the process's last n accesses is freed. Both can be changed with PUT /api/paging/.
+PAGING_PREFETCH = False
+PREFETCH_MIN_PAGES = 1
+PREFETCH_MAX_PAGES = 8
+WORKING_SET_WINDOW = 0
+# Longest page reference string accepted by POST /api/paging/compare/
+PAGING_COMPARE_MAX_REFERENCES = 100000
+# Seconds between checks for a changed shared RAM by the event stream of a
+# process without its own scheduler (it then sends snapshots, see EventStreamView)
+EVENT_STREAM_SNAPSHOT_INTERVAL = 0.5
@@ -19,15 +19,32 @@ const Terminal = () => {
   const fetchFiles = async (directoryId) => {
     const parentId = directoryId === null ? 'null' : directoryId;
     try {
-      const response = await axios.get(`http://localhost:8000/api/objects/?parent=${parentId}`, {
-        headers: { 'Authorization': `Bearer ${token}` }
-      });
-      setFilesInCurrentDir(response.data);
+      // Lightweight listing (no file content), following the cursor pages
+      let url = `http://localhost:8000/api/objects/?parent=${parentId}&lite=1&page_size=1000`;
+      const entries = [];
+      while (url) {
+        const response = await axios.get(url, {
+          headers: { 'Authorization': `Bearer ${token}` }
+        });
+        entries.push(...response.data.results);
+        url = response.data.next;
+      }
+      setFilesInCurrentDir(entries);
     } catch (error) { 
       setHistory(prev => [...prev, 'Error: Could not fetch files.']);
     }
   };
 
+  // Apply filesystem ops in one request; the reply carries the new listing
+  const runBatch = async (ops) => {
+    const resp = await axios.post('http://localhost:8000/api/objects/batch/',
+      { ops, parent: getCurrentDirId() },
+      { headers: { 'Authorization': `Bearer ${token}` } }
+    );
+    setFilesInCurrentDir(resp.data.listing);
+    return resp.data.results;
+  };
+
   const handleOpenEditor = () => {
     const fname = window.prompt('Enter filename to edit:');
     if (!fname) return;
@@ -142,10 +159,7 @@ const Terminal = () => {
             const ob = toBits(o), gb = toBits(g), tb = toBits(ot);
             perm = `${ob.r}${ob.w}${ob.x}${gb.r}${gb.w}${gb.x}${tb.r}${tb.w}${tb.x}`;
           }
-          await axios.patch(`http://localhost:8000/api/objects/${target.id}/`, { permissions: perm }, {
-            headers: { 'Authorization': `Bearer ${token}` }
-          });
-          await fetchFiles(getCurrentDirId());
+          await runBatch([{ op: 'chmod', id: target.id, permissions: perm }]);
           newHistory.push('');
         } catch (e) {
           newHistory.push('chmod failed');
@@ -210,6 +224,35 @@ const Terminal = () => {
           newHistory.push('quota: failed to fetch quota');
         }
         break; }
+      case 'du': {
+        // du [-a] [-s] [-d N] [--top] [dir]: sizes from the server's per-directory rollups
+        const duArgs = [...args];
+        const params = { depth: 1 };
+        let target = null;
+        while (duArgs.length) {
+          const arg = duArgs.shift();
+          if (arg === '-a') params.all = 1;
+          else if (arg === '-s') params.depth = 0;
+          else if (arg === '-d') params.depth = parseInt(duArgs.shift(), 10) || 0;
+          else if (arg === '--top') { params.order = 'size'; params.limit = 10; params.depth = 1000; }
+          else target = arg;
+        }
+        let url = 'http://localhost:8000/api/du/';
+        if (target) {
+          const d = filesInCurrentDir.find(x => x.name === target && x.is_directory);
+          if (!d) { newHistory.push(`du: ${target}: No such directory`); break; }
+          url = `http://localhost:8000/api/objects/${d.id}/du/`;
+        } else if (getCurrentDirId() !== null) {
+          url = `http://localhost:8000/api/objects/${getCurrentDirId()}/du/`;
+        }
+        try {
+          const resp = await axios.get(url, { params, headers: { 'Authorization': `Bearer ${token}` } });
+          const entries = params.order === 'size' ? resp.data.entries : [...resp.data.entries].reverse();
+          const lines = entries.map(e => `${e.size}\t${e.path}`);
+          if (!lines.length || params.order === 'size') lines.push(`${resp.data.size}\ttotal (${resp.data.files} files)`);
+          newHistory.push(lines.join('\n'));
+        } catch { newHistory.push('du: failed to fetch disk usage'); }
+        break; }
       case 'grep': {
         const parts = fullInput.split(/\s+/);
         let flagsStr = '';
@@ -219,43 +262,37 @@ const Terminal = () => {
           i++;
         }
         let rest = fullInput.split(/\s+/).slice(i).join(' ');
-        let patMatch = rest.match(/^"([^"]+)"\s+(.+)$/) || rest.match(/^([^\s]+)\s+(.+)$/);
-        if (!patMatch) { newHistory.push('Usage: grep [-ivnc] "pattern" <filename>'); break; }
+        let patMatch = rest.match(/^"([^"]+)"\s*(.*)$/) || rest.match(/^([^\s]+)\s*(.*)$/);
+        const recursive = flagsStr.includes('r');
+        if (!patMatch || (!patMatch[2].trim() && !recursive)) { newHistory.push('Usage: grep [-ivnc] "pattern" <filename> | grep -r [-ivnc] "pattern" [directory]'); break; }
         const pattern = patMatch[1];
         const fname = patMatch[2].trim();
-        const f = filesInCurrentDir.find(x => x.name === fname);
-        if (!f) { newHistory.push(`grep: ${fname}: No such file`); break; }
-        if (f.is_directory) { newHistory.push(`grep: ${fname}: Is a directory`); break; }
-        const insensitive = flagsStr.includes('i');
-        const invert = flagsStr.includes('v');
+        // The search runs on the server (trigram index), over one file or a whole subtree
+        let root = getCurrentDirId();
+        if (fname) {
+          const f = filesInCurrentDir.find(x => x.name === fname);
+          if (!f) { newHistory.push(`grep: ${fname}: No such file`); break; }
+          if (f.is_directory && !recursive) { newHistory.push(`grep: ${fname}: Is a directory`); break; }
+          root = f.id;
+        }
         const withNumbers = flagsStr.includes('n');
         const countOnly = flagsStr.includes('c');
+        const params = { q: pattern, order: 'path', i: flagsStr.includes('i') ? 1 : 0, v: flagsStr.includes('v') ? 1 : 0, c: countOnly ? 1 : 0 };
+        if (root !== null) params.root = root;
         try {
-          const resp = await axios.get(`http://localhost:8000/api/objects/${f.id}/content/`, { headers: { 'Authorization': `Bearer ${token}` } });
-          const content = resp.data.content || '';
-          const lines = content.split('\n');
-          const pat = insensitive ? pattern.toLowerCase() : pattern;
-          const matches = [];
-          for (let idx = 0; idx < lines.length; idx++) {
-            const line = lines[idx];
-            const hay = insensitive ? line.toLowerCase() : line;
-            const ok = hay.includes(pat);
-            const finalOk = invert ? !ok : ok;
-            if (finalOk) {
-              if (withNumbers && !countOnly) {
-                matches.push(`${idx + 1}:${line}`);
-              } else if (!countOnly) {
-                matches.push(line);
-              } else {
-                matches.push('');
-              }
+          const resp = await axios.get('http://localhost:8000/api/search/', { params, responseType: 'text', headers: { 'Authorization': `Bearer ${token}` } });
+          const results = resp.data.split('\n').filter(Boolean).map(line => JSON.parse(line)).filter(r => !r.done);
+          const output = [];
+          for (const r of results) {
+            const prefix = recursive ? `${r.path}:` : '';
+            if (countOnly) {
+              output.push(`${prefix}${r.count}`);
+            } else {
+              for (const m of r.lines) output.push(`${prefix}${withNumbers ? `${m.line}:` : ''}${m.text}`);
             }
           }
-          if (countOnly) {
-            newHistory.push(String(matches.length));
-          } else {
-            newHistory.push(matches.join('\n'));
-          }
+          if (countOnly && !recursive && !results.length) output.push('0');
+          newHistory.push(output.join('\n'));
         } catch { newHistory.push('grep failed'); }
         break; }
       case 'sed': {
@@ -343,14 +380,12 @@ const Terminal = () => {
 
       case 'mkdir':
       case 'touch':
-        if (!args[0]) { newHistory.push(`Usage: ${command} <name>`); break; }
+        if (!args[0]) { newHistory.push(`Usage: ${command} <name> [name...]`); break; }
         try {
-          await axios.post('http://localhost:8000/api/objects/', 
-            { name: args[0], is_directory: command === 'mkdir', parent: getCurrentDirId() },
-            { headers: { 'Authorization': `Bearer ${token}` } }
-          );
-          await fetchFiles(getCurrentDirId());
-        } catch (error) { newHistory.push(`Error: Could not create ${args[0]}`); }
+          await runBatch(args.map(name => (
+            { op: 'create', name, is_directory: command === 'mkdir', parent: getCurrentDirId() }
+          )));
+        } catch (error) { newHistory.push(`Error: Could not create ${args.join(' ')}`); }
         break;
 
       case 'cat':
@@ -401,33 +436,31 @@ const Terminal = () => {
         if (fileToRead) {
           if (fileToRead.is_directory) { newHistory.push(`${command}: ${fileName}: Is a directory`); break; }
           try {
-            const response = await axios.get(`http://localhost:8000/api/objects/${fileToRead.id}/content/`, {
+            // head/tail only fetch the 10 lines they print
+            const range = command === 'more' ? '' : `?${command}=10`;
+            const response = await axios.get(`http://localhost:8000/api/objects/${fileToRead.id}/content/${range}`, {
               headers: { 'Authorization': `Bearer ${token}` }
             });
             commandOutput = response.data.content || '';
-            if (command === 'head') commandOutput = commandOutput.split('\n').slice(0, 10).join('\n');
-            if (command === 'tail') commandOutput = commandOutput.split('\n').slice(-10).join('\n');
             newHistory.push(commandOutput);
           } catch(error) { newHistory.push(`Error: Could not read file.`); }
         } else { newHistory.push(`${command}: no such file: ${fileName}`); }
         break;
       
-      case 'rm':
-        const targetFileName = args[0];
-        if (!targetFileName) { newHistory.push('Usage: rm <name>'); break; }
-        const targetFile = filesInCurrentDir.find(f => f.name === targetFileName);
-        if (targetFile) {
-          if (window.confirm(`Are you sure you want to delete ${targetFileName}?`)) {
-            try {
-              await axios.delete(`http://localhost:8000/api/objects/${targetFile.id}/`, {
-                headers: { 'Authorization': `Bearer ${token}` }
-              });
-              await fetchFiles(getCurrentDirId());
-            } catch (error) { newHistory.push(`Error: Could not remove ${targetFileName}.`); }
-          }
-        } else { newHistory.push(`rm: no such file or directory: ${targetFileName}`); }
-        break;
-        
+      case 'rm': {
+        if (!args[0]) { newHistory.push('Usage: rm <name> [name...]'); break; }
+        const targets = [];
+        args.forEach(name => {
+          const found = filesInCurrentDir.find(f => f.name === name);
+          if (found) targets.push(found);
+          else newHistory.push(`rm: no such file or directory: ${name}`);
+        });
+        if (targets.length && window.confirm(`Are you sure you want to delete ${targets.map(f => f.name).join(', ')}?`)) {
+          try {
+            await runBatch(targets.map(f => ({ op: 'delete', id: f.id })));
+          } catch (error) { newHistory.push(`Error: Could not remove ${targets.map(f => f.name).join(', ')}.`); }
+        }
+        break; }
       case 'pwd': newHistory.push(getCurrentPathString()); break;
       case 'cd':
         const targetDirName = args[0];
@@ -446,12 +479,16 @@ const Terminal = () => {
         if (!sourceFile) { newHistory.push(`${command}: no such file or directory: ${args[0]}`); break; }
         try {
           if (command === 'mv') { 
-            await axios.patch(`http://localhost:8000/api/objects/${sourceFile.id}/`, { name: args[1] }, {
-              headers: { 'Authorization': `Bearer ${token}` }
-            });
-          } else { 
+            await runBatch([{ op: 'move', id: sourceFile.id, parent: getCurrentDirId(), name: args[1] }]);
+          } else if (!sourceFile.is_directory) {
+            // Server-side copy: the new file shares the data until either is written
+            await axios.post(`http://localhost:8000/api/objects/${sourceFile.id}/copy/`,
+              { name: args[1], parent: getCurrentDirId() },
+              { headers: { 'Authorization': `Bearer ${token}` } }
+            );
+          } else {
             await axios.post('http://localhost:8000/api/objects/', 
-              { name: args[1], is_directory: sourceFile.is_directory, parent: getCurrentDirId(), content: sourceFile.content },
+              { name: args[1], is_directory: true, parent: getCurrentDirId() },
               { headers: { 'Authorization': `Bearer ${token}` } }
             );
           }
@@ -475,17 +512,26 @@ const Terminal = () => {
         }
         break;
       case 'ps':
+        // ps: live processes; ps -a: finished ones too (newest page); ps -s: counts per status
         try {
-          const resp = await axios.get('http://localhost:8000/api/processes/', {
-            headers: { 'Authorization': `Bearer ${token}` }
-          });
-          const rows = resp.data;
-          if (!rows || rows.length === 0) {
+          const headers = { 'Authorization': `Bearer ${token}` };
+          if (args.includes('-s')) {
+            const { data } = await axios.get('http://localhost:8000/api/processes/stats/', { headers });
+            const counts = Object.entries(data.by_status).map(([s, n]) => `${s}\t${n}`).join('\n');
+            const avg = data.avg_turnaround === null ? '-' : data.avg_turnaround.toFixed(2);
+            newHistory.push(`${counts}\ntotal\t${data.total}\navg turnaround\t${avg}`);
+            break;
+          }
+          const params = args.includes('-a') ? {} : { status: 'Ready,Running,Blocked' };
+          const resp = await axios.get('http://localhost:8000/api/processes/', { params, headers });
+          const rows = [...resp.data.results].reverse();
+          if (rows.length === 0) {
             newHistory.push('No processes.');
           } else {
             const header = 'PID\tSTATUS\tFILE';
             const body = rows.map(p => `${p.id}\t${p.status}\t${p.file_name || ''}`).join('\n');
-            newHistory.push(`${header}\n${body}`);
+            const more = resp.data.next ? `\n(only the newest ${rows.length} shown)` : '';
+            newHistory.push(`${header}\n${body}${more}`);
           }
         } catch (error) {
           newHistory.push('Error: Could not fetch processes.');
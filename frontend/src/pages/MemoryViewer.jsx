@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import axios from 'axios';
 import { useAuth } from '../context/AuthContext';
 import { useNavigate } from 'react-router-dom';
@@ -45,40 +45,127 @@ const FrameBox = ({ idx, data }) => {
   );
 };
 
+// Least time between two snapshot requests (reset / reconnect)
+const REFETCH_INTERVAL_MS = 1000;
+
+// Page table of `pid` as seen in the frame table ({'v_page_<n>': 'p_frame_<m>'})
+const pageTableOf = (frames, pid) => {
+  const table = {};
+  frames.forEach((fr, idx) => {
+    if (fr && fr.pid === pid) table[`v_page_${fr.v_page}`] = `p_frame_${idx}`;
+  });
+  return table;
+};
+
 const MemoryViewer = () => {
   const { token } = useAuth();
   const [frames, setFrames] = useState([]);
-  const [running, setRunning] = useState(null);
+  // One entry per CPU: { cpu, running: { pid, status } | null }
+  const [cpus, setCpus] = useState([]);
   const [lastEvent, setLastEvent] = useState(null);
   const [flash, setFlash] = useState(false);
+  const refetch = useRef({ last: 0, timer: null });
   const navigate = useNavigate();
 
+  const showEvent = (msg) => {
+    setLastEvent(msg);
+    if (msg && String(msg).includes('Page Fault')) {
+      setFlash(true);
+      setTimeout(() => setFlash(false), 600);
+    }
+  };
+
+  const applySnapshot = (data) => {
+    setFrames(data.frames || []);
+    setCpus(data.cpus || (data.running ? [{ cpu: 0, running: data.running }] : []));
+    setLastEvent((prev) => {
+      if (data.last_event !== prev && data.last_event && String(data.last_event).includes('Page Fault')) {
+        setFlash(true);
+        setTimeout(() => setFlash(false), 600);
+      }
+      return data.last_event;
+    });
+  };
+
   const fetchSnapshot = async () => {
     try {
       const resp = await axios.get('http://localhost:8000/api/memory-snapshot/', {
         headers: { Authorization: `Bearer ${token}` }
       });
-      setFrames(resp.data.frames || []);
-      setRunning(resp.data.running || null);
-      if (resp.data.last_event !== lastEvent) {
-        setLastEvent(resp.data.last_event);
-        if (resp.data.last_event && String(resp.data.last_event).includes('Page Fault')) {
-          setFlash(true);
-          setTimeout(() => setFlash(false), 600);
-        }
-      }
+      applySnapshot(resp.data);
     } catch (e) {
       // ignore polling errors
     }
   };
 
+  // Refetch at most once per REFETCH_INTERVAL_MS, however often it is asked for
+  const scheduleSnapshot = () => {
+    const state = refetch.current;
+    if (state.timer) return;
+    const wait = Math.max(state.last + REFETCH_INTERVAL_MS - Date.now(), 0);
+    state.timer = setTimeout(() => {
+      state.timer = null;
+      state.last = Date.now();
+      fetchSnapshot();
+    }, wait);
+  };
+
+  // A process of ours was dispatched, stalled, preempted or finished
+  const applyState = ({ pid, status, cpu, message }) => {
+    if (message) showEvent(message);
+    setCpus((prev) => {
+      const next = prev.map((c) => (c.running && c.running.pid === pid ? { ...c, running: null } : c));
+      if ((status === 'Running' || status === 'Blocked') && cpu !== null && cpu !== undefined) {
+        while (next.length <= cpu) next.push({ cpu: next.length, running: null });
+        next[cpu] = { ...next[cpu], running: { pid, status } };
+      }
+      return next;
+    });
+  };
+
   useEffect(() => {
     if (!token) return;
-    fetchSnapshot();
-    const id = setInterval(fetchSnapshot, 1000);
-    return () => clearInterval(id);
+    if (typeof EventSource === 'undefined') {
+      // No SSE support: fall back to polling
+      fetchSnapshot();
+      const id = setInterval(fetchSnapshot, 1000);
+      return () => clearInterval(id);
+    }
+
+    // Pushed events; EventSource reconnects (with Last-Event-ID) by itself
+    const source = new EventSource(`http://localhost:8000/api/events/?token=${encodeURIComponent(token)}`);
+    let dropped = false;
+    source.addEventListener('snapshot', (e) => applySnapshot(JSON.parse(e.data)));
+    source.addEventListener('frames', (e) => {
+      const changes = JSON.parse(e.data);
+      setFrames((prev) => {
+        const next = [...prev];
+        changes.forEach(({ frame, pid, v_page }) => {
+          if (frame < next.length) next[frame] = pid === null ? null : { pid, v_page };
+        });
+        return next;
+      });
+    });
+    source.addEventListener('fault', (e) => showEvent(JSON.parse(e.data).message));
+    source.addEventListener('hit', (e) => showEvent(JSON.parse(e.data).message));
+    source.addEventListener('state', (e) => applyState(JSON.parse(e.data)));
+    // Too far behind to replay the missed events, or back after a dropped connection
+    source.addEventListener('reset', scheduleSnapshot);
+    source.onerror = () => { dropped = true; };
+    source.onopen = () => {
+      if (dropped) scheduleSnapshot();
+      dropped = false;
+    };
+    return () => {
+      source.close();
+      clearTimeout(refetch.current.timer);
+      refetch.current.timer = null;
+    };
   }, [token]);
 
+  const current = cpus.find((c) => c.running);
+  const running = current ? { ...current.running, page_table: pageTableOf(frames, current.running.pid) } : null;
+
   return (
     <div className="scanline" style={{ 
       padding: 30, 